@@ -0,0 +1,85 @@
+"""
+Cache utilities for Smart Search AI
+Thread-safe LRU cache bounded by an estimated byte budget
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with a byte budget.
+
+    Entry sizes come from `sizeof`, so the budget tracks real memory instead of
+    an entry count. Safe to share between uvicorn threadpool workers.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """Stores a value, evicting least recently used entries. Returns False if it can never fit."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            while self._entries and self._current_bytes + size > self.max_bytes:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._current_bytes -= self._sizes.pop(evicted_key)
+                self.evictions += 1
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._current_bytes += size
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/eviction counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,181 @@
+"""
+Catalog Store for Smart Search AI
+Compiles the raw category CSVs into typed, memory-mappable Arrow files
+"""
+import os
+import logging
+import threading
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = [
+    "name", "main_category", "sub_category", "image", "link",
+    "ratings", "no_of_ratings", "discount_price", "actual_price"
+]
+
+# Raw string column -> parsed numeric column stored next to it
+NUMERIC_COLUMNS = {
+    "actual_price": "actual_price_value",
+    "discount_price": "discount_price_value",
+    "ratings": "ratings_value",
+    "no_of_ratings": "no_of_ratings_value",
+}
+
+_SOURCE_MTIME_KEY = b"source_mtime_ns"
+_SOURCE_SIZE_KEY = b"source_size"
+_FORMAT_VERSION_KEY = b"format_version"
+
+# Bumped when column types of the compiled files change, so existing files are recompiled
+CATALOG_FORMAT_VERSION = "2"
+
+
+def parse_numeric_series(series: pd.Series) -> pd.Series:
+    """
+    Parses strings like "₹1,000" or "71,768" into floats with vectorized string ops.
+    
+    Values without any digits (e.g. "Get", "FREE Delivery by Amazon") become NaN.
+    """
+    cleaned = series.astype("string").str.replace(r"[^0-9.]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+
+def add_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the parsed numeric columns (see NUMERIC_COLUMNS) to a raw category DataFrame."""
+    for raw_col, value_col in NUMERIC_COLUMNS.items():
+        if raw_col in df.columns:
+            df[value_col] = parse_numeric_series(df[raw_col])
+        else:
+            df[value_col] = pd.Series(float("nan"), index=df.index, dtype="float64")
+    return df
+
+
+def read_category_csv(csv_path: str) -> pd.DataFrame:
+    """
+    Reads a raw category CSV and adds the numeric columns.
+    
+    ratings is a float, as the API has always returned it (values like "Get"
+    become NaN); the other display columns are kept as strings.
+    """
+    df = add_numeric_columns(pd.read_csv(csv_path, dtype=str))
+    if "ratings" in df.columns:
+        df["ratings"] = pd.to_numeric(df["ratings"], errors="coerce").astype("float64")
+    return df
+
+
+class CatalogStore:
+    """Typed columnar copy of backend/data/*.csv, one Arrow IPC file per category"""
+    
+    def __init__(self, data_dir: str, store_dir: str = None):
+        if store_dir is None:
+            store_dir = os.path.join(data_dir, ".compiled")
+        self.data_dir = data_dir
+        self.store_dir = store_dir
+    
+    def csv_path(self, category: str) -> str:
+        return os.path.join(self.data_dir, f"{category}.csv")
+    
+    def compiled_path(self, category: str) -> str:
+        return os.path.join(self.store_dir, f"{category}.arrow")
+    
+    def is_stale(self, category: str) -> bool:
+        """True when the compiled file is missing or was built from a different CSV version"""
+        compiled_path = self.compiled_path(category)
+        if not os.path.exists(compiled_path):
+            return True
+        try:
+            stat = os.stat(self.csv_path(category))
+            with pa.memory_map(compiled_path, "r") as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except Exception as e:
+            logger.warning(f"Could not inspect compiled catalog for {category}: {e}")
+            return True
+        return (
+            metadata.get(_FORMAT_VERSION_KEY) != CATALOG_FORMAT_VERSION.encode()
+            or metadata.get(_SOURCE_MTIME_KEY) != str(stat.st_mtime_ns).encode()
+            or metadata.get(_SOURCE_SIZE_KEY) != str(stat.st_size).encode()
+        )
+    
+    def compile_category(self, category: str) -> pd.DataFrame:
+        """Parses the category CSV and writes its compiled Arrow file atomically"""
+        csv_path = self.csv_path(category)
+        stat = os.stat(csv_path)
+        df = read_category_csv(csv_path)
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SOURCE_MTIME_KEY] = str(stat.st_mtime_ns).encode()
+        metadata[_SOURCE_SIZE_KEY] = str(stat.st_size).encode()
+        metadata[_FORMAT_VERSION_KEY] = CATALOG_FORMAT_VERSION.encode()
+        table = table.replace_schema_metadata(metadata)
+        
+        os.makedirs(self.store_dir, exist_ok=True)
+        compiled_path = self.compiled_path(category)
+        tmp_path = f"{compiled_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Uncompressed so the file can be memory-mapped without decoding
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, compiled_path)
+        
+        logger.info(f"Compiled {category} ({len(df)} rows)")
+        return df
+    
+    def load(self, category: str) -> Optional[pd.DataFrame]:
+        """
+        Loads a category from the compiled store, recompiling it first if the CSV changed.
+        
+        Falls back to parsing the CSV directly when the store cannot be written.
+        """
+        if not os.path.exists(self.csv_path(category)):
+            return None
+        
+        if self.is_stale(category):
+            try:
+                return self.compile_category(category)
+            except OSError as e:
+                logger.warning(f"Could not write compiled catalog for {category}, reading CSV: {e}")
+                return read_category_csv(self.csv_path(category))
+        
+        table = feather.read_table(self.compiled_path(category), memory_map=True)
+        return table.to_pandas(split_blocks=True)
+    
+    def load_columns(self, category: str, columns: List[str]) -> Optional[pd.DataFrame]:
+        """Loads only the given columns of a category, reading just those from the compiled file"""
+        if not os.path.exists(self.csv_path(category)):
+            return None
+        if self.is_stale(category):
+            try:
+                return self.compile_category(category)[columns]
+            except OSError as e:
+                logger.warning(f"Could not write compiled catalog for {category}, reading CSV: {e}")
+                return read_category_csv(self.csv_path(category))[columns]
+
+        table = feather.read_table(self.compiled_path(category), columns=columns, memory_map=True)
+        return table.to_pandas()
+
+    def iter_chunks(self, category: str, chunk_size: int = 1000) -> Iterator[pd.DataFrame]:
+        """
+        Yields a category as DataFrames of at most chunk_size rows.
+        
+        Slices the memory-mapped table so only the current chunk is materialized.
+        """
+        if not os.path.exists(self.csv_path(category)):
+            return
+        if self.is_stale(category):
+            self.compile_category(category)
+        
+        table = feather.read_table(self.compiled_path(category), memory_map=True)
+        for offset in range(0, table.num_rows, chunk_size):
+            yield table.slice(offset, chunk_size).to_pandas()
+    
+    def compile_all(self, categories: List[str], force: bool = False) -> int:
+        """Compiles every stale category (or all of them with force=True). Returns how many were built."""
+        compiled = 0
+        for category in categories:
+            if force or self.is_stale(category):
+                self.compile_category(category)
+                compiled += 1
+        return compiled
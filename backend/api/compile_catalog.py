@@ -0,0 +1,45 @@
+"""
+Script to compile the product catalog
+Converts backend/data/*.csv into the typed Arrow store used by get_df_by_category,
+the global product table used by cross-category queries and the indexes derived from them
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(__file__))
+
+from products import catalog_store, ALL_CATEGORIES
+from product_index import get_product_index
+from intent_classifier import get_intent_classifier
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    force = "--force" in sys.argv
+    logger.info(f"Compiling {len(ALL_CATEGORIES)} categories into {catalog_store.store_dir}")
+    
+    try:
+        compiled = catalog_store.compile_all(ALL_CATEGORIES, force=force)
+        logger.info(f"Catalog compiled ({compiled} categories rebuilt, {len(ALL_CATEGORIES) - compiled} up to date)")
+        
+        index = get_product_index()
+        logger.info(f"Global product table ready ({index.num_products} products)")
+        
+        # Built here so a fresh server loads them instead of building them on the first request
+        index.lexical_index()
+        get_intent_classifier()
+        logger.info("Global lexical index and intent classifier ready")
+        
+    except Exception as e:
+        logger.error(f"Failed to compile catalog: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
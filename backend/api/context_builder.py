@@ -0,0 +1,186 @@
+"""
+Context Builder for Smart Search AI
+Token-budgeted product context for the response prompt, with products referenced by short IDs
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+from lexical_index import tokenize
+
+# Approximate tokens the product list may take up in the response prompt, across all categories
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Product names are cut at a word boundary after this many characters
+CONTEXT_NAME_MAX_CHARS = int(os.getenv("CONTEXT_NAME_MAX_CHARS", "80"))
+# A product is skipped when this fraction of its name's words match an already listed product
+CONTEXT_NAME_SIMILARITY = float(os.getenv("CONTEXT_NAME_SIMILARITY", "0.8"))
+
+# Columns listed in the context or re-attached to the response
+PRODUCT_FIELDS = ("name", "actual_price", "ratings", "image", "link")
+
+_ITEM_RE = re.compile(r"\[ITEM\](.*?)\[/ITEM\]", re.DOTALL)
+_ID_RE = re.compile(r"\bP(\d+)\b")
+
+CONTEXT_TOKENS = metrics.registry.histogram(
+    "response_context_tokens", "Estimated tokens of the product context in the response prompt",
+    buckets=(100, 250, 500, 1000, 1500, 2000, 4000, 8000)
+)
+CONTEXT_PRODUCTS = metrics.registry.histogram(
+    "response_context_products", "Products listed in the response prompt", buckets=metrics.SIZE_BUCKETS
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def _text(value) -> str:
+    return str(value) if pd.notna(value) else ""
+
+
+def _records(rows: pd.DataFrame) -> List[Dict]:
+    """PRODUCT_FIELDS of every row as strings (much cheaper than fillna + to_dict on a few dozen rows)"""
+    columns = [[_text(value) for value in rows[field].tolist()] for field in PRODUCT_FIELDS]
+    return [dict(zip(PRODUCT_FIELDS, values)) for values in zip(*columns)]
+
+
+def short_name(name: str, max_chars: int = CONTEXT_NAME_MAX_CHARS) -> str:
+    """Collapses whitespace and cuts long listing titles at a word boundary"""
+    # "|" separates the fields of a context line
+    name = " ".join(name.replace("|", " ").split())
+    if len(name) <= max_chars:
+        return name
+    cut = name.rfind(" ", 0, max_chars + 1)
+    return name[:cut if cut > 0 else max_chars].rstrip(" ,;:-|/(")
+
+
+def name_similarity(words: frozenset, other: frozenset) -> float:
+    """Jaccard similarity of two names' word sets"""
+    if not words or not other:
+        return 0.0
+    return len(words & other) / len(words | other)
+
+
+def _product_line(product_id: str, name: str, product: Dict) -> str:
+    fields = [product_id, name, product["actual_price"] or "-"]
+    if product["ratings"]:
+        fields.append(product["ratings"])
+    return " | ".join(fields)
+
+
+def _category_header(category: str) -> str:
+    return f"{category}:"
+
+
+def format_item(product: Dict) -> str:
+    """[ITEM] block of a product in the format the frontend parses"""
+    return (
+        "[ITEM]\n"
+        f"NOME: {product['name']}\n"
+        f"PRICE: {product['actual_price']}\n"
+        f"RATING: {product['ratings']}\n"
+        f"IMAGEM: ![product]({product['image']})\n"
+        f"LINK: {product['link']}\n"
+        "[/ITEM]"
+    )
+
+
+class ProductContext:
+    """
+    Product context of one response prompt.
+
+    text lists the candidates as "ID | name | price | rating" lines grouped by
+    category. products maps each short ID (P1, P2, ...) to its full product
+    row, so the model answers with IDs only and expand_items re-attaches
+    names, images and links afterwards.
+    """
+
+    def __init__(self, text: str, products: Dict[str, Dict]):
+        self.text = text
+        self.products = products
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def expand_items(self, response: str) -> str:
+        """
+        Replaces every [ITEM] block naming a product ID with that product's details.
+
+        Blocks naming an ID that is not in the context are dropped; blocks
+        without an ID are left as they are.
+        """
+        def expand(match: re.Match) -> str:
+            ids = _ID_RE.findall(match.group(1))
+            if not ids:
+                return match.group(0)
+            product = self.products.get(f"P{ids[0]}")
+            return format_item(product) if product is not None else ""
+
+        return _ITEM_RE.sub(expand, response)
+
+
+def build_product_context(
+    candidates: List[Tuple[str, Optional[pd.DataFrame]]],
+    token_budget: Optional[int] = None
+) -> ProductContext:
+    """
+    Builds the product context from ranked candidates of each category.
+
+    Products are taken round-robin by rank, so every category contributes its
+    best products before any category's tail, until token_budget is reached.
+    Products whose name nearly repeats one already listed (color or size
+    variants, the same listing in two categories) are skipped.
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    ranked = [
+        (category, _records(rows))
+        for category, rows in candidates
+        if rows is not None and not rows.empty
+    ]
+
+    selected: Dict[str, List[Tuple[str, Dict]]] = {category: [] for category, _ in ranked}
+    listed_names: List[frozenset] = []
+    used_tokens = 0
+    budget_reached = False
+    for rank in range(max((len(products) for _, products in ranked), default=0)):
+        for category, products in ranked:
+            if rank >= len(products):
+                continue
+            product = products[rank]
+            name = short_name(product["name"])
+            words = frozenset(tokenize(product["name"]))
+            if any(name_similarity(words, other) >= CONTEXT_NAME_SIMILARITY for other in listed_names):
+                continue
+
+            cost = estimate_tokens(_product_line(f"P{len(listed_names) + 1}", name, product))
+            if not selected[category]:
+                cost += estimate_tokens(_category_header(category))
+            if used_tokens + cost > token_budget:
+                budget_reached = True
+                break
+            used_tokens += cost
+            listed_names.append(words)
+            selected[category].append((name, product))
+        if budget_reached:
+            break
+
+    lines = []
+    products_by_id: Dict[str, Dict] = {}
+    for category, products in selected.items():
+        if not products:
+            continue
+        lines.append(_category_header(category))
+        for name, product in products:
+            product_id = f"P{len(products_by_id) + 1}"
+            products_by_id[product_id] = {**product, "category": category}
+            lines.append(_product_line(product_id, name, product))
+
+    context = ProductContext("\n".join(lines), products_by_id)
+    CONTEXT_TOKENS.observe(context.tokens)
+    CONTEXT_PRODUCTS.observe(len(products_by_id))
+    return context
@@ -0,0 +1,122 @@
+"""
+Embedding Cache for Smart Search AI
+Persistent, content-addressed cache of document embeddings backed by SQLite
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def embedding_model_name(embeddings: Embeddings) -> str:
+    """Best-effort identifier of the model behind an Embeddings instance"""
+    for attr in ("model_name", "model"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(embeddings).__name__
+
+
+class EmbeddingCache:
+    """Maps sha256(model name + text) to a float32 vector stored in SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings backend so documents are only embedded once per model.
+
+    Queries are passed straight through: they are rarely repeated and should not
+    be persisted to disk.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or embedding_model_name(embeddings)
+        self.rate_limited = getattr(embeddings, "rate_limited", True)
+        self.hits = 0
+        self.misses = 0
+        # The index build embeds batches from several scheduler threads
+        self._stats_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        with self._stats_lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            cached.update(computed)
+            logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} computed")
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return embed_queries(self.embeddings, texts)
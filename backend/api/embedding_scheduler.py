@@ -0,0 +1,233 @@
+"""
+Embedding Scheduler for Smart Search AI
+Concurrent, rate-limit-aware batch embedding for index builds
+"""
+import os
+import json
+import math
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Google's embedding API accepts up to 100 texts per request
+TEXTS_PER_REQUEST = 100
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    message = str(error)
+    return "RESOURCE_EXHAUSTED" in message or "429" in message
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float):
+        """Blocks until `amount` tokens are available (amounts above capacity are clamped)"""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait_time = (amount - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits, either of which may be disabled"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        rpm = os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "100")
+        tpm = os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "")
+        return cls(float(rpm) if rpm else None, float(tpm) if tpm else None)
+
+    def acquire(self, texts: List[str]):
+        if self.requests:
+            self.requests.acquire(math.ceil(len(texts) / TEXTS_PER_REQUEST))
+        if self.tokens:
+            self.tokens.acquire(estimate_tokens(texts))
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Applies a RateLimiter to document embedding calls.
+
+    Sits below the embedding cache, so only texts that actually reach the
+    provider consume quota. Queries are not throttled.
+    """
+
+    rate_limited = True
+
+    def __init__(self, embeddings: Embeddings, limiter: RateLimiter):
+        self.embeddings = embeddings
+        self.limiter = limiter
+        self.model_name = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.limiter.acquire(texts)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return embed_queries(self.embeddings, texts)
+
+
+class BuildCheckpoint:
+    """
+    Records which batches of an index build were written, so an interrupted build can resume.
+
+    fingerprint identifies the inputs of the build (catalog files, embedding
+    model, document format); a checkpoint whose fingerprint differs from the
+    current one describes another build and must not be resumed.
+    """
+
+    def __init__(self, path: str, generation: str, completed: Optional[Set[str]] = None, fingerprint: str = ""):
+        self.path = path
+        self.generation = generation
+        self.completed: Set[str] = completed or set()
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BuildCheckpoint"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(path, data["generation"], set(data.get("completed", [])), data.get("fingerprint", ""))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable build checkpoint {path}: {e}")
+            return None
+
+    def mark_completed(self, batch_id: str):
+        with self._lock:
+            self.completed.add(batch_id)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "generation": self.generation,
+                    "fingerprint": self.fingerprint,
+                    "completed": sorted(self.completed)
+                }, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class EmbeddingScheduler:
+    """
+    Embeds batches on a thread pool with retries.
+
+    Rate-limit errors (and other failures) are retried with exponential backoff
+    and full jitter. A batch that still fails after max_retries raises instead
+    of being dropped. At most 2 * max_workers batches are in flight, which
+    gives backpressure to whatever produces the batches.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_workers: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.embeddings = embeddings
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings) -> "EmbeddingScheduler":
+        default_workers = "4" if getattr(embeddings, "rate_limited", True) else "1"
+        return cls(
+            embeddings,
+            max_workers=int(os.getenv("EMBEDDING_WORKERS", default_workers)),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+        )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        metrics.EMBEDDING_BATCH_SIZE.observe(len(texts), kind="document")
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                kind = "Rate limited" if is_rate_limit_error(e) else f"Embedding failed ({e})"
+                logger.warning(f"{kind}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                self.sleep(delay)
+
+    def map(self, items: Iterable[T], texts_of: Callable[[T], List[str]]) -> Iterator[Tuple[T, List[List[float]]]]:
+        """Embeds the texts of every item concurrently, yielding (item, vectors) as batches complete"""
+        items = iter(items)
+        max_in_flight = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed") as pool:
+            pending = {}
+            exhausted = False
+            try:
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < max_in_flight:
+                        item = next(items, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        pending[pool.submit(self.embed_with_retry, texts_of(item))] = item
+
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = pending.pop(future)
+                        yield item, future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,157 @@
+"""
+Embedding Providers for Smart Search AI
+Pluggable embedding backends behind LangChain's Embeddings interface
+"""
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_PROVIDERS = ("google", "hashing", "sentence-transformers")
+
+# Each provider has its own model setting, so switching providers never hands one the other's model
+GOOGLE_EMBEDDING_MODEL = "models/embedding-001"
+SENTENCE_TRANSFORMERS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    In-process embedder based on signed feature hashing.
+
+    Hashes word unigrams, word bigrams and character trigrams into a fixed
+    number of dimensions and L2-normalizes the result. Needs no model download
+    or network, and encodes a whole batch as one matrix.
+    """
+
+    rate_limited = False
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.model_name = f"hashing-{dimensions}-v1"
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        words = _WORD_RE.findall(str(text).lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts into an (n, dimensions) float32 matrix of unit vectors"""
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 instead of hash() so vectors are stable across processes
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dimensions)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        flat_index = np.asarray(rows, dtype=np.int64) * self.dimensions + np.asarray(cols, dtype=np.int64)
+        matrix = np.bincount(
+            flat_index, weights=np.asarray(signs), minlength=len(texts) * self.dimensions
+        ).astype(np.float32).reshape(len(texts), self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """In-process embedder running a small sentence-transformers model on CPU"""
+
+    rate_limited = False
+
+    def __init__(self, model_name: str = SENTENCE_TRANSFORMERS_MODEL, batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=sentence-transformers requires the 'sentence-transformers' package"
+            ) from e
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeds several search queries in one provider call where the provider supports it.
+
+    Unlike embed_documents, this keeps the query-side settings of the provider
+    (the RETRIEVAL_QUERY task type for Google), so each vector equals embed_query(text).
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    if type(embeddings).__name__ == "GoogleGenerativeAIEmbeddings":
+        return embeddings.embed_documents(texts, task_type=embeddings.task_type or "RETRIEVAL_QUERY")
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def get_embedding_provider() -> str:
+    """Returns the configured provider name (EMBEDDING_PROVIDER, default 'google')"""
+    provider = os.getenv("EMBEDDING_PROVIDER", "google").strip().lower()
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER '{provider}'. Available: {', '.join(EMBEDDING_PROVIDERS)}")
+    return provider
+
+
+def get_embeddings(provider: str = None) -> Embeddings:
+    """
+    Creates the embedding backend selected by config.
+
+    Args:
+        provider: 'google', 'hashing' or 'sentence-transformers' (defaults to EMBEDDING_PROVIDER)
+
+    Returns:
+        LangChain Embeddings instance
+    """
+    provider = provider or get_embedding_provider()
+
+    if provider == "hashing":
+        return HashingEmbeddings(dimensions=int(os.getenv("EMBEDDING_DIMENSIONS", "512")))
+
+    if provider == "sentence-transformers":
+        return SentenceTransformerEmbeddings(os.getenv("SENTENCE_TRANSFORMERS_MODEL", SENTENCE_TRANSFORMERS_MODEL))
+
+    if provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(
+            model=os.getenv("GOOGLE_EMBEDDING_MODEL", GOOGLE_EMBEDDING_MODEL),
+            google_api_key=os.getenv("GEMINI_API_KEY")
+        )
+
+    raise ValueError(f"Unknown embedding provider '{provider}'. Available: {', '.join(EMBEDDING_PROVIDERS)}")
@@ -20,6 +20,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def main():
+    if "--sync" in sys.argv:
+        logger.info("Syncing Vector Store with changed category files")
+        try:
+            vector_store = VectorStoreManager(skip_init=True)
+            result = vector_store.sync_store()
+            logger.info(f"Vector Store synced: {result}")
+        except Exception as e:
+            logger.error(f"Failed to sync Vector Store: {e}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+        return
+    
     logger.info("Initializing Vector Store")
     logger.info("This process will load products, generate embeddings, and create the vector database")
     logger.info("Estimated time: 5-10 minutes")
@@ -0,0 +1,294 @@
+"""
+Intent Cache for Smart Search AI
+Two-level cache of category analysis results (exact query, then nearest query embedding)
+"""
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from embeddings import get_embeddings
+from embedding_cache import embedding_model_name
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_NUMBER_RE = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+
+# Words that do not change which categories a query maps to
+_STOPWORDS = frozenset(
+    "a an and the for with of to in on my me i some any please best good new buy want need looking".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query used as the exact-match key.
+
+    Lowercases and drops punctuation and filler words, keeping word order and
+    repetition, so 'Wireless headphones for the gym!' and 'wireless headphones gym'
+    share a key while 'gym headphones wireless' is left to the semantic lookup.
+    """
+    words = _WORD_RE.findall(query.lower())
+    return " ".join(word for word in words if word not in _STOPWORDS)
+
+
+def query_numbers(normalized: str) -> str:
+    """
+    The numbers mentioned in a normalized query, e.g. '2000' for 'headphones under 2000'.
+
+    Semantic matches are only allowed between queries with the same numbers, so
+    'under 2000' never reuses the budget detected for 'under 5000'.
+    """
+    return " ".join(_NUMBER_RE.findall(normalized))
+
+
+class IntentCache:
+    """
+    Caches category analysis JSON ({"budget": ..., "categories": [...]}) per query.
+
+    Lookups first try the exact normalized query, then the most similar cached
+    query embedding (cosine similarity >= similarity_threshold). Entries expire
+    after ttl_seconds and the least recently used one is evicted beyond
+    max_entries. With a path, entries are also written to SQLite and reloaded
+    on startup (only entries embedded with the same model are reloaded).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+        similarity_threshold: float = 0.9,
+        path: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.path = path
+        self.model_name = embedding_model_name(embeddings)
+        self._lock = threading.Lock()
+
+        # normalized query -> (result, numbers, created_at); the order is the LRU order
+        self._entries: "OrderedDict[str, Tuple[Dict, str, float]]" = OrderedDict()
+        # One row per cache slot; _slots maps normalized query -> row
+        self._matrix: Optional[np.ndarray] = None
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS intents ("
+                "query TEXT PRIMARY KEY, result TEXT NOT NULL, numbers TEXT NOT NULL, "
+                "model TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "IntentCache":
+        path = os.getenv("INTENT_CACHE_PATH", "")
+        return cls(
+            get_embeddings(os.getenv("INTENT_CACHE_EMBEDDING_PROVIDER", "hashing")),
+            max_entries=int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "1000")),
+            ttl_seconds=float(os.getenv("INTENT_CACHE_TTL_SECONDS", "86400")),
+            similarity_threshold=float(os.getenv("INTENT_CACHE_SIMILARITY", "0.9")),
+            path=path or None
+        )
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _store_vector(self, normalized: str, vector: np.ndarray):
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        slot = self._slots.get(normalized)
+        if slot is None:
+            slot = self._free_slots.pop()
+            self._slots[normalized] = slot
+        self._matrix[slot] = vector
+
+    def _remove(self, normalized: str):
+        self._entries.pop(normalized, None)
+        slot = self._slots.pop(normalized, None)
+        if slot is not None:
+            self._matrix[slot] = 0.0
+            self._free_slots.append(slot)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM intents WHERE query = ?", (normalized,))
+            self._conn.commit()
+
+    def _load(self):
+        now = time.time()
+        rows = self._conn.execute(
+            "SELECT query, result, numbers, vector, created_at FROM intents "
+            "WHERE model = ? ORDER BY created_at DESC LIMIT ?",
+            (self.model_name, self.max_entries)
+        ).fetchall()
+        # Oldest first, so the newest entries end up most recently used
+        for query, result, numbers, blob, created_at in reversed(rows):
+            if self._is_expired(created_at, now):
+                continue
+            self._entries[query] = (json.loads(result), numbers, created_at)
+            self._store_vector(query, np.frombuffer(blob, dtype=np.float32))
+        logger.info(f"Loaded {len(self._entries)} cached intents from {self.path}")
+
+    def _semantic_match(self, normalized: str, vector: np.ndarray, now: float) -> Optional[str]:
+        if not self._slots:
+            return None
+        numbers = query_numbers(normalized)
+        candidates = [
+            (query, slot) for query, slot in self._slots.items()
+            if self._entries[query][1] == numbers and not self._is_expired(self._entries[query][2], now)
+        ]
+        if not candidates:
+            return None
+        slots = np.fromiter((slot for _, slot in candidates), dtype=np.int64, count=len(candidates))
+        similarities = self._matrix[slots] @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+
+    def get(self, query: str) -> Optional[Dict]:
+        """Returns the cached analysis for the query or a semantically equivalent one"""
+        normalized = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                if self._is_expired(entry[2], now):
+                    self._remove(normalized)
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(normalized)
+                    self.exact_hits += 1
+                    return entry[0]
+            if not self._slots:
+                self.misses += 1
+                return None
+
+        # Embedding may be a network call, so it runs outside the lock
+        vector = self._embed(normalized)
+
+        with self._lock:
+            match = self._semantic_match(normalized, vector, now)
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.semantic_hits += 1
+            return self._entries[match][0]
+
+    def put(self, query: str, result: Dict):
+        normalized = normalize_query(query)
+        if not normalized or self.max_entries <= 0:
+            return
+        vector = self._embed(normalized)
+        numbers = query_numbers(normalized)
+        created_at = time.time()
+
+        with self._lock:
+            if normalized not in self._entries:
+                while len(self._entries) >= self.max_entries:
+                    oldest = next(iter(self._entries))
+                    self._remove(oldest)
+                    self.evictions += 1
+            self._entries[normalized] = (result, numbers, created_at)
+            self._entries.move_to_end(normalized)
+            self._store_vector(normalized, vector)
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO intents (query, result, numbers, model, vector, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (normalized, json.dumps(result), numbers, self.model_name, vector.tobytes(), created_at)
+                )
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._slots.clear()
+            self._matrix = None
+            self._free_slots = []
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM intents")
+                self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def top_categories(self, limit: int) -> List[str]:
+        """Categories named most often by the cached analyses, i.e. the most requested ones"""
+        with self._lock:
+            results = [result for result, _, _ in self._entries.values()]
+        counts = Counter(category for result in results for category in result.get("categories", []))
+        return [category for category, _ in counts.most_common(limit)]
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "persistent": self._conn is not None
+        }
+
+
+# Global instance
+intent_cache = None
+_intent_cache_lock = threading.Lock()
+
+def get_intent_cache() -> IntentCache:
+    """Returns the global intent cache instance (lazy loading)"""
+    global intent_cache
+    with _intent_cache_lock:
+        if intent_cache is None:
+            intent_cache = IntentCache.from_env()
+    return intent_cache
+
+def _collect_metrics():
+    if intent_cache is None:
+        return []
+    stats = intent_cache.stats()
+    return [
+        ("intent_cache_lookups_total", "counter", "Intent cache lookups by result", [
+            ({"result": result}, stats[field])
+            for result, field in (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"), ("miss", "misses"))
+        ]),
+        ("intent_cache_entries", "gauge", "Cached query analyses", [({}, stats["entries"])]),
+    ]
+
+metrics.register_collector(_collect_metrics)
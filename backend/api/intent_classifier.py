@@ -0,0 +1,355 @@
+"""
+Intent Classifier for Smart Search AI
+In-process category and budget extraction used before falling back to the LLM
+"""
+import os
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from lexical_index import tokenize
+from shared_arrays import load_arrays, save_arrays
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_FILE = "_intent_classifier"
+
+# Words that name a price limit ("under 2000", "budget of ₹1.5k", "max rs 500")
+_BUDGET_CUE = r"(?:under|below|less\s+than|lesser\s+than|cheaper\s+than|within|up\s*to|not\s+more\s+than|at\s+most|max(?:imum)?|budget(?:\s+(?:of|is))?|<=?)"
+_CURRENCY = r"(?:₹|rs\.?|inr|rupees?)"
+_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?)?\b"
+
+_CUE_RE = re.compile(rf"{_BUDGET_CUE}\s*(?:of\s+)?{_CURRENCY}?\s*{_AMOUNT}", re.IGNORECASE)
+_RANGE_RE = re.compile(rf"between\s+{_CURRENCY}?\s*{_AMOUNT}\s*(?:and|to|-)\s*{_CURRENCY}?\s*{_AMOUNT}", re.IGNORECASE)
+_PREFIX_CURRENCY_RE = re.compile(rf"{_CURRENCY}\s*{_AMOUNT}", re.IGNORECASE)
+_SUFFIX_CURRENCY_RE = re.compile(rf"{_AMOUNT}\s*{_CURRENCY}", re.IGNORECASE)
+
+# Amount-like mentions parse_budget may not understand ("around 2000", "2k", "under two thousand")
+_AMOUNT_HINT_RE = re.compile(r"\d|₹|\b(?:rs|inr|rupees?|hundred|thousand|lakhs?|lacs?|crores?)\b", re.IGNORECASE)
+
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5}
+
+# Tokens that carry no category signal in product names or queries
+_STOPWORDS = frozenset(
+    "a an and the for with of to in on by from at or is are my me i you your this that "
+    "all set pack combo new best good buy want need looking under below above within upto "
+    "rs inr rupee rupees price budget cheap max maximum less than".split()
+)
+
+
+def _amount(number: str, unit: Optional[str]) -> Optional[float]:
+    try:
+        value = float(number.replace(",", ""))
+    except ValueError:
+        return None
+    return value * _MULTIPLIERS.get((unit or "").lower(), 1.0)
+
+
+def parse_budget(query: str) -> Optional[float]:
+    """
+    Extracts a maximum price from a query, e.g. 'under 2000' -> 2000.0, '₹1.5k' -> 1500.0.
+
+    Only numbers introduced by a limit word or a currency marker count, so model
+    numbers like 'iphone 13' or '32 inch' are not mistaken for budgets.
+    """
+    match = _RANGE_RE.search(query)
+    if match:
+        return _amount(match.group(3), match.group(4))
+    for pattern in (_CUE_RE, _PREFIX_CURRENCY_RE, _SUFFIX_CURRENCY_RE):
+        match = pattern.search(query)
+        if match:
+            return _amount(match.group(1), match.group(2))
+    return None
+
+
+def has_unparsed_amount(query: str) -> bool:
+    """True when the query mentions digits or currency/amount words but parse_budget finds no budget"""
+    return _AMOUNT_HINT_RE.search(query) is not None and parse_budget(query) is None
+
+
+def stem(token: str) -> str:
+    """Folds simple English plurals: 'laptops' -> 'laptop', 'batteries' -> 'battery'"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def terms(text: str) -> List[str]:
+    """Stemmed tokens without filler words, prices and sizes ('20k', '7kg')"""
+    return [stem(token) for token in tokenize(text) if len(token) > 1 and token not in _STOPWORDS and not token[0].isdigit()]
+
+
+class IntentClassifier:
+    """
+    Nearest-centroid category classifier over class-level TF-IDF vectors.
+
+    Each category is described by its name and sub_category values (given full
+    weight) plus the share of its product names containing each term. Terms
+    are weighted by how few categories use them, the top max_terms per category
+    are kept and each category vector is L2-normalized, so a query scores as the
+    cosine similarity against every category at once.
+    """
+
+    def __init__(self, category_texts: Dict[str, Tuple[List[str], Iterable[str]]], max_terms: int = 400):
+        """
+        Args:
+            category_texts: category -> (label texts such as the name and sub_category values, product names)
+            max_terms: terms kept per category
+        """
+        self.categories = list(category_texts)
+        self.confident = 0
+        self.fallbacks = 0
+        self.amount_fallbacks = 0
+        frequencies = []
+        for category in self.categories:
+            labels, names = category_texts[category]
+            counts = Counter()
+            num_names = 0
+            for name in names:
+                counts.update(set(terms(name)))
+                num_names += 1
+            # Share of products containing each term; label terms describe every product
+            frequency = {term: count / max(num_names, 1) for term, count in counts.items()}
+            for label in labels:
+                for term in terms(label):
+                    frequency[term] = 1.0
+            frequencies.append(frequency)
+
+        document_frequency = Counter()
+        for frequency in frequencies:
+            document_frequency.update(term for term, value in frequency.items() if value >= 0.01)
+        num_categories = len(self.categories)
+        self.idf = {
+            term: math.log(1 + num_categories / count) for term, count in document_frequency.items()
+        }
+
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols, values = [], [], []
+        for row, frequency in enumerate(frequencies):
+            weighted = sorted(
+                ((value * self.idf.get(term, math.log(1 + num_categories)), term) for term, value in frequency.items()),
+                reverse=True
+            )[:max_terms]
+            for weight, term in weighted:
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                values.append(weight)
+
+        self.matrix = np.zeros((num_categories, len(self.vocabulary)), dtype=np.float32)
+        self.matrix[rows, cols] = values
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix /= norms
+
+    @classmethod
+    def from_catalog(cls, catalog_store, categories: List[str], names_per_category: int = 2000) -> "IntentClassifier":
+        """Builds the classifier from the compiled catalog (name and sub_category columns only)"""
+        started_at = time.time()
+        category_texts = {}
+        for category in categories:
+            df = catalog_store.load_columns(category, ["name", "sub_category"])
+            if df is None or df.empty:
+                category_texts[category] = ([category], [])
+                continue
+            labels = [category] + df["sub_category"].dropna().unique().tolist()
+            category_texts[category] = (labels, df["name"].dropna().head(names_per_category).tolist())
+        classifier = cls(category_texts)
+        logger.info(f"Built intent classifier over {len(categories)} categories in {time.time() - started_at:.1f}s")
+        return classifier
+
+    def save(self, directory: str, tag: str = ""):
+        """Writes the fitted classifier as memory-mappable arrays; tag (e.g. a catalog fingerprint) is stored with it"""
+        save_arrays(directory, {
+            "categories": np.asarray(self.categories, dtype=str),
+            "vocabulary": np.asarray(list(self.vocabulary), dtype=str),
+            "idf_terms": np.asarray(list(self.idf), dtype=str),
+            "idf_values": np.asarray(list(self.idf.values()), dtype=np.float64),
+            "matrix": self.matrix,
+        }, tag=tag)
+
+    @classmethod
+    def load(cls, directory: str, tag: str = "") -> Optional["IntentClassifier"]:
+        """Loads a classifier written by save (its matrix memory-mapped), or None when it is missing or was saved with another tag"""
+        loaded = load_arrays(directory, tag=tag)
+        if loaded is None:
+            return None
+        arrays, _ = loaded
+        classifier = cls.__new__(cls)
+        classifier.categories = arrays["categories"].tolist()
+        # Terms are saved in column order
+        classifier.vocabulary = {term: col for col, term in enumerate(arrays["vocabulary"].tolist())}
+        classifier.idf = dict(zip(arrays["idf_terms"].tolist(), arrays["idf_values"].tolist()))
+        classifier.matrix = arrays["matrix"]
+        classifier.confident = 0
+        classifier.fallbacks = 0
+        classifier.amount_fallbacks = 0
+        return classifier
+
+    def _query_vector(self, query: str) -> Tuple[List[int], np.ndarray, float]:
+        """Known query term columns, their L2-normalized weights and the share of the query they cover"""
+        counts = Counter(terms(query))
+        known = [term for term in counts if term in self.vocabulary]
+        if not known:
+            return [], np.zeros(0, dtype=np.float32), 0.0
+        # Unknown terms get the highest idf: a word no category uses is a strong sign the classifier cannot tell
+        max_idf = math.log(1 + len(self.categories))
+        total = sum((count * self.idf.get(term, max_idf)) ** 2 for term, count in counts.items())
+        weights = np.asarray([counts[term] * self.idf.get(term, max_idf) for term in known], dtype=np.float32)
+        known_share = float(np.dot(weights, weights)) / total
+        weights /= np.linalg.norm(weights)
+        return [self.vocabulary[term] for term in known], weights, known_share
+
+    def scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query against every category"""
+        cols, weights, _ = self._query_vector(query)
+        if not cols:
+            return np.zeros(len(self.categories), dtype=np.float32)
+        return self.matrix[:, cols] @ weights
+
+    def classify_top(self, query: str, max_categories: int = 1, min_share: float = 0.8) -> Tuple[List[str], float]:
+        """
+        Returns up to max_categories categories, best first, and a confidence in [0, 1].
+
+        Categories scoring at least min_share of the best score are returned
+        together, so a query that fits two categories about equally ('shoes':
+        Shoes and Kids Shoes) names both instead of looking ambiguous.
+        Confidence is the score gap between the lowest returned category and the
+        best one left out, scaled by how much of the query (by term weight) the
+        returned categories explain. A query whose categories do not stand out,
+        or whose main words never occur in them, scores near zero.
+        """
+        cols, weights, known_share = self._query_vector(query)
+        if not cols or not self.categories:
+            return [], 0.0
+        submatrix = self.matrix[:, cols]
+        scores = submatrix @ weights
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        if best <= 0:
+            return [], 0.0
+        selected = 1
+        while selected < min(max_categories, len(order)) and scores[order[selected]] >= min_share * best:
+            selected += 1
+        lowest = float(scores[order[selected - 1]])
+        runner_up = float(scores[order[selected]]) if len(order) > selected else 0.0
+        covered = (submatrix[order[:selected]] > 0).any(axis=0)
+        coverage = known_share * float(np.dot(weights[covered], weights[covered]))
+        return [self.categories[row] for row in order[:selected]], (lowest - runner_up) * coverage
+
+    def classify(self, query: str) -> Tuple[Optional[str], float]:
+        """Returns the best category and its confidence (see classify_top)"""
+        categories, confidence = self.classify_top(query)
+        return (categories[0] if categories else None), confidence
+
+    def analyze(self, query: str, threshold: float, max_categories: int = 1, min_share: float = 0.8) -> Optional[Dict]:
+        """
+        Returns an analysis dict shaped like the LLM's ({"budget", "categories"}),
+        or None when the LLM should decide: the confidence is below threshold,
+        or the query mentions an amount parse_budget cannot read ('around 2000').
+        """
+        if has_unparsed_amount(query):
+            self.fallbacks += 1
+            self.amount_fallbacks += 1
+            return None
+        categories, confidence = self.classify_top(query, max_categories, min_share)
+        if not categories or confidence < threshold:
+            self.fallbacks += 1
+            return None
+        self.confident += 1
+        return {"budget": parse_budget(query), "categories": categories}
+
+    def stats(self) -> Dict:
+        total = self.confident + self.fallbacks
+        return {
+            "categories": len(self.categories),
+            "terms": len(self.vocabulary),
+            "confident": self.confident,
+            "llm_fallbacks": self.fallbacks,
+            "unparsed_amount_fallbacks": self.amount_fallbacks,
+            "confident_rate": self.confident / total if total else 0.0
+        }
+
+
+# Global instance
+intent_classifier = None
+_classifier_tag = None
+# time.monotonic() of the last catalog fingerprint check
+_checked_at = 0.0
+_classifier_lock = threading.Lock()
+
+def _load_or_build_classifier(catalog_store, categories: List[str], tag: str, names_per_category: int) -> IntentClassifier:
+    """Loads the classifier saved under tag in the compiled catalog directory, or builds and saves it"""
+    from product_index import catalog_build_lock
+    path = os.path.join(catalog_store.store_dir, CLASSIFIER_FILE)
+    classifier = IntentClassifier.load(path, tag=tag)
+    if classifier is None:
+        # Other worker processes wait here, then load the classifier the first one saved
+        with catalog_build_lock(catalog_store):
+            classifier = IntentClassifier.load(path, tag=tag)
+            if classifier is None:
+                classifier = IntentClassifier.from_catalog(catalog_store, categories, names_per_category=names_per_category)
+                try:
+                    classifier.save(path, tag=tag)
+                    # The memory-mapped copy is shared with other workers; keep the built one if it cannot be read back
+                    classifier = IntentClassifier.load(path, tag=tag) or classifier
+                except OSError as e:
+                    logger.warning(f"Could not save intent classifier: {e}")
+    return classifier
+
+def get_intent_classifier(refresh: bool = False) -> IntentClassifier:
+    """
+    Returns the global intent classifier, reloading it when a category CSV changed.
+    
+    It is loaded from the compiled catalog directory, or built from the catalog
+    and saved there, keyed by the catalog fingerprint. Like get_product_index,
+    the fingerprint is checked at most every CATALOG_RELOAD_SECONDS, and
+    refresh=True checks now. Counters carry over to a reloaded classifier.
+    """
+    global intent_classifier, _classifier_tag, _checked_at
+    import product_index
+    classifier = intent_classifier
+    if classifier is not None and not refresh and time.monotonic() - _checked_at < product_index.CATALOG_RELOAD_SECONDS:
+        return classifier
+    
+    from products import ALL_CATEGORIES, catalog_store
+    
+    with _classifier_lock:
+        if intent_classifier is not None and not refresh and time.monotonic() - _checked_at < product_index.CATALOG_RELOAD_SECONDS:
+            return intent_classifier
+        names_per_category = int(os.getenv("INTENT_CLASSIFIER_NAMES_PER_CATEGORY", "2000"))
+        tag = f"{product_index.catalog_fingerprint(catalog_store, ALL_CATEGORIES)}:{names_per_category}"
+        if intent_classifier is None or _classifier_tag != tag:
+            classifier = _load_or_build_classifier(catalog_store, ALL_CATEGORIES, tag, names_per_category)
+            if intent_classifier is not None:
+                logger.info("Catalog changed, reloaded the intent classifier")
+                classifier.confident = intent_classifier.confident
+                classifier.fallbacks = intent_classifier.fallbacks
+                classifier.amount_fallbacks = intent_classifier.amount_fallbacks
+            intent_classifier, _classifier_tag = classifier, tag
+        _checked_at = time.monotonic()
+    return intent_classifier
+
+def get_intent_classifier_stats() -> Dict:
+    """Classifier counters, without building the classifier if no query needed it yet"""
+    if intent_classifier is None:
+        return {"built": False}
+    return {"built": True, **intent_classifier.stats()}
+
+def _collect_metrics():
+    if intent_classifier is None:
+        return []
+    return [("intent_classifier_queries_total", "counter", "Queries answered by the local classifier or sent to the LLM", [
+        ({"result": "confident"}, intent_classifier.confident),
+        ({"result": "llm_fallback"}, intent_classifier.fallbacks),
+    ])]
+
+metrics.register_collector(_collect_metrics)
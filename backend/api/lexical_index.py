@@ -0,0 +1,142 @@
+"""
+Lexical Index for Smart Search AI
+BM25 ranking over product names, stored as a term-major sparse matrix in NumPy
+"""
+import re
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from shared_arrays import load_arrays, save_arrays
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and splits on anything that is not a letter or digit"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class SortedVocabulary:
+    """
+    Term -> term id lookup over sorted term and id arrays.
+
+    Stands in for the vocabulary dict of a loaded index, so the vocabulary
+    stays in the (shared) mapped files instead of a per-process dict.
+    """
+
+    def __init__(self, terms: np.ndarray, term_ids: np.ndarray):
+        self.terms = terms
+        self.term_ids = term_ids
+
+    def get(self, term: str, default=None) -> Optional[int]:
+        position = int(np.searchsorted(self.terms, term))
+        if position < len(self.terms) and self.terms[position] == term:
+            return int(self.term_ids[position])
+        return default
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a list of texts.
+
+    Postings are kept in CSC form (indptr / doc_ids / weights per term) with the
+    BM25 term weight precomputed, so scoring a query is a gather-add per query term.
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = {}
+        term_ids, doc_ids, term_freqs, doc_lengths = [], [], [], []
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(tf)
+
+        self.num_docs = len(doc_lengths)
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tfs = np.asarray(term_freqs, dtype=np.float32)[order]
+
+        self.indptr = np.searchsorted(term_ids, np.arange(len(self.vocabulary) + 1)).astype(np.int32)
+        doc_freq = np.diff(self.indptr).astype(np.float32)
+        idf = np.log1p((self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.num_docs and lengths.mean() > 0 else 1.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / avg_length)
+        self.weights = (idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def save(self, directory: str, tag: str = ""):
+        """Writes the index as memory-mappable arrays; tag (e.g. a data fingerprint) is stored with it"""
+        if isinstance(self.vocabulary, SortedVocabulary):
+            terms, term_ids = self.vocabulary.terms, self.vocabulary.term_ids
+        else:
+            terms = np.asarray(list(self.vocabulary), dtype=str)
+            term_ids = np.asarray(list(self.vocabulary.values()), dtype=np.int32)
+            order = np.argsort(terms)
+            terms, term_ids = terms[order], term_ids[order]
+        save_arrays(directory, {
+            "terms": terms,
+            "term_ids": term_ids,
+            "indptr": self.indptr,
+            "doc_ids": self.doc_ids,
+            "weights": self.weights,
+        }, tag=tag, meta={"num_docs": self.num_docs})
+
+    @classmethod
+    def load(cls, directory: str, tag: str = "") -> Optional["BM25Index"]:
+        """
+        Memory-maps an index written by save, or returns None when it is missing
+        or was saved with another tag. Processes loading the same index share its pages.
+        """
+        loaded = load_arrays(directory, tag=tag)
+        if loaded is None:
+            return None
+        arrays, meta = loaded
+        index = cls.__new__(cls)
+        index.vocabulary = SortedVocabulary(arrays["terms"], arrays["term_ids"])
+        index.indptr = arrays["indptr"]
+        index.doc_ids = arrays["doc_ids"]
+        index.weights = arrays["weights"]
+        index.num_docs = int(meta["num_docs"])
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        if isinstance(self.vocabulary, SortedVocabulary):
+            vocabulary_bytes = self.vocabulary.terms.nbytes + self.vocabulary.term_ids.nbytes
+        else:
+            # Rough cost of the vocabulary dict
+            vocabulary_bytes = 100 * len(self.vocabulary)
+        return self.indptr.nbytes + self.doc_ids.nbytes + self.weights.nbytes + vocabulary_bytes
+
+    def score(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every document for the query (0 where no term matches)"""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # A term appears at most once per document, so plain fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def top_k(self, query: str, k: int) -> np.ndarray:
+        """Returns the indices of the k best scoring documents, best first"""
+        scores = self.score(query)
+        k = min(k, self.num_docs)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
@@ -1,58 +1,276 @@
 import os
-import pandas as pd
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 import sys
 sys.path.append(os.path.dirname(__file__))
-from products import get_df_by_category, ALL_CATEGORIES, Product, get_products_summary, get_categories_with_names
+import metrics
 from prompt_manager import prompt_manager
-from vector_store import get_vector_store
+
+# LangChain, Google GenAI, pandas and the catalog/vector store modules take seconds to
+# import, so they are imported on first use (or by the startup warm-up) instead of here
+if TYPE_CHECKING:
+    import pandas as pd
+    from context_builder import ProductContext
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash-lite",
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0.4
-)
+logger = logging.getLogger(__name__)
+
+# Per-stage time limits for /generate (seconds)
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", "20"))
+CATALOG_TIMEOUT = float(os.getenv("CATALOG_TIMEOUT_SECONDS", "10"))
+RESPONSE_TIMEOUT = float(os.getenv("RESPONSE_TIMEOUT_SECONDS", "30"))
+
+# Largest page_size accepted by /products/{category}
+MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", "100"))
+
+# Minimum local classifier confidence to skip the analysis LLM call (above 1 always uses the LLM)
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.25"))
+# The classifier returns up to this many categories (like the LLM), each scoring at least this share of the best one
+INTENT_CLASSIFIER_MAX_CATEGORIES = int(os.getenv("INTENT_CLASSIFIER_MAX_CATEGORIES", "5"))
+INTENT_CLASSIFIER_CATEGORY_SHARE = float(os.getenv("INTENT_CLASSIFIER_CATEGORY_SHARE", "0.8"))
+
+# Startup warm-up: load models and indexes in the background instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").strip().lower() in ("1", "true", "yes")
+WARMUP_VECTOR_STORE = os.getenv("WARMUP_VECTOR_STORE", "true").strip().lower() in ("1", "true", "yes")
+# Comma-separated categories to preload; defaults to the ones most requested in the intent cache
+WARMUP_CATEGORIES = [cat.strip() for cat in os.getenv("WARMUP_CATEGORIES", "").split(",") if cat.strip()]
+WARMUP_HOT_CATEGORIES = int(os.getenv("WARMUP_HOT_CATEGORIES", "5"))
+# Seconds between retries of failed readiness stages (0 = no retries; /ready then stays 503)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """Returns the Gemini chat model, importing LangChain and creating the client on first use"""
+    global llm
+    with _llm_lock:
+        if llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm = ChatGoogleGenerativeAI(
+                model="models/gemini-2.5-flash-lite",
+                google_api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=0.4
+            )
+    return llm
+
+# Warm-up progress reported by /ready: stage -> {"state", "seconds", "error"}
+warmup_status = {"state": "pending" if WARMUP_ON_STARTUP else "disabled", "stages": {}}
+# Set on shutdown; the warm-up thread checks it between stages
+warmup_stop = threading.Event()
+
+def hot_categories() -> List[str]:
+    from products import ALL_CATEGORIES
+    from intent_cache import get_intent_cache
+    categories = WARMUP_CATEGORIES or get_intent_cache().top_categories(WARMUP_HOT_CATEGORIES)
+    return [cat for cat in categories if cat in ALL_CATEGORIES]
+
+def preload_categories():
+    """Loads the hot categories and caches the first page of each"""
+    from products import get_products_page
+    for category in hot_categories():
+        get_products_page(category)
+
+def warm_vector_store():
+    from vector_store import get_vector_store
+    get_vector_store()
+
+def warm_intent_classifier():
+    if INTENT_CLASSIFIER_THRESHOLD <= 1:
+        from intent_classifier import get_intent_classifier
+        get_intent_classifier()
+
+def warm_llm():
+    get_llm()
+    # Compiles both chains, which every request then reuses
+    build_analysis_chain()
+    build_response_chain()
+
+def warm_product_index():
+    from product_index import get_product_index
+    get_product_index().lexical_index()
+
+def warm_intent_cache():
+    from intent_cache import get_intent_cache
+    get_intent_cache()
+
+# Everything /generate needs; the server reports ready once these have run
+READINESS_STAGES = [
+    ("llm", warm_llm),
+    ("product_index", warm_product_index),
+    ("intent_cache", warm_intent_cache),
+    ("intent_classifier", warm_intent_classifier),
+    ("hot_categories", preload_categories),
+]
+
+def run_warmup_stage(name: str, stage) -> bool:
+    """Runs one warm-up stage and records its outcome; returns whether it succeeded"""
+    started_at = time.perf_counter()
+    attempts = warmup_status["stages"].get(name, {}).get("attempts", 0) + 1
+    warmup_status["stages"][name] = {"state": "running", "attempts": attempts}
+    try:
+        stage()
+        warmup_status["stages"][name] = {"state": "done", "attempts": attempts, "seconds": round(time.perf_counter() - started_at, 3)}
+        return True
+    except Exception as e:
+        # Requests that need the stage also retry it lazily
+        logger.warning(f"Warm-up stage {name} failed: {e}")
+        warmup_status["stages"][name] = {
+            "state": "failed", "attempts": attempts, "seconds": round(time.perf_counter() - started_at, 3), "error": str(e)
+        }
+        return False
+
+def warm_up():
+    """
+    Runs the warm-up stages in order (in a worker thread).
+    
+    The server is ready once every readiness stage has succeeded. Failed ones
+    are retried every WARMUP_RETRY_SECONDS, and the state is "failed" until
+    they succeed. warmup_stop ends the warm-up between stages: a stage that
+    is already running cannot be interrupted (cancelling the asyncio task
+    that awaits it does not stop the thread), so it runs to completion.
+    """
+    warmup_status["state"] = "warming"
+    pending = list(READINESS_STAGES)
+    while pending:
+        failed = []
+        for name, stage in pending:
+            if warmup_stop.is_set():
+                return
+            if not run_warmup_stage(name, stage):
+                failed.append((name, stage))
+        pending = failed
+        if pending:
+            warmup_status["state"] = "failed"
+            if WARMUP_RETRY_SECONDS <= 0 or warmup_stop.wait(WARMUP_RETRY_SECONDS):
+                return
+    warmup_status["state"] = "ready"
+    # The vector store only serves /vector-store/search and may need a full build, so it does not gate readiness
+    if WARMUP_VECTOR_STORE and not warmup_stop.is_set():
+        run_warmup_stage("vector_store", warm_vector_store)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        warmup_stop.clear()
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    # Stops the warm-up at the next stage boundary; a running stage finishes in its thread
+    warmup_stop.set()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
 
 app = FastAPI(
     title="Smart Search Products (LangChain)",
-    description="Intelligent shopping assistant with semantic search."
+    description="Intelligent shopping assistant with semantic search.",
+    lifespan=lifespan
 )
 
 @app.get("/")
 async def health_check():
     return {"status": "ok", "message": "Smart Search Products Backend is running"}
 
-@app.post("/vector-store/rebuild")
-async def rebuild_vector_store():
-    """Rebuilds the vector store from scratch (use only when necessary)"""
+@app.get("/ready")
+async def readiness_check():
+    """200 once the startup warm-up has loaded everything /generate needs, 503 while it is loading or a stage failed"""
+    ready = warmup_status["state"] in ("ready", "disabled")
+    status = "ready" if ready else "failed" if warmup_status["state"] == "failed" else "warming"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": status, "warmup": warmup_status}
+    )
+
+async def _start_vector_store_build(background_tasks: BackgroundTasks, operation: str):
+    from vector_store import get_vector_store
+    vector_store = await asyncio.to_thread(get_vector_store)
+    # Taken here rather than checked, so two requests cannot both schedule a build; the task releases it
+    if not vector_store.try_acquire_build():
+        raise HTTPException(status_code=409, detail="A vector store build is already running")
+    build = vector_store.rebuild_store if operation == "rebuild" else vector_store.sync_store
+    background_tasks.add_task(build, lock_held=True)
+
+@app.post("/vector-store/rebuild", status_code=202)
+async def rebuild_vector_store(background_tasks: BackgroundTasks):
+    """Rebuilds the vector store from scratch in the background (use only when necessary)"""
+    try:
+        await _start_vector_store_build(background_tasks, "rebuild")
+        return {"status": "accepted", "message": "Vector store rebuild started"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/vector-store/sync", status_code=202)
+async def sync_vector_store(background_tasks: BackgroundTasks):
+    """Incrementally syncs the vector store with changed category CSVs in the background"""
+    try:
+        await _start_vector_store_build(background_tasks, "sync")
+        return {"status": "accepted", "message": "Vector store sync started"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/vector-store/status")
+async def vector_store_status():
+    """Live index generation, product count, outcome of the last rebuild/sync and search batching metrics"""
+    from vector_store import get_vector_store
+    from search_batcher import get_search_batcher_stats
     try:
-        vector_store = get_vector_store()
-        vector_store.rebuild_store()
-        return {"status": "success", "message": "Vector store rebuilt successfully"}
+        vector_store = await asyncio.to_thread(get_vector_store)
+        status = await asyncio.to_thread(vector_store.status)
+        return {**status, "batching": get_search_batcher_stats()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/vector-store/search")
-async def semantic_search(query: str, category: Optional[str] = None, limit: int = 20):
-    """Direct semantic search in the vector store"""
+async def semantic_search(
+    query: str,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    mode: str = "vector"
+):
+    """
+    Direct semantic (or hybrid semantic + BM25) search in the vector store.
+    
+    Concurrent searches are micro-batched: their queries are embedded in one call
+    and searches with the same filters share one vector store lookup.
+    """
+    from vector_store import get_vector_store, SEARCH_MODES
+    from search_batcher import get_search_batcher
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode '{mode}'. Available: {', '.join(SEARCH_MODES)}")
     try:
-        vector_store = get_vector_store()
-        results = vector_store.search_products(query, category=category, k=limit)
+        vector_store = await asyncio.to_thread(get_vector_store)
+        params = dict(category=category, k=limit, min_price=min_price, max_price=max_price, min_rating=min_rating, mode=mode)
+        batcher = get_search_batcher()
+        if batcher is not None:
+            results = await batcher.search(query, **params)
+        else:
+            results = await asyncio.to_thread(vector_store.search_products, query, **params)
         return {"results": results, "count": len(results)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -68,102 +286,294 @@ class PromptRequest(BaseModel):
     prompt: str
     budget: Optional[float] = None
 
-@app.post("/generate")
-async def generate_text(request: PromptRequest):
+async def run_stage(stage: str, awaitable, timeout: float):
+    """Awaits one /generate stage, turning a timeout into a 504 that names the stage"""
     try:
-        parser = JsonOutputParser(pydantic_object=AnalysisResult)
-        
-        analysis_template = prompt_manager.load_prompt("category_analysis")
-        
-        analysis_prompt = PromptTemplate(
-            template=analysis_template,
-            input_variables=["query", "available_categories"]
-        )
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Timed out during {stage} after {timeout:g}s")
 
-        analysis_chain = analysis_prompt | llm | parser
-        
-        analysis_data = analysis_chain.invoke({
-            "query": request.prompt,
+def no_results_message(prompt: str) -> str:
+    return f"Sorry, we couldn't find available products for **{prompt}** at the moment. Try refining your search or explore our categories."
+
+async def analyze_query(request: PromptRequest) -> Tuple[Optional[float], List[str]]:
+    """
+    Finds the categories and budget of a query; returns (max_price, relevant_categories).
+    
+    Tries the intent cache, then the local classifier, and only calls the LLM when neither is confident.
+    """
+    from products import ALL_CATEGORIES
+    from intent_cache import get_intent_cache
+    from intent_classifier import get_intent_classifier
+    
+    intent_cache = get_intent_cache()
+    with metrics.span("intent_cache"):
+        analysis_data = await asyncio.to_thread(intent_cache.get, request.prompt)
+    if analysis_data is None and INTENT_CLASSIFIER_THRESHOLD <= 1:
+        classifier = await asyncio.to_thread(get_intent_classifier)
+        with metrics.span("intent_classifier"):
+            analysis_data = classifier.analyze(
+                request.prompt, INTENT_CLASSIFIER_THRESHOLD,
+                max_categories=INTENT_CLASSIFIER_MAX_CATEGORIES, min_share=INTENT_CLASSIFIER_CATEGORY_SHARE
+            )
+    if analysis_data is None:
+        analysis_data = await run_llm_analysis(request.prompt)
+        if analysis_data.get("categories"):
+            await asyncio.to_thread(intent_cache.put, request.prompt, analysis_data)
+    
+    max_price = request.budget or analysis_data.get("budget")
+    # The LLM (or a cached answer) may list a category twice
+    relevant_categories = [cat for cat in dict.fromkeys(analysis_data.get("categories", [])) if cat in ALL_CATEGORIES]
+    return max_price, relevant_categories
+
+def build_analysis_chain():
+    from langchain_core.output_parsers import JsonOutputParser
+    
+    return prompt_manager.get_chain(
+        "category_analysis", get_llm(),
+        lambda prompt, llm: prompt | llm | JsonOutputParser(pydantic_object=AnalysisResult)
+    )
+
+async def run_llm_analysis(prompt: str) -> Dict:
+    from products import get_categories_with_names
+    
+    analysis_chain = build_analysis_chain()
+    
+    with metrics.span("category_analysis"):
+        return await run_stage("category analysis", analysis_chain.ainvoke({
+            "query": prompt,
             "available_categories": get_categories_with_names()
-        })
+        }, config={"callbacks": metrics.llm_callbacks("analysis")}), ANALYSIS_TIMEOUT)
+
+async def load_candidates(categories: List[str], max_price: Optional[float], prompt: str) -> List[Tuple[str, "pd.DataFrame"]]:
+    """Selects candidate products for up to 5 categories in one pass over the global product index"""
+    from product_index import get_product_index
+    with metrics.span("catalog_lookup"):
+        return await run_stage("catalog lookup", asyncio.to_thread(
+            lambda: get_product_index().select_candidates(categories[:5], limit=18, max_price=max_price, search_query=prompt)
+        ), CATALOG_TIMEOUT)
+
+@metrics.timed("context_build")
+def build_context(candidates: List[Tuple[str, "pd.DataFrame"]]) -> "ProductContext":
+    """Token-budgeted product list for the response prompt (see context_builder)"""
+    from context_builder import build_product_context
+    return build_product_context(candidates)
+
+def build_response_chain():
+    return prompt_manager.get_chain("response_generation", get_llm())
+
+def response_inputs(prompt: str, context_data: str, max_price: Optional[float], relevant_categories: List[str]) -> Dict:
+    budget_info = f" (with budget up to {max_price})" if max_price else ""
+    
+    relevant_cat_name = relevant_categories[0] if relevant_categories else "our categories"
+    
+    return {
+        "query": prompt,
+        "context": context_data if context_data else "NOT_FOUND",
+        "budget_info": budget_info,
+        "relevant_category_name": relevant_cat_name
+    }
+
+@app.post("/generate")
+async def generate_text(request: PromptRequest):
+    try:
+        max_price, relevant_categories = await analyze_query(request)
         
-        max_price = request.budget or analysis_data.get("budget")
-        relevant_categories = [cat for cat in analysis_data.get("categories", []) if cat in ALL_CATEGORIES]
-
-        context_data = ""
-        if relevant_categories:
-            for cat in relevant_categories[:5]: 
-                summary = get_products_summary(cat, limit=18, max_price=max_price, search_query=request.prompt)
-                if summary and "NOT_FOUND" not in summary:
-                    context_data += summary + "\n"
+        candidates = await load_candidates(relevant_categories, max_price, request.prompt)
+        context = build_context(candidates)
         
-        if not context_data or context_data.strip() == "":
+        if not context.products:
             return {
-                "response": f"Sorry, we couldn't find available products for **{request.prompt}** at the moment. Try refining your search or explore our categories.",
+                "response": no_results_message(request.prompt),
                 "detected_budget": max_price,
                 "queried_categories": relevant_categories
             }
         
-        budget_info = f" (with budget up to {max_price})" if max_price else ""
+        final_chain = build_response_chain()
         
-        relevant_cat_name = relevant_categories[0] if relevant_categories else "our categories"
-
-        response_template = prompt_manager.load_prompt("response_generation")
-        
-        final_prompt = PromptTemplate(
-            template=response_template,
-            input_variables=["query", "context", "budget_info", "relevant_category_name"]
-        )
-
-        final_chain = final_prompt | llm
-        
-        response = final_chain.invoke({
-            "query": request.prompt,
-            "context": context_data if context_data else "NOT_FOUND",
-            "budget_info": budget_info,
-            "relevant_category_name": relevant_cat_name
-        })
+        with metrics.span("response_generation"):
+            response = await run_stage(
+                "response generation",
+                final_chain.ainvoke(
+                    response_inputs(request.prompt, context.text, max_price, relevant_categories),
+                    config={"callbacks": metrics.llm_callbacks("response")}
+                ),
+                RESPONSE_TIMEOUT
+            )
 
         return {
-            "response": response.content,
+            "response": context.expand_items(response.content),
             "detected_budget": max_price,
             "queried_categories": relevant_categories
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"LangChain Error: {e}")
+        logger.error(f"LangChain Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/categories")
-async def get_categories():
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def candidate_cards(candidates: List[Tuple[str, "pd.DataFrame"]]) -> List[Dict]:
+    from catalog_store import CSV_COLUMNS
+    cards = []
+    for cat, products in candidates:
+        if products is None or products.empty:
+            continue
+        for product in products[CSV_COLUMNS].fillna("").to_dict("records"):
+            product["category"] = cat
+            cards.append(product)
+    return cards
+
+@app.post("/generate/stream")
+async def generate_text_stream(request: PromptRequest):
+    """
+    Streaming variant of /generate using Server-Sent Events.
     
-    return [{"id": cat, "name": cat} for cat in ALL_CATEGORIES]
+    Emits `analysis` (budget and categories) as soon as the first LLM call returns,
+    then `products` (candidate product cards), then `token` events with the response
+    text as it is generated, and finally `done` with the full response (or `error`).
+    [ITEM] blocks in `token` events only name product IDs; `done` has them expanded.
+    """
+    async def events():
+        try:
+            max_price, relevant_categories = await analyze_query(request)
+            yield sse_event("analysis", {"detected_budget": max_price, "queried_categories": relevant_categories})
+            
+            candidates = await load_candidates(relevant_categories, max_price, request.prompt)
+            yield sse_event("products", {"products": candidate_cards(candidates)})
+            
+            context = build_context(candidates)
+            if not context.products:
+                message = no_results_message(request.prompt)
+                yield sse_event("token", {"text": message})
+                yield sse_event("done", {"response": message})
+                return
+            
+            final_chain = build_response_chain()
+            inputs = response_inputs(request.prompt, context.text, max_price, relevant_categories)
+            
+            response_text = ""
+            stream = final_chain.astream(inputs, config={"callbacks": metrics.llm_callbacks("response")}).__aiter__()
+            started_at = time.perf_counter()
+            deadline = asyncio.get_running_loop().time() + RESPONSE_TIMEOUT
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    chunk = await run_stage("response generation", stream.__anext__(), max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                if chunk.content:
+                    if not response_text:
+                        metrics.record_span("first_token", time.perf_counter() - started_at)
+                    response_text += chunk.content
+                    yield sse_event("token", {"text": chunk.content})
+            metrics.record_span("response_generation", time.perf_counter() - started_at)
+            
+            yield sse_event("done", {"response": context.expand_items(response_text)})
+        
+        except HTTPException as e:
+            yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"LangChain Error: {e}")
+            yield sse_event("error", {"status": 500, "detail": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.get("/products/{category}")
-async def get_products_by_category(category: str, page: int = 1, page_size: int = 20):
-    df = get_df_by_category(category)
-    if df is None:
-        raise HTTPException(status_code=404, detail="Category not found")
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters of the in-memory caches"""
+    from products import get_cache_stats
+    from intent_cache import get_intent_cache
+    from intent_classifier import get_intent_classifier_stats
+    from product_index import get_product_index_stats
+    return {
+        **get_cache_stats(),
+        "intents": get_intent_cache().stats(),
+        "intent_classifier": get_intent_classifier_stats(),
+        "product_index": get_product_index_stats()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus text exposition of stage latencies, cache hit/miss counters, LLM
+    token counts, embedding and search batch sizes and memory gauges.
+    """
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/catalog/top")
+async def catalog_top(
+    category: Optional[List[str]] = Query(None),
+    sub_category: Optional[List[str]] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_ratings_count: Optional[float] = Query(None, ge=0),
+    sort: str = "rating",
+    k: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    dedupe: bool = True
+):
+    """Top-k products across any set of categories, filtered by price range, rating and number of ratings"""
+    from products import ALL_CATEGORIES, encode_json
+    from catalog_store import CSV_COLUMNS
+    from product_index import get_product_index, TOP_K_SORTS
     
-    total_products = len(df)
-    total_pages = (total_products + page_size - 1) // page_size
+    if sort not in TOP_K_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort '{sort}'. Available: {', '.join(TOP_K_SORTS)}")
+    unknown = [cat for cat in category or [] if cat not in ALL_CATEGORIES]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Categories not found: {', '.join(unknown)}")
     
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
+    def query() -> bytes:
+        index = get_product_index()
+        product_ids, total_matches = index.top_k(
+            k=k, sort=sort, dedupe=dedupe,
+            categories=category, sub_categories=sub_category,
+            min_price=min_price, max_price=max_price,
+            min_rating=min_rating, min_ratings_count=min_ratings_count
+        )
+        products = index.rows(product_ids)[["product_id", "category"] + CSV_COLUMNS].fillna("")
+        return encode_json({"products": products.to_dict("records"), "total_matches": total_matches})
     
-    df_slice = df.iloc[start_idx:end_idx].copy()
+    return Response(content=await asyncio.to_thread(query), media_type="application/json")
+
+@app.get("/categories")
+async def get_categories():
+    from products import ALL_CATEGORIES
+    return [{"id": cat, "name": cat} for cat in ALL_CATEGORIES]
+
+@app.get("/products/{category}")
+async def get_products_by_category(
+    category: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "relevance",
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0, le=5)
+):
+    """One page of a category, optionally sorted and filtered by price range and minimum rating"""
+    from products import get_products_page, PRODUCT_SORTS
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort '{sort}'. Available: {', '.join(PRODUCT_SORTS)}")
     
-    from products import clean_price
+    try:
+        encoded = await asyncio.to_thread(
+            get_products_page, category, page, page_size, cursor, sort, min_price, max_price, min_rating
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    if encoded is None:
+        raise HTTPException(status_code=404, detail="Category not found")
     
-    products_list = []
-    for _, row in df_slice.iterrows():
-        p = row.fillna("").to_dict()
-        products_list.append(p)
-        
-    return {
-        "products": products_list,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages,
-        "total_products": total_products
-    }
\ No newline at end of file
+    return Response(content=encoded, media_type="application/json")
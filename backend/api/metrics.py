@@ -0,0 +1,360 @@
+"""
+Metrics for Smart Search AI
+In-process counters, gauges, histograms and stage timing spans, exported in the Prometheus text format
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# Adds a Server-Timing header with the stage spans of each request (exposes internals, so off by default)
+SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").strip().lower() in ("1", "true", "yes")
+
+PREFIX = "smart_search_"
+
+# Seconds, from a cache lookup up to a slow LLM call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Items per batch
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 100, 250, 500, 1000)
+
+# (name, type, help, [(labels, value)]) as returned by collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# Stage spans of the current request, when the Server-Timing header is on: [(stage, seconds)]
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_spans", default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic total, one per label combination"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """
+    Bucketed distribution with sum and count, one per label combination.
+
+    observe() only bumps a single bucket; buckets are made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process plus collectors that read existing counters at scrape time.
+
+    Collectors let the caches, intent cache and vector store keep their own
+    hit/miss counters (already served by /cache/stats) instead of counting twice
+    on the hot path. A collector returns Family tuples and must not build anything.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+        # Collectors may report samples of the same family (e.g. hits of different caches)
+        families: Dict[str, Tuple[str, str, List]] = {}
+        for collector in collectors:
+            try:
+                for name, kind, help, samples in collector():
+                    families.setdefault(name, (kind, help, []))[2].extend(samples)
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {PREFIX}{name} {help}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(f"{PREFIX}{name}{_format_labels(names, tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram("stage_duration_seconds", "Time spent in each request pipeline stage", ("stage",))
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_SECONDS = registry.histogram("http_request_duration_seconds", "HTTP request latency until the response body is sent", ("route", "method"))
+LLM_CALLS = registry.counter("llm_calls_total", "LLM calls by purpose", ("call",))
+LLM_TOKENS = registry.counter("llm_tokens_total", "LLM tokens by purpose and kind (prompt or completion)", ("call", "kind"))
+EMBEDDING_BATCH_SIZE = registry.histogram("embedding_batch_size", "Texts per embedding call (query or document)", ("kind",), SIZE_BUCKETS)
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]):
+    registry.register_collector(collector)
+
+
+def record_span(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+class span:
+    """
+    Times a block as one pipeline stage: `with span("catalog_load"): ...`
+
+    Works in sync code, async code and worker threads, and costs a few
+    microseconds per block.
+    """
+
+    __slots__ = ("stage", "started_at")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if METRICS_ENABLED:
+            record_span(self.stage, time.perf_counter() - self.started_at)
+        return False
+
+
+def timed(stage: str):
+    """Decorator form of span() for synchronous functions"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_families(caches: Dict[str, Dict]) -> List[Family]:
+    """Families for cache stats dicts (LRUCache.stats() and alike), keyed by cache name"""
+    fields = [
+        ("hits", "cache_hits_total", "counter", "Cache lookups that found an entry"),
+        ("misses", "cache_misses_total", "counter", "Cache lookups that found no entry"),
+        ("evictions", "cache_evictions_total", "counter", "Entries evicted to stay within the byte budget"),
+        ("entries", "cache_entries", "gauge", "Entries currently cached"),
+        ("bytes", "cache_bytes", "gauge", "Estimated memory held by cached entries"),
+    ]
+    return [
+        (name, kind, help, [({"cache": cache}, stats[field]) for cache, stats in caches.items() if field in stats])
+        for field, name, kind, help in fields
+    ]
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Current RSS from /proc (Linux), or None where it is not available"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _collect_process() -> Iterable[Family]:
+    rss = resident_memory_bytes()
+    if rss is not None:
+        yield ("process_resident_memory_bytes", "gauge", "Resident set size of this process", [({}, rss)])
+
+
+register_collector(_collect_process)
+
+
+_usage_handler_class = None
+
+def llm_callbacks(call: str) -> List:
+    """
+    LangChain callbacks for one LLM call that count it and its prompt/completion tokens.
+
+    Token counts come from the usage_metadata of the model's message, so calls
+    to a model that does not report usage are counted without tokens.
+    """
+    global _usage_handler_class
+    if not METRICS_ENABLED:
+        return []
+    if _usage_handler_class is None:
+        # Imported here so importing this module does not load LangChain
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMUsageHandler(BaseCallbackHandler):
+            def __init__(self, call: str):
+                self.call = call
+
+            def on_llm_end(self, response, **kwargs):
+                LLM_CALLS.inc(call=self.call)
+                for generations in response.generations:
+                    for generation in generations:
+                        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                        if usage:
+                            LLM_TOKENS.inc(usage.get("input_tokens", 0), call=self.call, kind="prompt")
+                            LLM_TOKENS.inc(usage.get("output_tokens", 0), call=self.call, kind="completion")
+
+        _usage_handler_class = LLMUsageHandler
+    return [_usage_handler_class(call)]
+
+
+def _route_name(scope: Dict) -> str:
+    # Route templates (not raw paths) keep the label set bounded
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", "unmatched")
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> bytes:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them by route.
+
+    With METRICS_SERVER_TIMING it also collects the stage spans of each request
+    and sends them as a Server-Timing header. The header goes out with the
+    response start, so a streaming response only lists the stages finished by then.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        spans = [] if SERVER_TIMING else None
+        token = _request_spans.set(spans)
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if spans is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(spans, time.perf_counter() - started_at)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_spans.reset(token)
+            route = _route_name(scope)
+            HTTP_REQUESTS.inc(route=route, method=scope["method"], status=status)
+            HTTP_SECONDS.observe(time.perf_counter() - started_at, route=route, method=scope["method"])
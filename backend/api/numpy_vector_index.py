@@ -0,0 +1,301 @@
+"""
+NumPy Vector Index for Smart Search AI
+Quantized, memory-mapped embedding matrix with exact blocked or IVF top-k search
+"""
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPES = ("int8", "float16")
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+ROW_IDS_FILE = "row_ids.npy"
+CENTROIDS_FILE = "ivf_centroids.npy"
+LIST_ROWS_FILE = "ivf_list_rows.npy"
+LIST_OFFSETS_FILE = "ivf_list_offsets.npy"
+
+# Rows dequantized per matrix multiply; small enough for the float32 block to stay in cache
+BLOCK_ROWS = 1024
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k)[:k]
+        scores, rows = scores[keep], rows[keep]
+    return scores, rows
+
+
+class NumpyVectorIndex:
+    """
+    Embeddings of the catalog as one quantized matrix, read through np.memmap.
+
+    Row i holds the product with global ID row_ids[i] (see product_index).
+    row_ids is sorted and the global table is grouped by category, so each
+    category is a contiguous range of rows and a category filter is a slice.
+
+    Vectors are unit length and stored as float16, or as int8 with one scale
+    per row. Search is an exact blocked matrix multiply. When built with
+    nlist > 0, unfiltered searches use an IVF coarse quantizer instead and
+    only score the rows of the nprobe lists closest to the query.
+    """
+
+    def __init__(self, directory: Path, nprobe: int = 8):
+        self.directory = Path(directory)
+        with open(self.directory / META_FILE, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.dtype = self.meta["dtype"]
+        self.catalog_fingerprint = self.meta["catalog_fingerprint"]
+        self.model_name = self.meta.get("model_name", "")
+        self.category_ranges: Dict[str, Tuple[int, int]] = {
+            category: tuple(bounds) for category, bounds in self.meta["category_ranges"].items()
+        }
+        # Global product ID range of each category when the index was built (missing in older indexes)
+        self.product_ranges: Optional[Dict[str, Tuple[int, int]]] = None
+        if "product_ranges" in self.meta:
+            self.product_ranges = {category: tuple(bounds) for category, bounds in self.meta["product_ranges"].items()}
+        self.nprobe = nprobe
+
+        self.vectors = np.load(self.directory / VECTORS_FILE, mmap_mode="r")
+        self.scales = np.load(self.directory / SCALES_FILE, mmap_mode="r") if self.dtype == "int8" else None
+        self.row_ids = np.load(self.directory / ROW_IDS_FILE, mmap_mode="r")
+
+        self.centroids = None
+        if (self.directory / CENTROIDS_FILE).exists():
+            self.centroids = np.load(self.directory / CENTROIDS_FILE)
+            self.list_rows = np.load(self.directory / LIST_ROWS_FILE, mmap_mode="r")
+            self.list_offsets = np.load(self.directory / LIST_OFFSETS_FILE)
+
+    @classmethod
+    def build(
+        cls,
+        directory: Path,
+        embedded_batches: Iterable[Tuple[int, List[List[float]]]],
+        row_ids: np.ndarray,
+        category_ranges: Dict[str, Tuple[int, int]],
+        catalog_fingerprint: str,
+        product_ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+        model_name: str = "",
+        dtype: str = "int8",
+        nlist: int = 0,
+        nprobe: int = 8
+    ) -> "NumpyVectorIndex":
+        """
+        Writes an index into directory.
+
+        Args:
+            embedded_batches: (first row, vectors) pairs, in any order, covering every row
+            row_ids: global product ID of every row (sorted)
+            category_ranges: category -> (start row, end row)
+            catalog_fingerprint: product index fingerprint the row_ids refer to
+            product_ranges: category -> (first, end) global product ID in that product index
+            model_name: embedding model, so an index from another model is never queried
+            dtype: 'int8' (fastest to score) or 'float16' (more precise)
+            nlist: number of IVF lists (0 = exact search only)
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'. Available: {', '.join(VECTOR_DTYPES)}")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        started_at = time.time()
+        num_rows = len(row_ids)
+
+        vectors = scales = None
+        written = 0
+        for start, batch in embedded_batches:
+            batch = _normalize(np.asarray(batch, dtype=np.float32))
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    directory / VECTORS_FILE, mode="w+", dtype=dtype, shape=(num_rows, batch.shape[1])
+                )
+                if dtype == "int8":
+                    scales = np.lib.format.open_memmap(
+                        directory / SCALES_FILE, mode="w+", dtype=np.float32, shape=(num_rows,)
+                    )
+            end = start + len(batch)
+            if dtype == "int8":
+                row_scales = np.abs(batch).max(axis=1) / 127.0
+                row_scales[row_scales == 0] = 1.0
+                vectors[start:end] = np.round(batch / row_scales[:, None]).astype(np.int8)
+                scales[start:end] = row_scales
+            else:
+                vectors[start:end] = batch.astype(np.float16)
+            written += len(batch)
+
+        if written != num_rows:
+            raise RuntimeError(f"Embedded {written} of {num_rows} rows")
+        if vectors is None:
+            raise RuntimeError("No products to index")
+        vectors.flush()
+        if scales is not None:
+            scales.flush()
+        np.save(directory / ROW_IDS_FILE, np.asarray(row_ids, dtype=np.int64))
+
+        with open(directory / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({
+                "dtype": dtype,
+                "dimensions": int(vectors.shape[1]),
+                "count": num_rows,
+                "catalog_fingerprint": catalog_fingerprint,
+                "model_name": model_name,
+                "category_ranges": {category: [int(a), int(b)] for category, (a, b) in category_ranges.items()},
+                "product_ranges": {category: [int(a), int(b)] for category, (a, b) in (product_ranges or {}).items()},
+            }, f)
+
+        index = cls(directory, nprobe=nprobe)
+        if nlist > 0:
+            index._build_ivf(min(nlist, num_rows))
+            index = cls(directory, nprobe=nprobe)
+        logger.info(f"Built NumPy vector index ({num_rows} x {vectors.shape[1]} {dtype}) in {time.time() - started_at:.1f}s")
+        return index
+
+    def maps_onto(self, product_ranges: Dict[str, Tuple[int, int]], num_products: int) -> bool:
+        """
+        True when the row IDs still address the products they were built for,
+        i.e. every category spans the same global IDs in the current product
+        index. Touched or edited CSVs keep this; added or removed rows do not.
+        """
+        if self.product_ranges is not None:
+            return self.product_ranges == {category: tuple(bounds) for category, bounds in product_ranges.items()}
+        return len(self.row_ids) == 0 or int(self.row_ids[-1]) < num_products
+
+    def _rows(self, rows) -> np.ndarray:
+        """Dequantized float32 vectors for a slice or an index array of rows"""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def _build_ivf(self, nlist: int):
+        """Spherical k-means on a sample of rows, then assigns every row to its closest centroid"""
+        rng = np.random.default_rng(0)
+        num_rows = len(self.vectors)
+        sample_size = min(num_rows, nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = self._rows(np.sort(rng.choice(num_rows, sample_size, replace=False)))
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)]
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            # Empty lists are reseeded with random sample rows
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assignment = np.empty(num_rows, dtype=np.int32)
+        for start in range(0, num_rows, BLOCK_ROWS):
+            block = self._rows(slice(start, start + BLOCK_ROWS))
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        np.save(self.directory / CENTROIDS_FILE, centroids.astype(np.float32))
+        np.save(self.directory / LIST_ROWS_FILE, list_rows)
+        np.save(self.directory / LIST_OFFSETS_FILE, list_offsets)
+
+    def count(self) -> int:
+        return len(self.vectors)
+
+    def _slice_scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """(rows, queries) similarity matrix for a contiguous range of rows"""
+        scores = np.empty((end - start, len(queries)), dtype=np.float32)
+        for block_start in range(start, end, BLOCK_ROWS):
+            block_end = min(block_start + BLOCK_ROWS, end)
+            scores[block_start - start:block_end - start] = self._rows(slice(block_start, block_end)) @ queries.T
+        return scores
+
+    def _row_scores(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """(rows, queries) similarity matrix for the given rows"""
+        scores = np.empty((len(rows), len(queries)), dtype=np.float32)
+        for block_start in range(0, len(rows), BLOCK_ROWS):
+            block_rows = rows[block_start:block_start + BLOCK_ROWS]
+            scores[block_start:block_start + len(block_rows)] = self._rows(block_rows) @ queries.T
+        return scores
+
+    def _hits(self, scores: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        scores, rows = _top_k(scores, rows, k)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(self.row_ids[row]), float(score)) for row, score in zip(rows[order], scores[order])]
+
+    def search(
+        self,
+        query_vector: List[float],
+        k: int = 20,
+        category: Optional[str] = None,
+        product_mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (product ID, cosine similarity) pairs, best first.
+
+        Args:
+            query_vector: query embedding
+            category: restrict to one category (a slice of the matrix)
+            product_mask: boolean mask over global product IDs (e.g. price/rating filters)
+        """
+        return self.search_batch([query_vector], k=k, category=category, product_mask=product_mask)[0]
+
+    def search_batch(
+        self,
+        query_vectors: List[List[float]],
+        k: int = 20,
+        category: Optional[str] = None,
+        product_mask: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        search() for several queries with the same filters.
+
+        Exact searches read and dequantize every block once for the whole batch
+        (one matrix-matrix product); IVF searches probe per query.
+        """
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1))
+        if category is not None:
+            if category not in self.category_ranges:
+                return [[] for _ in queries]
+            start, end = self.category_ranges[category]
+        else:
+            start, end = 0, self.count()
+
+        if product_mask is None and category is None and self.centroids is not None:
+            results = []
+            for query in queries:
+                probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+                rows = np.sort(np.concatenate([
+                    self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+                ]))
+                results.append(self._hits(self._row_scores(query[None, :], rows)[:, 0], rows, k))
+            return results
+
+        if product_mask is not None:
+            rows = start + np.flatnonzero(product_mask[self.row_ids[start:end]])
+            scores = self._row_scores(queries, rows)
+        else:
+            rows = np.arange(start, end)
+            scores = self._slice_scores(queries, start, end)
+        return [self._hits(scores[:, column], rows, k) for column in range(len(queries))]
+
+    def nbytes(self) -> int:
+        total = self.vectors.nbytes + self.row_ids.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        if self.centroids is not None:
+            total += self.centroids.nbytes + self.list_rows.nbytes + self.list_offsets.nbytes
+        return int(total)
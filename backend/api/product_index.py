@@ -0,0 +1,501 @@
+"""
+Product Index for Smart Search AI
+Global product table over all categories with secondary indexes for cross-category queries
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import metrics
+from catalog_store import CATALOG_FORMAT_VERSION, CatalogStore, CSV_COLUMNS, NUMERIC_COLUMNS
+from lexical_index import BM25Index
+from shared_arrays import FileLock, load_arrays, save_arrays
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_TABLE_FILE = "_all_products.arrow"
+LEXICAL_INDEX_FILE = "_all_products.bm25"
+DERIVED_ARRAYS_DIR = "_all_products.arrays"
+# Held while one process builds the catalog indexes, so other workers wait and load them
+BUILD_LOCK_FILE = ".build.lock"
+
+_FINGERPRINT_KEY = b"source_fingerprint"
+_CATEGORIES_KEY = b"categories"
+
+_SCHEMA = pa.schema(
+    [(column, pa.float64() if column == "ratings" else pa.string()) for column in CSV_COLUMNS]
+    + [(column, pa.float64()) for column in NUMERIC_COLUMNS.values()]
+)
+
+# How long get_product_index trusts its last catalog check (0 = stat the CSVs on every call)
+CATALOG_RELOAD_SECONDS = float(os.getenv("CATALOG_RELOAD_SECONDS", "1"))
+
+# Sort orders of top_k: rating (desc, ties by number of ratings), price or number of ratings
+TOP_K_SORTS = ("rating", "price_asc", "price_desc", "popularity")
+
+
+def catalog_fingerprint(catalog_store: CatalogStore, categories: List[str]) -> str:
+    """Hash of the name, size and mtime of every category CSV (and of the compiled format); a missing CSV counts as empty"""
+    digest = hashlib.sha256(f"format\0{CATALOG_FORMAT_VERSION}\n".encode("utf-8"))
+    for category in sorted(set(categories)):
+        try:
+            stat = os.stat(catalog_store.csv_path(category))
+            digest.update(f"{category}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+        except FileNotFoundError:
+            digest.update(f"{category}\0missing\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def catalog_build_lock(catalog_store: CatalogStore) -> FileLock:
+    """Cross-process lock for building the global table and the indexes derived from the catalog"""
+    return FileLock(os.path.join(catalog_store.store_dir, BUILD_LOCK_FILE))
+
+
+def _descending(values: np.ndarray) -> np.ndarray:
+    """Sort key that orders values descending with NaN last"""
+    return np.where(np.isnan(values), np.inf, -values)
+
+
+def _ascending(values: np.ndarray) -> np.ndarray:
+    """Sort key that orders values ascending with NaN last"""
+    return np.where(np.isnan(values), np.inf, values)
+
+
+def _bitmap_matrix(codes: np.ndarray, num_codes: int) -> np.ndarray:
+    """One packed bitmap row per code"""
+    if num_codes == 0:
+        return np.zeros((0, (len(codes) + 7) // 8), dtype=np.uint8)
+    return np.stack([np.packbits(codes == code) for code in range(num_codes)])
+
+
+class ProductIndex:
+    """
+    Every product of every category in one memory-mapped Arrow table.
+
+    A product ID is the row number in that table. Categories are stored in
+    sorted order and rows keep their CSV order, so IDs only change when the
+    catalog data does. On top of the table it keeps:
+
+    - numeric price, rating and rating-count arrays
+    - price_order / sorted_prices for range lookups with searchsorted
+    - precomputed orders for every top_k sort
+    - packed bitmaps per category and per sub_category
+    - item_ids shared by listings of the same ASIN, for deduplication
+
+    The product text columns stay in the mapped file and are only
+    materialized for the rows a query returns.
+    """
+
+    def __init__(
+        self,
+        table: pa.Table,
+        categories: List[str],
+        fingerprint: str,
+        store_dir: Optional[str] = None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+        sub_categories: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            arrays, sub_categories: derived arrays loaded by open(); computed from the table when omitted
+        """
+        self.table = table
+        self.categories = categories
+        self.fingerprint = fingerprint
+        # Where derived indexes (the global BM25 index) are cached; None keeps them in memory only
+        self.store_dir = store_dir
+        self.num_products = table.num_rows
+
+        if arrays is None:
+            arrays, sub_categories = self._derive_arrays(table, len(categories))
+        self.arrays = arrays
+        self.sub_categories = sub_categories
+
+        self.category_codes = arrays["category_codes"]
+        self.prices = arrays["prices"]
+        self.ratings = arrays["ratings"]
+        self.rating_counts = arrays["rating_counts"]
+
+        self.price_order = arrays["price_order"]
+        self.sorted_prices = arrays["sorted_prices"]
+        self.num_priced = int(np.count_nonzero(~np.isnan(self.prices)))
+
+        self.orders = {
+            "rating": arrays["order_rating"],
+            "price_asc": self.price_order,
+            "price_desc": arrays["order_price_desc"],
+            "popularity": arrays["order_popularity"],
+        }
+
+        # Rows of the bitmap matrices, so mapped matrices stay mapped
+        self.category_bitmaps = dict(zip(categories, arrays["category_bitmaps"]))
+        self.sub_category_bitmaps = dict(zip(sub_categories, arrays["sub_category_bitmaps"]))
+        self.category_ranges = {
+            category: (int(start), int(end))
+            for category, start, end in zip(
+                categories,
+                np.searchsorted(self.category_codes, np.arange(len(categories)), side="left"),
+                np.searchsorted(self.category_codes, np.arange(len(categories)), side="right")
+            )
+        }
+
+        self.item_ids = arrays["item_ids"]
+
+        self._lexical_index = None
+        self._lexical_lock = threading.Lock()
+
+    @staticmethod
+    def _derive_arrays(table: pa.Table, num_categories: int) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """Computes the sort orders, bitmaps and item IDs of a table; returns (arrays, sub_category names)"""
+        category_codes = table.column("category_code").to_numpy()
+        prices = table.column("actual_price_value").to_numpy()
+        ratings = table.column("ratings_value").to_numpy()
+        rating_counts = table.column("no_of_ratings_value").to_numpy()
+        price_order = np.argsort(_ascending(prices), kind="stable")
+
+        sub_category_codes, sub_categories = pd.factorize(
+            table.column("sub_category").to_pandas(), use_na_sentinel=True
+        )
+        links = table.column("link").to_pandas()
+        asins = links.str.extract(r"/dp/([A-Z0-9]{10})", expand=False).fillna(links)
+
+        arrays = {
+            "category_codes": category_codes,
+            "prices": prices,
+            "ratings": ratings,
+            "rating_counts": rating_counts,
+            "price_order": price_order,
+            "sorted_prices": prices[price_order],
+            "order_rating": np.lexsort((_descending(rating_counts), _descending(ratings))),
+            "order_price_desc": np.argsort(_descending(prices), kind="stable"),
+            "order_popularity": np.lexsort((_descending(ratings), _descending(rating_counts))),
+            "category_bitmaps": _bitmap_matrix(category_codes, num_categories),
+            "sub_category_bitmaps": _bitmap_matrix(sub_category_codes, len(sub_categories)),
+            "item_ids": pd.factorize(asins)[0].astype(np.int64),
+        }
+        return arrays, [str(sub_category) for sub_category in sub_categories]
+
+    @classmethod
+    def build(cls, catalog_store: CatalogStore, categories: List[str]) -> "ProductIndex":
+        """Concatenates the compiled categories into the global table and writes it next to them"""
+        started_at = time.time()
+        # A category listed twice would add its rows twice
+        categories = sorted(set(categories))
+        fingerprint = catalog_fingerprint(catalog_store, categories)
+
+        tables = []
+        for code, category in enumerate(categories):
+            df = catalog_store.load_columns(category, CSV_COLUMNS + list(NUMERIC_COLUMNS.values()))
+            if df is None:
+                df = pd.DataFrame(columns=CSV_COLUMNS + list(NUMERIC_COLUMNS.values()))
+            table = pa.Table.from_pandas(df, preserve_index=False).cast(_SCHEMA)
+            tables.append(table.append_column("category_code", pa.array(np.full(table.num_rows, code, dtype=np.int16))))
+
+        table = pa.concat_tables(tables).combine_chunks()
+        table = table.replace_schema_metadata({
+            _FINGERPRINT_KEY: fingerprint.encode(),
+            _CATEGORIES_KEY: json.dumps(categories).encode("utf-8"),
+        })
+
+        os.makedirs(catalog_store.store_dir, exist_ok=True)
+        path = os.path.join(catalog_store.store_dir, GLOBAL_TABLE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # One record batch, so take() on a mapped column never has to concatenate chunks
+        feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=max(table.num_rows, 1))
+        os.replace(tmp_path, path)
+
+        logger.info(f"Built global product table ({table.num_rows} products) in {time.time() - started_at:.1f}s")
+        return cls.open(catalog_store).persist()
+
+    @classmethod
+    def open(cls, catalog_store: CatalogStore, mapped_only: bool = False) -> Optional["ProductIndex"]:
+        """
+        Memory-maps the global table written by build(), or returns None if there is none.
+
+        The derived arrays are mapped too when they were saved for this table
+        (see persist); otherwise they are computed in memory, or with
+        mapped_only, None is returned.
+        """
+        path = os.path.join(catalog_store.store_dir, GLOBAL_TABLE_FILE)
+        if not os.path.exists(path):
+            return None
+        table = feather.read_table(path, memory_map=True)
+        metadata = table.schema.metadata or {}
+        categories = json.loads(metadata[_CATEGORIES_KEY].decode("utf-8"))
+        fingerprint = metadata[_FINGERPRINT_KEY].decode()
+
+        loaded = load_arrays(os.path.join(catalog_store.store_dir, DERIVED_ARRAYS_DIR), tag=fingerprint)
+        if loaded is None:
+            if mapped_only:
+                return None
+            return cls(table, categories, fingerprint, store_dir=catalog_store.store_dir)
+        arrays, meta = loaded
+        return cls(
+            table, categories, fingerprint, store_dir=catalog_store.store_dir,
+            arrays=arrays, sub_categories=meta["sub_categories"]
+        )
+
+    def numeric_columns(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Price, rating and rating-count arrays of a range of products, by their DataFrame column names"""
+        return {
+            "actual_price_value": self.prices[start:end],
+            "ratings_value": self.ratings[start:end],
+            "no_of_ratings_value": self.rating_counts[start:end],
+        }
+
+    @property
+    def mapped(self) -> bool:
+        """True when the derived arrays are read from files shared with other processes"""
+        return isinstance(self.arrays["price_order"], np.memmap)
+
+    def persist(self) -> "ProductIndex":
+        """
+        Saves the derived arrays next to the table and returns an index that maps them.
+
+        Every worker process that opens the index afterwards shares those pages
+        instead of computing and holding its own copy.
+        """
+        if self.store_dir is None or self.mapped:
+            return self
+        directory = os.path.join(self.store_dir, DERIVED_ARRAYS_DIR)
+        try:
+            save_arrays(directory, self.arrays, tag=self.fingerprint, meta={"sub_categories": self.sub_categories})
+        except OSError as e:
+            logger.warning(f"Could not save product index arrays: {e}")
+            return self
+        arrays, meta = load_arrays(directory, tag=self.fingerprint)
+        return ProductIndex(
+            self.table, self.categories, self.fingerprint, store_dir=self.store_dir,
+            arrays=arrays, sub_categories=meta["sub_categories"]
+        )
+
+    def _bitmap_mask(self, bitmaps: Dict[str, np.ndarray], keys: List[str]) -> np.ndarray:
+        packed = [bitmaps[key] for key in keys if key in bitmaps]
+        if not packed:
+            return np.zeros(self.num_products, dtype=bool)
+        combined = np.bitwise_or.reduce(packed) if len(packed) > 1 else packed[0]
+        return np.unpackbits(combined, count=self.num_products).view(bool)
+
+    def mask(
+        self,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        min_ratings_count: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Boolean mask of the products matching every given filter.
+
+        Products without a parseable price, rating or rating count never
+        match a filter on that value.
+        """
+        mask = np.ones(self.num_products, dtype=bool)
+        if categories:
+            mask &= self._bitmap_mask(self.category_bitmaps, categories)
+        if sub_categories:
+            mask &= self._bitmap_mask(self.sub_category_bitmaps, sub_categories)
+        if min_price is not None or max_price is not None:
+            start = np.searchsorted(self.sorted_prices, min_price, side="left") if min_price is not None else 0
+            end = np.searchsorted(self.sorted_prices, max_price, side="right") if max_price is not None else self.num_priced
+            in_range = np.zeros(self.num_products, dtype=bool)
+            in_range[self.price_order[start:min(end, self.num_priced)]] = True
+            mask &= in_range
+        if min_rating is not None:
+            mask &= self.ratings >= min_rating
+        if min_ratings_count is not None:
+            mask &= self.rating_counts >= min_ratings_count
+        return mask
+
+    def top_k(self, k: int = 20, sort: str = "rating", dedupe: bool = True, **filters) -> Tuple[np.ndarray, int]:
+        """
+        Returns (product IDs of the best k matches, total number of matches).
+
+        Walks the precomputed order for `sort` and keeps the matching products.
+        With dedupe, listings of the same ASIN in several categories
+        (e.g. 'Headphones' and 'All Electronics') are returned once.
+        """
+        mask = self.mask(**filters)
+        order = self.orders[sort]
+        matches = order[mask[order]]
+        if not dedupe:
+            return matches[:k], len(matches)
+
+        # Grow the window until it holds k distinct items, so only a prefix is deduplicated
+        window = k * 4
+        while True:
+            candidates = matches[:window]
+            _, first = np.unique(self.item_ids[candidates], return_index=True)
+            distinct = candidates[np.sort(first)]
+            if len(distinct) >= k or window >= len(matches):
+                return distinct[:k], len(matches)
+            window *= 4
+
+    def lexical_index(self) -> BM25Index:
+        """
+        BM25 index over every product name, mapped from the store or built (and saved) on first use.
+
+        When several worker processes start at once, one builds and saves it
+        while the others wait for the build lock and then map the saved files.
+        """
+        with self._lexical_lock:
+            if self._lexical_index is None:
+                if self.store_dir is None:
+                    self._lexical_index = self._build_lexical_index()
+                    return self._lexical_index
+                path = os.path.join(self.store_dir, LEXICAL_INDEX_FILE)
+                index = BM25Index.load(path, tag=self.fingerprint)
+                if index is None:
+                    with FileLock(os.path.join(self.store_dir, BUILD_LOCK_FILE)):
+                        index = BM25Index.load(path, tag=self.fingerprint)
+                        if index is None:
+                            index = self._build_lexical_index()
+                            try:
+                                index.save(path, tag=self.fingerprint)
+                                index = BM25Index.load(path, tag=self.fingerprint)
+                            except OSError as e:
+                                logger.warning(f"Could not save global lexical index: {e}")
+                self._lexical_index = index
+        return self._lexical_index
+
+    def _build_lexical_index(self) -> BM25Index:
+        started_at = time.time()
+        index = BM25Index(self.table.column("name").to_pylist())
+        logger.info(f"Built global lexical index in {time.time() - started_at:.1f}s")
+        return index
+
+    def rows(self, product_ids: np.ndarray) -> pd.DataFrame:
+        """Materializes the given products with their CSV columns, product_id and category"""
+        df = self.table.select(CSV_COLUMNS + list(NUMERIC_COLUMNS.values())).take(
+            pa.array(product_ids, type=pa.int64())
+        ).to_pandas()
+        df.insert(0, "product_id", product_ids)
+        df["category"] = [self.categories[code] for code in self.category_codes[product_ids]]
+        return df
+
+    def select_candidates(
+        self,
+        categories: List[str],
+        limit: int = 18,
+        max_price: Optional[float] = None,
+        search_query: Optional[str] = None
+    ) -> List[Tuple[str, pd.DataFrame]]:
+        """
+        Candidate products for several categories in one pass (the /generate context).
+
+        Same selection as products.select_products: unparseable prices pass the
+        budget filter and, with a query, rows are ranked by BM25 score, then
+        rating (desc) and price (asc); otherwise they keep catalog order.
+        A repeated category is returned once.
+        """
+        # searchsorted would return a repeated category's slice once per repeat
+        categories = list(dict.fromkeys(categories))
+        codes = [self.categories.index(category) for category in categories if category in self.category_bitmaps]
+        ids = np.flatnonzero(self._bitmap_mask(self.category_bitmaps, [self.categories[code] for code in codes]))
+        if max_price:
+            ids = ids[~(self.prices[ids] > max_price)]
+
+        group = self.category_codes[ids]
+        if search_query and len(ids):
+            scores = self.lexical_index().score(search_query)[ids]
+            ratings = np.nan_to_num(self.ratings[ids], nan=0.0)
+            prices = np.nan_to_num(self.prices[ids], nan=np.inf)
+            ids = ids[np.lexsort((prices, -ratings, -scores, group))]
+            group = self.category_codes[ids]
+
+        # ids are grouped by category code; keep the first `limit` of each group
+        starts = np.searchsorted(group, codes, side="left")
+        ends = np.searchsorted(group, codes, side="right")
+        selected = np.concatenate(
+            [ids[start:min(start + limit, end)] for start, end in zip(starts, ends)]
+        ) if codes else ids[:0]
+        rows = self.rows(selected)
+
+        by_category = {category: group_rows for category, group_rows in rows.groupby("category", sort=False)}
+        return [
+            (category, by_category.get(category, rows.iloc[:0]).reset_index(drop=True))
+            for category in categories
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "products": self.num_products,
+            "categories": len(self.categories),
+            "sub_categories": len(self.sub_category_bitmaps),
+            "table_bytes": self.table.nbytes,
+            "bitmap_bytes": sum(bitmap.nbytes for bitmap in self.category_bitmaps.values())
+            + sum(bitmap.nbytes for bitmap in self.sub_category_bitmaps.values()),
+            "lexical_index_bytes": self._lexical_index.nbytes if self._lexical_index is not None else 0,
+        }
+
+
+# Global instance
+product_index = None
+_product_index_lock = threading.Lock()
+_checked_at = 0.0
+
+def get_product_index(refresh: bool = False) -> ProductIndex:
+    """
+    Returns the global product index, (re)building it when a category CSV changed.
+
+    The fingerprint check stats every CSV, so it runs at most every
+    CATALOG_RELOAD_SECONDS; calls in between return the current index without
+    taking the lock. refresh=True checks now (index builds and syncs use it).
+    The check is also how worker processes follow each other: when one of
+    them rebuilds the table, the others see the new fingerprint on their
+    next check and map the new files.
+    """
+    global product_index, _checked_at
+    index = product_index
+    if index is not None and not refresh and time.monotonic() - _checked_at < CATALOG_RELOAD_SECONDS:
+        return index
+
+    from products import ALL_CATEGORIES, catalog_store
+
+    with _product_index_lock:
+        if product_index is not None and not refresh and time.monotonic() - _checked_at < CATALOG_RELOAD_SECONDS:
+            return product_index
+        fingerprint = catalog_fingerprint(catalog_store, ALL_CATEGORIES)
+        if product_index is None or product_index.fingerprint != fingerprint:
+            index = ProductIndex.open(catalog_store, mapped_only=True)
+            if index is None or index.fingerprint != fingerprint:
+                # One worker process builds; the others wait here and then map its files
+                with catalog_build_lock(catalog_store):
+                    index = ProductIndex.open(catalog_store)
+                    if index is None or index.fingerprint != fingerprint:
+                        index = ProductIndex.build(catalog_store, ALL_CATEGORIES)
+                    else:
+                        index = index.persist()
+            product_index = index
+        _checked_at = time.monotonic()
+    return product_index
+
+def get_product_index_stats() -> Dict:
+    """Index sizes, without building the index if nothing used it yet"""
+    if product_index is None:
+        return {"built": False}
+    return {"built": True, **product_index.stats()}
+
+def _collect_metrics():
+    if product_index is None:
+        return []
+    stats = product_index.stats()
+    return [
+        ("product_index_products", "gauge", "Products in the global product table", [({}, stats["products"])]),
+        # The table is memory-mapped, so its bytes are only resident once read
+        ("product_index_bytes", "gauge", "Size of the global product table and its indexes", [
+            ({"part": part}, stats[f"{part}_bytes"]) for part in ("table", "bitmap", "lexical_index")
+        ]),
+    ]
+
+metrics.register_collector(_collect_metrics)
@@ -1,11 +1,66 @@
 import os
+import json
+import base64
+import hashlib
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pydantic import BaseModel
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import metrics
+from cache import LRUCache
+from catalog_store import CatalogStore, CSV_COLUMNS, NUMERIC_COLUMNS
+from lexical_index import BM25Index
+from product_index import get_product_index
+
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
 
-_LOADED_PRODUCTS: Dict[str, pd.DataFrame] = {}
+# Serve pages and product summaries from the memory-mapped global product index instead of
+# per-process category DataFrames, so several uvicorn workers share one copy of the catalog
+SHARED_CATALOG = os.getenv("SHARED_CATALOG", "false").strip().lower() in ("1", "true", "yes")
+
+catalog_store = CatalogStore(DATA_DIR)
+
+def _dataframe_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+# Keyed by (category, csv mtime) so an edited CSV is never served from a stale entry
+_LOADED_PRODUCTS = LRUCache(
+    max_bytes=int(os.getenv("PRODUCTS_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    sizeof=_dataframe_nbytes
+)
+
+# BM25 indexes over product names, built lazily per category and keyed like _LOADED_PRODUCTS
+_LEXICAL_INDEXES = LRUCache(
+    max_bytes=int(os.getenv("LEXICAL_CACHE_MAX_MB", "16")) * 1024 * 1024,
+    sizeof=lambda index: index.nbytes
+)
+
+# Row orders of sorted/filtered category views, keyed by (category, csv mtime, sort, filters)
+_PRODUCT_VIEWS = LRUCache(
+    max_bytes=int(os.getenv("PRODUCT_VIEWS_CACHE_MAX_MB", "16")) * 1024 * 1024,
+    sizeof=lambda rows: rows.nbytes
+)
+
+# Encoded JSON pages of /products/{category}, keyed by the view key plus (offset, page_size)
+_PRODUCT_PAGES = LRUCache(
+    max_bytes=int(os.getenv("PRODUCT_PAGES_CACHE_MAX_MB", "32")) * 1024 * 1024,
+    sizeof=len
+)
+
+# Sort orders accepted by get_products_page: name -> (numeric column, descending)
+PRODUCT_SORTS = {
+    "relevance": None,
+    "price_asc": ("actual_price_value", False),
+    "price_desc": ("actual_price_value", True),
+    "rating": ("ratings_value", True),
+    "popularity": ("no_of_ratings_value", True),
+}
 
 def get_available_categories() -> List[str]:
     """Returns only the list of categories that have data (files > 100 bytes)."""
@@ -21,31 +76,71 @@ def get_available_categories() -> List[str]:
     return categories
 
 def get_df_by_category(category: str) -> Optional[pd.DataFrame]:
-    """Loads the DataFrame of a specific category on demand."""
-    if category in _LOADED_PRODUCTS:
-        return _LOADED_PRODUCTS[category]
-    
-    file_path = os.path.join(DATA_DIR, f"{category}.csv")
+    """Loads the DataFrame of a specific category on demand from the compiled catalog."""
+    file_path = catalog_store.csv_path(category)
     if os.path.exists(file_path):
         try:
-            if os.path.getsize(file_path) > 100:
-                df = pd.read_csv(file_path)
-                if len(_LOADED_PRODUCTS) > 5:
-                    _LOADED_PRODUCTS.clear()
-                
-                _LOADED_PRODUCTS[category] = df
+            stat = os.stat(file_path)
+            if stat.st_size > 100:
+                cache_key = (category, stat.st_mtime_ns)
+                df = _LOADED_PRODUCTS.get(cache_key)
+                if df is None:
+                    with metrics.span("catalog_load"):
+                        df = catalog_store.load(category)
+                    _LOADED_PRODUCTS.put(cache_key, df)
                 return df
             else:
-                return pd.DataFrame(columns=['name','main_category','sub_category','image','link','ratings','no_of_ratings','discount_price','actual_price'])
+                return pd.DataFrame(columns=CSV_COLUMNS + list(NUMERIC_COLUMNS.values()))
         except Exception as e:
             print(f"Error loading {category}: {e}")
     return None
 
+def get_lexical_index(category: str) -> Optional[BM25Index]:
+    """Returns the BM25 index over the product names of a category, building it on first use."""
+    df = get_df_by_category(category)
+    if df is None:
+        return None
+    
+    cache_key = (category, os.stat(catalog_store.csv_path(category)).st_mtime_ns)
+    index = _LEXICAL_INDEXES.get(cache_key)
+    if index is None or index.num_docs != len(df):
+        index = BM25Index(df['name'].tolist())
+        _LEXICAL_INDEXES.put(cache_key, index)
+    return index
+
+def get_cache_stats() -> Dict:
+    """Returns hit/miss/eviction counters of the in-memory caches."""
+    return {
+        "dataframes": _LOADED_PRODUCTS.stats(),
+        "lexical_indexes": _LEXICAL_INDEXES.stats(),
+        "product_views": _PRODUCT_VIEWS.stats(),
+        "product_pages": _PRODUCT_PAGES.stats()
+    }
+
+def _collect_metrics():
+    # dataframes bytes is the deep memory usage of the category DataFrames held in memory
+    return metrics.cache_families(get_cache_stats())
+
+metrics.register_collector(_collect_metrics)
+
 def get_categories_with_names() -> str:
     """Returns a formatted string 'ID: Name' for the AI prompt."""
-    return "\n".join([f"- {cat}" for cat in ALL_CATEGORIES])
+    return "\n".join([f"- {cat}" for cat in get_all_categories()])
 
-ALL_CATEGORIES = get_available_categories()
+_all_categories = None
+
+def get_all_categories() -> List[str]:
+    """Categories with data, listed from DATA_DIR on first use and then reused"""
+    global _all_categories
+    if _all_categories is None:
+        _all_categories = get_available_categories()
+    return _all_categories
+
+def __getattr__(name: str):
+    # ALL_CATEGORIES is resolved lazily so importing this module does not scan the data directory
+    if name == "ALL_CATEGORIES":
+        return get_all_categories()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class Categories(BaseModel):
     all_categories: List[str]
@@ -72,24 +167,179 @@ def clean_price(price_str: str) -> float:
     except:
         return 0.0
 
-def get_products_summary(category: str, limit: int = 18, max_price: float = None, search_query: str = None) -> str:
+def rank_rows(category: str, df: pd.DataFrame, rows: np.ndarray, search_query: str) -> np.ndarray:
+    """Orders candidate rows by BM25 relevance to the query, then by rating (desc) and price (asc)."""
+    index = get_lexical_index(category)
+    scores = index.score(search_query)[rows]
+    ratings = np.nan_to_num(df['ratings_value'].to_numpy()[rows], nan=0.0)
+    prices = np.nan_to_num(df['actual_price_value'].to_numpy()[rows], nan=np.inf)
+    return rows[np.lexsort((prices, -ratings, -scores))]
+
+def select_products(category: str, limit: int = 18, max_price: float = None, search_query: str = None) -> Optional[pd.DataFrame]:
+    """Returns the best candidate rows of a category for a query (None if the category can't be loaded)."""
+    if SHARED_CATALOG:
+        if not os.path.exists(catalog_store.csv_path(category)):
+            return None
+        # Ranked with catalog-wide BM25 statistics, like the /generate context
+        return get_product_index().select_candidates([category], limit=limit, max_price=max_price, search_query=search_query)[0][1]
+    
     df = get_df_by_category(category)
     if df is None:
-        return f"Category '{category}' not found or error loading."
-    
-    filtered_df = df.copy()
+        return None
     
     if max_price:
-        filtered_df = filtered_df[filtered_df['actual_price'].apply(clean_price) <= max_price]
+        # Unparseable prices pass the filter, as they did when clean_price() mapped them to 0.0
+        rows = np.flatnonzero(~(df['actual_price_value'].to_numpy() > max_price))
+    else:
+        rows = np.arange(len(df))
+    
+    if search_query and len(rows):
+        rows = rank_rows(category, df, rows, search_query)
+    
+    return df.iloc[rows[:limit]]
 
-    if filtered_df.empty:
+def format_products_summary(category: str, products: Optional[pd.DataFrame]) -> str:
+    """Formats candidate rows as the product context block of the response prompt."""
+    if products is None:
+        return f"Category '{category}' not found or error loading."
+    if products.empty:
         return "NOT_FOUND"
     
-    products = filtered_df.head(30)
+    lines = [f"Real Products Available in category '{category}':"]
+    lines.extend(
+        f"- PRODUCT_NAME: {name} PRODUCT_PRICE: {price} PRODUCT_RATING: {rating} PRODUCT_IMAGE: {image}"
+        for name, price, rating, image in zip(
+            products['name'].tolist(),
+            products['actual_price'].tolist(),
+            products['ratings'].tolist(),
+            products['image'].tolist()
+        )
+    )
+    
+    return "\n".join(lines) + "\n"
+
+@metrics.timed("products_summary")
+def get_products_summary(category: str, limit: int = 18, max_price: float = None, search_query: str = None) -> str:
+    products = select_products(category, limit=limit, max_price=max_price, search_query=search_query)
+    return format_products_summary(category, products)
+
+def encode_json(payload: Dict) -> bytes:
+    """Serializes a response payload, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def view_key(category: str, sort: str, min_price: float = None, max_price: float = None, min_rating: float = None) -> str:
+    """Short hash of the category, sort and filters a cursor was issued for."""
+    params = json.dumps([category, sort, min_price, max_price, min_rating])
+    return hashlib.sha1(params.encode()).hexdigest()[:12]
+
+def encode_cursor(version: int, offset: int, view: str) -> str:
+    """Opaque cursor pointing at a row offset of a specific CSV version and view (see view_key)."""
+    return base64.urlsafe_b64encode(f"{version}:{offset}:{view}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, int, str]:
+    """Returns (version, offset, view) of a cursor; raises ValueError if it is malformed."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    version, offset, view = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+    version, offset = int(version), int(offset)
+    if offset < 0:
+        raise ValueError("negative offset")
+    return version, offset, view
+
+def get_product_view(category: str, columns, version: int, sort: str, min_price: float = None,
+                     max_price: float = None, min_rating: float = None) -> np.ndarray:
+    """
+    Row positions of a category after filtering and sorting, computed once per CSV version.
+    
+    columns is the category DataFrame or a dict of its numeric column arrays (see ProductIndex.numeric_columns).
+    """
+    cache_key = (category, version, sort, min_price, max_price, min_rating)
+    rows = _PRODUCT_VIEWS.get(cache_key)
+    if rows is not None:
+        return rows
+    
+    # Products without a parseable price or rating never match a price or rating filter
+    prices = np.asarray(columns['actual_price_value'])
+    mask = np.ones(len(prices), dtype=bool)
+    if min_price is not None:
+        mask &= prices >= min_price
+    if max_price is not None:
+        mask &= prices <= max_price
+    if min_rating is not None:
+        mask &= np.asarray(columns['ratings_value']) >= min_rating
+    rows = np.flatnonzero(mask)
+    
+    sort_spec = PRODUCT_SORTS[sort]
+    if sort_spec is not None and len(rows):
+        column, descending = sort_spec
+        values = np.asarray(columns[column])[rows]
+        # Missing values go last in both directions; the stable sort keeps file order for ties
+        keys = np.where(np.isnan(values), np.inf, -values if descending else values)
+        rows = rows[np.argsort(keys, kind="stable")]
+    
+    _PRODUCT_VIEWS.put(cache_key, rows)
+    return rows
+
+def get_products_page(category: str, page: int = 1, page_size: int = 20, cursor: str = None, sort: str = "relevance",
+                      min_price: float = None, max_price: float = None, min_rating: float = None) -> Optional[bytes]:
+    """
+    Returns one page of a category as encoded JSON, or None if the category does not exist.
+    
+    Pages are addressed by page number or by a cursor from a previous page's next_cursor
+    (which takes precedence). Encoded pages are cached per CSV version, view and offset,
+    so repeated browsing is a cache lookup. Raises ValueError for an invalid or stale cursor.
+    
+    With SHARED_CATALOG, rows come from the global product index and only the
+    rows of the page are materialized.
+    """
+    file_path = catalog_store.csv_path(category)
+    if SHARED_CATALOG:
+        if not os.path.exists(file_path):
+            return None
+        df = None
+    else:
+        df = get_df_by_category(category)
+        if df is None:
+            return None
+    
+    version = os.stat(file_path).st_mtime_ns if os.path.exists(file_path) else 0
+    view = view_key(category, sort, min_price, max_price, min_rating)
+    
+    if cursor:
+        cursor_version, offset, cursor_view = decode_cursor(cursor)
+        if cursor_view != view:
+            raise ValueError("Cursor was issued for another category, sort or filter; restart from the first page")
+        if cursor_version != version:
+            raise ValueError("Cursor refers to an older version of this category; restart from the first page")
+    else:
+        offset = (page - 1) * page_size
+    
+    cache_key = (category, version, sort, min_price, max_price, min_rating, offset, page_size)
+    encoded = _PRODUCT_PAGES.get(cache_key)
+    if encoded is not None:
+        return encoded
     
-    summary = f"Real Products Available in category '{category}':\n"
-    for _, row in products.iterrows():
-        price = row.get('actual_price', '0')
-        summary += f"- PRODUCT_NAME: {row['name']} PRODUCT_PRICE: {price} PRODUCT_RATING: {row.get('ratings', 'N/A')} PRODUCT_IMAGE: {row.get('image', 'N/A')}\n"
+    with metrics.span("page_build"):
+        if df is None:
+            index = get_product_index()
+            start, end = index.category_ranges.get(category, (0, 0))
+            rows = get_product_view(category, index.numeric_columns(start, end), version, sort, min_price, max_price, min_rating)
+        else:
+            rows = get_product_view(category, df, version, sort, min_price, max_price, min_rating)
+        total_products = len(rows)
+        page_rows = rows[offset:offset + page_size]
+        next_offset = offset + page_size
     
-    return summary
+        page = index.rows(start + page_rows) if df is None else df.iloc[page_rows]
+        products = page[CSV_COLUMNS].fillna("").to_dict("records")
+        encoded = encode_json({
+            "products": products,
+            "page": offset // page_size + 1,
+            "page_size": page_size,
+            "total_pages": (total_products + page_size - 1) // page_size,
+            "total_products": total_products,
+            "next_cursor": encode_cursor(version, next_offset, view) if next_offset < total_products else None
+        })
+    _PRODUCT_PAGES.put(cache_key, encoded)
+    return encoded
@@ -3,8 +3,9 @@ Prompt Manager for Smart Search AI
 Loads and manages external prompts for better maintainability
 """
 import os
+import threading
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Optional, Tuple
 
 class PromptManager:
     """Manages external prompts for the intelligent search system"""
@@ -14,6 +15,10 @@ class PromptManager:
             prompts_dir = os.path.join(os.path.dirname(__file__), "prompts")
         self.prompts_dir = Path(prompts_dir)
         self._cache: Dict[str, str] = {}
+        # Compiled LangChain objects, built once and reused by every request
+        self._templates: Dict[str, object] = {}
+        self._chains: Dict[Tuple[str, int], object] = {}
+        self._lock = threading.Lock()
     
     def load_prompt(self, prompt_name: str) -> str:
         """
@@ -46,6 +51,35 @@ class PromptManager:
         
         return content
     
+    def get_template(self, prompt_name: str):
+        """Returns the prompt as a LangChain PromptTemplate, compiled once"""
+        from langchain_core.prompts import PromptTemplate
+        
+        template = self._templates.get(prompt_name)
+        if template is None:
+            template = PromptTemplate.from_template(self.load_prompt(prompt_name))
+            self._templates[prompt_name] = template
+        return template
+    
+    def get_chain(self, prompt_name: str, llm, build: Optional[Callable] = None):
+        """
+        Returns the chain of a prompt and a model, compiled once and reused.
+        
+        Args:
+            prompt_name: Name of the prompt file (without extension)
+            llm: Chat model the prompt is sent to
+            build: Optional build(prompt, llm) returning the chain (default: prompt | llm)
+        """
+        # The cached chain holds a reference to llm, so its id is not reused while cached
+        key = (prompt_name, id(llm))
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is None:
+                prompt = self.get_template(prompt_name)
+                chain = build(prompt, llm) if build is not None else prompt | llm
+                self._chains[key] = chain
+        return chain
+    
     def list_available_prompts(self) -> list:
         """Lists all available prompts"""
         if not self.prompts_dir.exists():
@@ -54,13 +88,19 @@ class PromptManager:
     
     def reload_prompt(self, prompt_name: str) -> str:
         """Reloads a prompt from file, ignoring cache"""
-        if prompt_name in self._cache:
-            del self._cache[prompt_name]
+        with self._lock:
+            self._cache.pop(prompt_name, None)
+            self._templates.pop(prompt_name, None)
+            for key in [key for key in self._chains if key[0] == prompt_name]:
+                del self._chains[key]
         return self.load_prompt(prompt_name)
     
     def clear_cache(self):
-        """Clears the prompt cache"""
-        self._cache.clear()
+        """Clears the prompt cache and the chains compiled from it"""
+        with self._lock:
+            self._cache.clear()
+            self._templates.clear()
+            self._chains.clear()
 
 
 prompt_manager = PromptManager()
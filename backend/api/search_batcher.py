@@ -0,0 +1,152 @@
+"""
+Search Batcher for Smart Search AI
+Micro-batches concurrent vector searches into one embedding call and shared store lookups
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = metrics.registry.histogram(
+    "search_batch_size", "Searches served per vector store batch", buckets=metrics.SIZE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = metrics.registry.histogram(
+    "search_batch_queue_wait_seconds", "Time a search waited for its batch to start"
+)
+
+# Queue waits kept for the percentile in stats()
+_RECENT_WAITS = 1024
+
+
+class SearchBatcher:
+    """
+    Collects searches arriving within max_wait_ms of each other (or until
+    max_batch_size are queued) and runs them as one batch in a worker thread.
+
+    search_many receives [(query, params)] and returns one result per request,
+    either its product list or the exception it raised, so a failing request
+    does not fail the rest of its batch. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        search_many: Callable[[List[Tuple[str, Dict]]], List],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0
+    ):
+        self.search_many = search_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # (query, params, future, enqueued_at)
+        self._pending: List[Tuple[str, Dict, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches (the event loop only keeps weak references to tasks)
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = Counter()
+        self._waits = deque(maxlen=_RECENT_WAITS)
+
+    @classmethod
+    def from_env(cls, search_many: Callable[[List[Tuple[str, Dict]]], List]) -> "SearchBatcher":
+        return cls(
+            search_many,
+            max_batch_size=int(os.getenv("SEARCH_BATCH_MAX_SIZE", "16")),
+            max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5"))
+        )
+
+    async def search(self, query: str, **params) -> List[Dict]:
+        """Queues one search and waits for the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, params, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, Dict, asyncio.Future, float]]):
+        started_at = time.perf_counter()
+        self.batches += 1
+        self.requests += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        BATCH_SIZE.observe(len(batch))
+        for _, _, _, enqueued_at in batch:
+            self._waits.append(started_at - enqueued_at)
+            QUEUE_WAIT_SECONDS.observe(started_at - enqueued_at)
+
+        try:
+            results = await asyncio.to_thread(self.search_many, [(query, params) for query, params, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Search batch of {len(batch)} failed: {e}")
+            results = [e] * len(batch)
+
+        for (_, _, future, _), result in zip(batch, results):
+            # The waiting request may have been cancelled (client disconnect)
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        waits_ms = np.asarray(self._waits) * 1000
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "queue_wait_ms": {
+                "mean": float(waits_ms.mean()) if len(waits_ms) else 0.0,
+                "p95": float(np.percentile(waits_ms, 95)) if len(waits_ms) else 0.0,
+                "max": float(waits_ms.max()) if len(waits_ms) else 0.0,
+            }
+        }
+
+
+# Global instance
+search_batcher = None
+
+def get_search_batcher() -> Optional[SearchBatcher]:
+    """
+    Returns the global batcher over the vector store, or None when batching is
+    disabled (SEARCH_BATCH_WAIT_MS=0 or SEARCH_BATCH_MAX_SIZE=1).
+    """
+    global search_batcher
+    if search_batcher is None:
+        from vector_store import get_vector_store
+        batcher = SearchBatcher.from_env(lambda requests: get_vector_store().search_many(requests))
+        if batcher.max_wait <= 0 or batcher.max_batch_size <= 1:
+            return None
+        search_batcher = batcher
+    return search_batcher
+
+def get_search_batcher_stats() -> Dict:
+    if search_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **search_batcher.stats()}
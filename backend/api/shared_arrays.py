@@ -0,0 +1,133 @@
+"""
+Shared Arrays for Smart Search AI
+Memory-mapped array directories and cross-process build locks, so several uvicorn workers share one copy
+"""
+import os
+import json
+import shutil
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover the threads of one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+
+
+class FileLock:
+    """
+    Exclusive lock on a file, held across threads and processes (flock).
+
+    Used so that when several workers find the same index missing or stale,
+    one of them builds it and the others wait and then load the result.
+    With shared=True any number of holders may share the lock, and an
+    exclusive acquire fails (or waits) until all of them released it.
+    """
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            fcntl.flock(fd, mode if blocking else mode | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            self._thread_lock.release()
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def locked(self) -> bool:
+        """True while any thread or process holds the lock"""
+        if not self.acquire(blocking=False):
+            return True
+        self.release()
+        return False
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+
+def save_arrays(directory: str, arrays: Dict[str, np.ndarray], tag: str = "", meta: Optional[Dict] = None):
+    """
+    Writes arrays as one .npy file each, plus meta.json holding tag and meta.
+
+    The directory is written under a temporary name and then swapped in, so a
+    reader sees either the previous complete directory or the new one (or,
+    during the swap itself, none, which it handles like a missing index).
+    """
+    tmp_directory = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_directory, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_directory, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"tag": tag, "arrays": list(arrays), **(meta or {})}, f)
+
+    # Workers that mapped the old files keep reading them: unlinked files live on while mapped
+    old_directory = f"{directory}.{os.getpid()}.{threading.get_ident()}.old"
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+
+def _load_npy(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Empty arrays cannot be mapped
+        return np.load(path)
+
+
+def load_arrays(directory: str, tag: str = "") -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+    """
+    Memory-maps the arrays written by save_arrays, read-only.
+
+    Returns (arrays, meta), or None when the directory is missing, incomplete
+    or was saved with another tag. Mapped pages come from the OS page cache,
+    so every process mapping the same files shares one copy in RAM.
+    """
+    try:
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("tag") != tag:
+            return None
+        arrays = {
+            name: _load_npy(os.path.join(directory, f"{name}.npy"))
+            for name in meta["arrays"]
+        }
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(directory):
+            logger.warning(f"Could not load arrays from {directory}: {e}")
+        return None
+    return arrays, meta
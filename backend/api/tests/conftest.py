@@ -0,0 +1,50 @@
+"""
+Test configuration for Smart Search AI
+Puts the flat backend/api modules and the benchmark fakes on sys.path, and provides a small test catalog
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(API_DIR, "..", "bench"))
+
+from catalog_store import CSV_COLUMNS, CatalogStore
+
+# category -> (name, price, rating, number of ratings, link); the Sony listing is in two categories
+CATALOG = {
+    "Headphones": [
+        ("Sony headphones", "₹2,999", "4.5", "1,200", "https://www.amazon.in/dp/B000000001"),
+        ("Boat earbuds", "₹999", "4.0", "15,000", "https://www.amazon.in/dp/B000000002"),
+        ("Unpriced headphones", "", "3.0", "10", "https://www.amazon.in/dp/B000000003"),
+    ],
+    "All Electronics": [
+        ("Sony headphones", "₹2,999", "4.5", "1,200", "https://www.amazon.in/dp/B000000001"),
+        ("Phone charger", "₹499", "Get", "", "https://www.amazon.in/dp/B000000004"),
+    ],
+}
+
+
+def write_catalog(data_dir: str, catalog: dict):
+    """Writes one category CSV per entry of catalog"""
+    for category, rows in catalog.items():
+        df = pd.DataFrame([
+            {
+                "name": name, "main_category": "main", "sub_category": category, "image": "img", "link": link,
+                "ratings": rating, "no_of_ratings": count, "discount_price": price, "actual_price": price
+            }
+            for name, price, rating, count, link in rows
+        ], columns=CSV_COLUMNS)
+        df.to_csv(os.path.join(data_dir, f"{category}.csv"), index=False)
+
+
+@pytest.fixture
+def catalog_store(tmp_path):
+    """CatalogStore over CATALOG in a temporary directory"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_catalog(str(data_dir), CATALOG)
+    return CatalogStore(str(data_dir))
@@ -0,0 +1,70 @@
+"""
+Tests for the token-budgeted product context and [ITEM] expansion
+"""
+import pandas as pd
+
+from context_builder import build_product_context, format_item, short_name
+
+
+def rows(*names, price="₹1,000"):
+    return pd.DataFrame([
+        {
+            "name": name, "actual_price": price, "ratings": 4.2,
+            "image": f"https://img/{i}.jpg", "link": f"https://shop/{i}"
+        }
+        for i, name in enumerate(names)
+    ])
+
+
+def test_context_lists_products_by_short_id():
+    context = build_product_context([("Headphones", rows("Sony WH-1000XM5", "Bose QC45"))])
+    assert context.text.splitlines() == [
+        "Headphones:",
+        "P1 | Sony WH-1000XM5 | ₹1,000 | 4.2",
+        "P2 | Bose QC45 | ₹1,000 | 4.2",
+    ]
+    assert context.products["P2"]["link"] == "https://shop/1"
+    assert context.products["P2"]["category"] == "Headphones"
+
+
+def test_categories_contribute_round_robin_within_the_budget():
+    context = build_product_context(
+        [("Headphones", rows("Sony WH-1000XM5", "Bose QC45")), ("Speakers", rows("JBL Flip 6", "Marshall Emberton"))],
+        token_budget=30
+    )
+    names = [product["name"] for product in context.products.values()]
+    assert names == ["Sony WH-1000XM5", "JBL Flip 6"]
+    assert context.tokens <= 30
+
+
+def test_near_duplicate_names_are_skipped():
+    context = build_product_context([
+        ("Headphones", rows("Sony WH-1000XM5 Wireless Headphones Black", "Bose QC45")),
+        ("All Electronics", rows("Sony WH-1000XM5 Wireless Headphones Black", "JBL Flip 6")),
+    ])
+    names = [product["name"] for product in context.products.values()]
+    assert names == ["Sony WH-1000XM5 Wireless Headphones Black", "Bose QC45", "JBL Flip 6"]
+
+
+def test_short_name_cuts_at_a_word_boundary():
+    assert short_name("Sony | WH-1000XM5   Wireless Noise Cancelling", max_chars=20) == "Sony WH-1000XM5"
+
+
+def test_expand_items_replaces_known_ids():
+    context = build_product_context([("Headphones", rows("Sony WH-1000XM5"))])
+    response = "Try this one:\n[ITEM]\nID: P1\n[/ITEM]\nEnjoy!"
+    assert context.expand_items(response) == f"Try this one:\n{format_item(context.products['P1'])}\nEnjoy!"
+
+
+def test_expand_items_drops_invented_ids():
+    context = build_product_context([("Headphones", rows("Sony WH-1000XM5"))])
+    response = "[ITEM]\nID: P1\n[/ITEM]\n[ITEM]\nID: P7\n[/ITEM]"
+    expanded = context.expand_items(response)
+    assert expanded == f"{format_item(context.products['P1'])}\n"
+    assert "P7" not in expanded
+
+
+def test_expand_items_keeps_blocks_without_an_id():
+    context = build_product_context([("Headphones", rows("Sony WH-1000XM5"))])
+    block = "[ITEM]\nNOME: Some headphones\nPRICE: ₹500\n[/ITEM]"
+    assert context.expand_items(f"Also:\n{block}") == f"Also:\n{block}"
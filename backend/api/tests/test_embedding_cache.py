@@ -0,0 +1,26 @@
+"""
+Tests for the persistent embedding cache and its hit/miss counters
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from embeddings import HashingEmbeddings
+
+
+def test_documents_are_embedded_once(tmp_path):
+    cached = CachedEmbeddings(HashingEmbeddings(dimensions=16), EmbeddingCache(str(tmp_path / "cache.db")))
+    first = cached.embed_documents(["a", "b", "a"])
+    assert (cached.hits, cached.misses) == (1, 2)
+    assert cached.embed_documents(["b", "a"]) == [first[1], first[0]]
+    assert (cached.hits, cached.misses) == (3, 2)
+    assert len(cached.cache) == 2
+
+
+def test_counters_are_exact_across_threads(tmp_path):
+    cached = CachedEmbeddings(HashingEmbeddings(dimensions=16), EmbeddingCache(str(tmp_path / "cache.db")))
+    batches = [[f"product {i}-{j}" for j in range(5)] for i in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(cached.embed_documents, batches))
+        list(pool.map(cached.embed_documents, batches))
+    assert cached.misses == 200
+    assert cached.hits == 200
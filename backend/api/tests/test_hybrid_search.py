@@ -0,0 +1,117 @@
+"""
+Tests for hybrid search: reciprocal-rank fusion and the Chroma metadata filter
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from embeddings import HashingEmbeddings
+from vector_store import RRF_K, VectorStoreManager
+
+
+def product(name, category="Headphones", **scores):
+    return {"name": name, "category": category, "link": f"https://www.amazon.in/{name}", **scores}
+
+
+def test_fuse_sums_reciprocal_ranks():
+    vector = [product("a", vector_score=0.9), product("b", vector_score=0.8)]
+    lexical = [product("b", lexical_score=7.0), product("c", lexical_score=3.0)]
+
+    fused = VectorStoreManager._fuse((vector, lexical), k=10)
+
+    assert [p["name"] for p in fused] == ["b", "a", "c"]
+    assert fused[0]["relevance_score"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    # Scores of every retriever that found the product are kept
+    assert fused[0]["vector_score"] == 0.8 and fused[0]["lexical_score"] == 7.0
+    assert "lexical_score" not in fused[1]
+
+
+def test_fuse_keeps_same_link_in_different_categories_apart_and_truncates():
+    vector = [product("a"), product("a", category="All Electronics"), product("b")]
+    fused = VectorStoreManager._fuse((vector,), k=2)
+    assert [(p["name"], p["category"]) for p in fused] == [("a", "Headphones"), ("a", "All Electronics")]
+
+
+def test_fuse_falls_back_to_name_without_link():
+    first = {"name": "a", "category": "Headphones", "link": ""}
+    fused = VectorStoreManager._fuse(([first], [dict(first)]), k=5)
+    assert len(fused) == 1
+
+
+@pytest.mark.parametrize("args, where", [
+    ((None, None, None, None), None),
+    (("Headphones", None, None, None), {"category": "Headphones"}),
+    ((None, 100.0, 500.0, None), {"$and": [{"price_value": {"$gte": 100.0}}, {"price_value": {"$lte": 500.0}}]}),
+    (("Headphones", None, None, 4.0), {"$and": [{"category": "Headphones"}, {"ratings": {"$gte": 4.0}}]}),
+])
+def test_where(args, where):
+    assert VectorStoreManager._where(*args) == where
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_REQUESTS_PER_MINUTE", "")
+    manager = VectorStoreManager(
+        str(tmp_path / "store"), skip_init=True, embeddings=HashingEmbeddings(), embedding_cache_path="", backend="chroma"
+    )
+    store = manager._open_store(manager._new_generation_directory())
+    rows = [
+        ("cheap headphones", "Headphones", 300.0, 4.5),
+        ("premium headphones", "Headphones", 3000.0, 4.8),
+        ("unpriced headphones", "Headphones", None, 3.0),
+        ("cheap speaker", "Speakers", 400.0, 4.1),
+    ]
+    documents = []
+    for i, (name, category, price, rating) in enumerate(rows):
+        metadata = {"name": name, "category": category, "link": f"link-{i}", "ratings": rating, "content_hash": str(i)}
+        if price is not None:
+            metadata["price_value"] = price
+        documents.append((f"{category}:{i}", Document(page_content=name, metadata=metadata)))
+    manager._ingest(store, iter(documents))
+    return manager, store
+
+
+@pytest.mark.parametrize("filters, names", [
+    (("Headphones", None, None, None), {"cheap headphones", "premium headphones", "unpriced headphones"}),
+    ((None, None, 500.0, None), {"cheap headphones", "cheap speaker"}),
+    (("Headphones", 100.0, 500.0, None), {"cheap headphones"}),
+    ((None, None, None, 4.6), {"premium headphones"}),
+])
+def test_where_filters_the_chroma_collection(store, filters, names):
+    manager, chroma = store
+    query = manager.embeddings.embed_query("headphones")
+    results = manager._vector_search(chroma, [query], 10, manager._where(*filters))[0]
+    assert {p["name"] for p in results} == names
+
+
+class ScaledEmbeddings(HashingEmbeddings):
+    """Hashing embeddings that are not unit length"""
+
+    def embed_documents(self, texts):
+        return [[3.0 * value for value in vector] for vector in super().embed_documents(texts)]
+
+    def embed_query(self, text):
+        return [0.5 * value for value in super().embed_query(text)]
+
+
+def test_vector_scores_are_cosine_similarities(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_REQUESTS_PER_MINUTE", "")
+    embeddings = ScaledEmbeddings()
+    manager = VectorStoreManager(
+        str(tmp_path / "store"), skip_init=True, embeddings=embeddings, embedding_cache_path="", backend="chroma"
+    )
+    chroma = manager._open_store(manager._new_generation_directory())
+    assert chroma._collection.metadata["hnsw:space"] == "cosine"
+    names = ["wireless headphones", "bluetooth speaker"]
+    manager._ingest(chroma, iter(
+        (f"Headphones:{i}", Document(page_content=name, metadata={"name": name, "category": "Headphones", "content_hash": str(i)}))
+        for i, name in enumerate(names)
+    ))
+
+    query = embeddings.embed_query("wireless headphones")
+    results = manager._vector_search(chroma, [query], k=2, where=None)[0]
+    assert results[0]["name"] == "wireless headphones"
+    for product in results:
+        document = np.asarray(embeddings.embed_documents([product["name"]])[0])
+        cosine = document @ np.asarray(query) / (np.linalg.norm(document) * np.linalg.norm(query))
+        assert product["vector_score"] == pytest.approx(cosine, abs=1e-5)
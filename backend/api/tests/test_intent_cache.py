@@ -0,0 +1,91 @@
+"""
+Tests for the intent cache: exact keys, semantic matches at the default threshold, expiry and eviction
+"""
+import pytest
+
+from embeddings import HashingEmbeddings
+from intent_cache import IntentCache, normalize_query
+
+RESULT = {"budget": None, "categories": ["Headphones"]}
+
+
+@pytest.fixture
+def cache():
+    return IntentCache(HashingEmbeddings())
+
+
+def test_normalize_query_keeps_word_order_and_repetition():
+    assert normalize_query("Wireless headphones for the gym!") == "wireless headphones gym"
+    assert normalize_query("gym headphones wireless") == "gym headphones wireless"
+    assert normalize_query("kids shoes kids") == "kids shoes kids"
+    assert normalize_query("headphones under 2.5k") == "headphones under 2.5 k"
+
+
+@pytest.mark.parametrize("paraphrase", [
+    "Wireless Headphones for Gym!!",
+    "I want wireless headphones for the gym",
+])
+def test_punctuation_and_filler_words_are_exact_hits(cache, paraphrase):
+    cache.put("wireless headphones for gym", RESULT)
+    assert cache.get(paraphrase) == RESULT
+    assert cache.exact_hits == 1 and cache.semantic_hits == 0
+
+
+@pytest.mark.parametrize("query, paraphrase", [
+    ("wireless headphones for gym", "gym wireless headphones"),
+    ("running shoes for men", "men running shoes"),
+    ("cheap phone cases", "phone cases cheap"),
+])
+def test_reordered_queries_are_semantic_hits(cache, query, paraphrase):
+    cache.put(query, RESULT)
+    assert cache.get(paraphrase) == RESULT
+    assert cache.exact_hits == 0 and cache.semantic_hits == 1
+
+
+@pytest.mark.parametrize("query, near_miss", [
+    ("running shoes for men", "running shoes for women"),
+    ("wireless headphones", "wired headphones"),
+    ("laptop bag", "laptop"),
+    ("gaming mouse", "gaming keyboard"),
+    ("wireless headphones for gym", "wireless earbuds for gym"),
+])
+def test_near_misses_are_not_served_from_cache(cache, query, near_miss):
+    cache.put(query, RESULT)
+    assert cache.get(near_miss) is None
+    assert cache.misses == 1
+
+
+def test_semantic_matches_require_the_same_numbers(cache):
+    cache.put("headphones under 2000", {"budget": 2000, "categories": ["Headphones"]})
+    cache.put("headphones under 5000 rupees", {"budget": 5000, "categories": ["Headphones"]})
+    assert cache.get("under 2000 headphones")["budget"] == 2000
+    assert cache.get("rupees 5000 headphones under")["budget"] == 5000
+    assert cache.get("headphones under 3000") is None
+
+
+def test_expired_entries_miss(monkeypatch):
+    cache = IntentCache(HashingEmbeddings(), ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr("intent_cache.time.time", lambda: now[0])
+    cache.put("gaming mouse", RESULT)
+    now[0] += 11
+    assert cache.get("gaming mouse") is None
+    assert cache.expirations == 1 and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IntentCache(HashingEmbeddings(), max_entries=2)
+    cache.put("gaming mouse", RESULT)
+    cache.put("laptop bag", RESULT)
+    cache.get("gaming mouse")
+    cache.put("running shoes", RESULT)
+    assert cache.evictions == 1
+    assert cache.get("laptop bag") is None
+    assert cache.get("gaming mouse") == RESULT
+
+
+def test_persisted_entries_are_reloaded(tmp_path):
+    path = str(tmp_path / "intents.db")
+    IntentCache(HashingEmbeddings(), path=path).put("gaming mouse", RESULT)
+    reloaded = IntentCache(HashingEmbeddings(), path=path)
+    assert reloaded.get("gaming mouse") == RESULT
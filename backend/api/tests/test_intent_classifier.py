@@ -0,0 +1,132 @@
+"""
+Tests for the local intent classifier and the cache -> classifier -> LLM fallback in analyze_query
+"""
+import asyncio
+
+import pytest
+
+import intent_cache
+import intent_classifier
+import main
+from intent_classifier import IntentClassifier, has_unparsed_amount, parse_budget
+
+CATEGORY_TEXTS = {
+    "Headphones": (["Headphones", "Earbuds"], ["wireless bluetooth headphones", "noise cancelling headphones", "sports earbuds"]),
+    "Speakers": (["Speakers"], ["bluetooth speaker portable", "party speaker bass"]),
+    "Shoes": (["Shoes", "Sneakers"], ["running shoes men", "casual sneakers", "leather formal shoes"]),
+    "Kids Shoes": (["Kids Shoes"], ["kids running shoes", "school shoes kids", "baby first shoes"]),
+    "Laptops": (["Laptops"], ["gaming laptop", "thin laptop 16gb"]),
+}
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier(CATEGORY_TEXTS)
+
+
+@pytest.mark.parametrize("query, budget", [
+    ("headphones under 2000", 2000.0),
+    ("shoes below ₹1.5k", 1500.0),
+    ("speaker rs 500", 500.0),
+    ("laptop between 30000 and 50000", 50000.0),
+    ("iphone 13", None),
+])
+def test_parse_budget(query, budget):
+    assert parse_budget(query) == budget
+
+
+@pytest.mark.parametrize("query, unparsed", [
+    ("headphones around 2000", True),
+    ("2k headphones", True),
+    ("headphones under two thousand", True),
+    ("iphone 13", True),
+    ("headphones under 2000", False),
+    ("wireless headphones", False),
+    ("chairs", False),
+])
+def test_has_unparsed_amount(query, unparsed):
+    assert has_unparsed_amount(query) is unparsed
+
+
+def test_confident_query_returns_category_and_budget(classifier):
+    assert classifier.analyze("wireless headphones under 2000", threshold=0.1) == {
+        "budget": 2000.0, "categories": ["Headphones"]
+    }
+    assert classifier.confident == 1
+
+
+def test_near_tied_categories_are_returned_together(classifier):
+    categories, confidence = classifier.classify_top("shoes", max_categories=5, min_share=0.5)
+    assert sorted(categories) == ["Kids Shoes", "Shoes"]
+    # Separating both shoe categories from the rest is clearer than picking one of them
+    assert confidence > classifier.classify("shoes")[1]
+    assert classifier.classify_top("shoes", max_categories=1)[0] == categories[:1]
+
+
+def test_unparsed_amount_falls_back_to_llm(classifier):
+    assert classifier.analyze("wireless headphones around 2000", threshold=0.0) is None
+    assert classifier.fallbacks == 1 and classifier.amount_fallbacks == 1
+
+
+def test_unknown_or_ambiguous_query_falls_back_to_llm(classifier):
+    assert classifier.analyze("garden hose", threshold=0.1) is None
+    assert classifier.analyze("bluetooth", threshold=0.9) is None
+    assert classifier.fallbacks == 2 and classifier.amount_fallbacks == 0
+
+
+def test_save_and_load_round_trip(classifier, tmp_path):
+    classifier.save(str(tmp_path / "classifier"), tag="v1")
+    loaded = IntentClassifier.load(str(tmp_path / "classifier"), tag="v1")
+    assert loaded.classify("bluetooth speaker") == classifier.classify("bluetooth speaker")
+    assert IntentClassifier.load(str(tmp_path / "classifier"), tag="v2") is None
+
+
+def test_built_classifier_is_kept_when_reload_fails(classifier, monkeypatch):
+    monkeypatch.setattr(intent_classifier, "intent_classifier", None)
+    monkeypatch.setattr(IntentClassifier, "load", classmethod(lambda cls, path, tag="": None))
+    monkeypatch.setattr(IntentClassifier, "from_catalog", classmethod(lambda cls, *args, **kwargs: classifier))
+    monkeypatch.setattr(IntentClassifier, "save", lambda self, path, tag="": None)
+
+    assert intent_classifier.get_intent_classifier() is classifier
+
+
+class FakeIntentCache:
+    def __init__(self, cached=None):
+        self.cached = cached
+        self.stored = []
+
+    def get(self, query):
+        return self.cached
+
+    def put(self, query, result):
+        self.stored.append((query, result))
+
+
+def run_analysis(monkeypatch, classifier, cache, llm_result):
+    llm_calls = []
+
+    async def run_llm_analysis(prompt):
+        llm_calls.append(prompt)
+        return llm_result
+
+    monkeypatch.setattr(intent_cache, "get_intent_cache", lambda: cache)
+    monkeypatch.setattr(intent_classifier, "get_intent_classifier", lambda: classifier)
+    monkeypatch.setattr(main, "run_llm_analysis", run_llm_analysis)
+    monkeypatch.setattr(main, "INTENT_CLASSIFIER_THRESHOLD", 0.1)
+    result = asyncio.run(main.analyze_query(main.PromptRequest(prompt="wireless headphones around 2000")))
+    return result, llm_calls
+
+
+def test_analyze_query_calls_llm_when_classifier_falls_back(classifier, monkeypatch):
+    cache = FakeIntentCache()
+    result, llm_calls = run_analysis(monkeypatch, classifier, cache, {"budget": 2000, "categories": ["Headphones"]})
+    assert result == (2000, ["Headphones"])
+    assert llm_calls == ["wireless headphones around 2000"]
+    assert cache.stored == [("wireless headphones around 2000", {"budget": 2000, "categories": ["Headphones"]})]
+
+
+def test_analyze_query_uses_cached_analysis(classifier, monkeypatch):
+    cache = FakeIntentCache({"budget": 2000, "categories": ["Headphones"]})
+    result, llm_calls = run_analysis(monkeypatch, classifier, cache, {})
+    assert result == (2000, ["Headphones"])
+    assert llm_calls == [] and classifier.confident == classifier.fallbacks == 0
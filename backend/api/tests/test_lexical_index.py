@@ -0,0 +1,72 @@
+"""
+Tests for BM25 ranking over product names
+"""
+import math
+
+import numpy as np
+
+from lexical_index import BM25Index, tokenize
+
+NAMES = [
+    "Sony WH-1000XM4 Wireless Noise Cancelling Headphones",
+    "boAt Rockerz 450 Bluetooth Headphones",
+    "JBL Flip 5 Portable Bluetooth Speaker",
+    "Wireless Mouse for Laptop",
+    "Headphones Headphones Stand",
+]
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Sony WH-1000XM4, Wireless!") == ["sony", "wh", "1000xm4", "wireless"]
+
+
+def test_documents_without_query_terms_score_zero():
+    index = BM25Index(NAMES)
+    scores = index.score("bluetooth")
+    assert np.flatnonzero(scores > 0).tolist() == [1, 2]
+    assert index.score("refrigerator").sum() == 0
+
+
+def test_more_matched_terms_rank_higher():
+    index = BM25Index(NAMES)
+    assert index.top_k("wireless headphones", 3)[0] == 0
+    assert index.top_k("bluetooth speaker", 1).tolist() == [2]
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = BM25Index(NAMES)
+    scores = index.score("headphones mouse")
+    # 'mouse' occurs in one name, 'headphones' in three
+    assert scores[3] > scores[1]
+
+
+def test_term_frequency_saturates_and_long_names_are_normalized():
+    index = BM25Index(["headphones", "headphones headphones headphones headphones", "headphones with a very long product title"])
+    scores = index.score("headphones")
+    assert scores[1] > scores[0] > scores[2]
+    # k1 bounds the gain of repeating a term
+    assert scores[1] < 2 * scores[0]
+
+
+def test_scores_match_the_bm25_formula():
+    index = BM25Index(["red shoes", "blue shoes", "red hat"], k1=1.5, b=0.75)
+    idf = math.log1p((3 - 2 + 0.5) / (2 + 0.5))
+    # Every document has the average length, so the length norm is k1
+    expected = idf * 1 * 2.5 / (1 + 1.5)
+    assert np.isclose(index.score("red")[0], expected)
+
+
+def test_top_k_is_stable_and_bounded():
+    index = BM25Index(["usb cable", "usb cable", "usb charger"])
+    assert index.top_k("cable", 5).tolist()[:2] == [0, 1]
+    assert len(index.top_k("usb", 10)) == 3
+    assert len(index.top_k("usb", 0)) == 0
+
+
+def test_save_and_load_keep_scores(tmp_path):
+    index = BM25Index(NAMES)
+    index.save(str(tmp_path / "bm25"), tag="v1")
+    loaded = BM25Index.load(str(tmp_path / "bm25"), tag="v1")
+    assert np.allclose(loaded.score("wireless bluetooth headphones"), index.score("wireless bluetooth headphones"))
+    assert loaded.vocabulary.get("sony") is not None and loaded.vocabulary.get("nokia") is None
+    assert BM25Index.load(str(tmp_path / "bm25"), tag="v2") is None
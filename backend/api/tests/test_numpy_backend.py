@@ -0,0 +1,64 @@
+"""
+Tests for the NumPy vector backend: builds, stale catalogs and lazy Chroma imports
+"""
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import product_index
+import products
+from conftest import API_DIR, CATALOG, write_catalog
+from embeddings import HashingEmbeddings
+from vector_store import CHECKPOINT_FILE, VectorStoreManager
+
+
+@pytest.fixture
+def manager(catalog_store, tmp_path, monkeypatch):
+    monkeypatch.setattr(products, "catalog_store", catalog_store)
+    monkeypatch.setattr(products, "ALL_CATEGORIES", list(CATALOG), raising=False)
+    monkeypatch.setattr(product_index, "product_index", None)
+    monkeypatch.setattr(product_index, "CATALOG_RELOAD_SECONDS", 0)
+    return VectorStoreManager(
+        str(tmp_path / "numpy_index"), embeddings=HashingEmbeddings(), embedding_cache_path="", backend="numpy"
+    )
+
+
+def touch(catalog_store, category):
+    path = catalog_store.csv_path(category)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_build_writes_no_checkpoint(manager):
+    assert manager.status()["products"] == 5
+    assert not (manager.persist_directory / CHECKPOINT_FILE).exists()
+    assert manager.search_products("sony headphones", k=1)[0]["name"] == "Sony headphones"
+
+
+def test_touched_catalog_keeps_serving_with_one_warning(manager, catalog_store, caplog):
+    touch(catalog_store, "Headphones")
+    with caplog.at_level(logging.WARNING, logger="vector_store"):
+        for _ in range(3):
+            assert manager.search_products("boat earbuds", k=1)[0]["name"] == "Boat earbuds"
+    assert sum("catalog changed" in record.getMessage() for record in caplog.records) == 1
+
+
+def test_added_products_are_rejected_until_sync(manager, catalog_store):
+    write_catalog(catalog_store.data_dir, {
+        "Headphones": CATALOG["Headphones"] + [("New headphones", "₹1,499", "4.1", "5", "https://www.amazon.in/dp/B000000005")]
+    })
+    with pytest.raises(RuntimeError):
+        manager.search_products("headphones", k=3)
+
+    result = manager.sync_store()
+    assert result["products"] == 6
+    assert manager.search_products("new headphones", k=1)[0]["name"] == "New headphones"
+
+
+def test_numpy_backend_does_not_import_chroma():
+    code = "import vector_store, sys; print('langchain_chroma' in sys.modules or 'chromadb' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=API_DIR, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
@@ -0,0 +1,114 @@
+"""
+Tests for the global product index: filter masks, top-k dedupe and catalog fingerprints, and the catalog reload checks
+"""
+import numpy as np
+import pytest
+
+import product_index
+from conftest import CATALOG, write_catalog
+from product_index import ProductIndex, catalog_fingerprint
+
+
+@pytest.fixture
+def index(catalog_store):
+    return ProductIndex.build(catalog_store, list(CATALOG))
+
+
+def names(index, product_ids):
+    return index.rows(np.asarray(product_ids, dtype=np.int64))["name"].tolist()
+
+
+def test_categories_are_sorted_and_deduplicated(catalog_store):
+    index = ProductIndex.build(catalog_store, ["Headphones", "All Electronics", "Headphones"])
+    assert index.categories == ["All Electronics", "Headphones"]
+    assert index.num_products == 5
+
+
+def test_category_and_price_masks(index):
+    assert sorted(names(index, np.flatnonzero(index.mask(categories=["Headphones"])))) == [
+        "Boat earbuds", "Sony headphones", "Unpriced headphones"
+    ]
+    # Unpriced products never match a price filter
+    assert sorted(names(index, np.flatnonzero(index.mask(max_price=1000)))) == ["Boat earbuds", "Phone charger"]
+    assert sorted(names(index, np.flatnonzero(index.mask(min_price=999, max_price=999)))) == ["Boat earbuds"]
+
+
+def test_rating_masks_skip_missing_values(index):
+    assert sorted(names(index, np.flatnonzero(index.mask(min_rating=4.0)))) == [
+        "Boat earbuds", "Sony headphones", "Sony headphones"
+    ]
+    assert names(index, np.flatnonzero(index.mask(min_ratings_count=10000))) == ["Boat earbuds"]
+
+
+def test_top_k_dedupes_listings_across_categories(index):
+    product_ids, total = index.top_k(k=3, sort="rating")
+    assert names(index, product_ids) == ["Sony headphones", "Boat earbuds", "Unpriced headphones"]
+    assert total == 5
+
+    product_ids, _ = index.top_k(k=3, sort="rating", dedupe=False)
+    assert names(index, product_ids) == ["Sony headphones", "Sony headphones", "Boat earbuds"]
+
+
+def test_top_k_sorts_and_filters(index):
+    product_ids, total = index.top_k(k=10, sort="price_asc", categories=["Headphones"])
+    assert names(index, product_ids) == ["Boat earbuds", "Sony headphones", "Unpriced headphones"]
+    assert total == 3
+    product_ids, _ = index.top_k(k=10, sort="popularity", max_price=5000)
+    assert names(index, product_ids)[0] == "Boat earbuds"
+
+
+def test_select_candidates_returns_a_repeated_category_once(index):
+    candidates = index.select_candidates(["Headphones", "All Electronics", "Headphones"], limit=2)
+    assert [category for category, _ in candidates] == ["Headphones", "All Electronics"]
+    assert candidates[0][1]["name"].tolist() == ["Sony headphones", "Boat earbuds"]
+    assert len(candidates[1][1]) == 2
+
+
+def test_fingerprint_tolerates_missing_csv(catalog_store):
+    fingerprint = catalog_fingerprint(catalog_store, list(CATALOG))
+    with_missing = catalog_fingerprint(catalog_store, list(CATALOG) + ["Missing"])
+    assert with_missing != fingerprint
+    assert catalog_fingerprint(catalog_store, list(CATALOG) + list(CATALOG)) == fingerprint
+
+
+def test_get_product_index_checks_fingerprint_at_most_every_interval(catalog_store, monkeypatch):
+    import products
+    monkeypatch.setattr(products, "catalog_store", catalog_store)
+    monkeypatch.setattr(products, "ALL_CATEGORIES", list(CATALOG), raising=False)
+    monkeypatch.setattr(product_index, "product_index", None)
+    monkeypatch.setattr(product_index, "CATALOG_RELOAD_SECONDS", 60)
+    checks = []
+    real_fingerprint = product_index.catalog_fingerprint
+    monkeypatch.setattr(product_index, "catalog_fingerprint", lambda *args: checks.append(1) or real_fingerprint(*args))
+
+    first = product_index.get_product_index()
+    checks.clear()
+    assert product_index.get_product_index() is first
+    assert checks == []
+    assert product_index.get_product_index(refresh=True) is first
+    assert len(checks) == 1
+
+
+def test_get_intent_classifier_reloads_when_the_catalog_changes(catalog_store, monkeypatch):
+    import intent_classifier
+    import products
+    monkeypatch.setattr(products, "catalog_store", catalog_store)
+    monkeypatch.setattr(products, "ALL_CATEGORIES", list(CATALOG), raising=False)
+    monkeypatch.setattr(intent_classifier, "intent_classifier", None)
+    monkeypatch.setattr(product_index, "CATALOG_RELOAD_SECONDS", 60)
+
+    first = intent_classifier.get_intent_classifier()
+    assert sorted(first.categories) == ["All Electronics", "Headphones"]
+    first.confident = 3
+
+    speakers = {"Speakers": [("JBL speaker", "₹1,999", "4.2", "300", "https://www.amazon.in/dp/B000000005")]}
+    write_catalog(catalog_store.data_dir, speakers)
+    monkeypatch.setattr(products, "ALL_CATEGORIES", list(CATALOG) + list(speakers), raising=False)
+    # Within the interval the catalog is not checked again
+    assert intent_classifier.get_intent_classifier() is first
+
+    reloaded = intent_classifier.get_intent_classifier(refresh=True)
+    assert reloaded is not first
+    assert "Speakers" in reloaded.categories
+    assert reloaded.confident == 3
+    assert intent_classifier.get_intent_classifier(refresh=True) is reloaded
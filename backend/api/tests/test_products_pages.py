@@ -0,0 +1,72 @@
+"""
+Tests for /products/{category} pages: cursors, sorting and filters
+"""
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from products import ALL_CATEGORIES, decode_cursor, encode_cursor, get_products_page
+
+CATEGORY = "Refrigerators"
+
+
+def page(**params):
+    return json.loads(get_products_page(CATEGORY, **params))
+
+
+def raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(123, 40, "abc")) == (123, 40, "abc")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", raw_cursor("1:20"), raw_cursor("1:x:abc"), raw_cursor("1:-20:abc")])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_continues_the_same_view():
+    first = page(page_size=5, sort="price_asc", max_price=20000)
+    assert first["next_cursor"]
+    second = page(page_size=5, sort="price_asc", max_price=20000, cursor=first["next_cursor"])
+    assert second == page(page=2, page_size=5, sort="price_asc", max_price=20000)
+
+
+@pytest.mark.parametrize("changed", [{"sort": "rating"}, {"max_price": 30000}, {"min_rating": 4}])
+def test_cursor_of_another_view_is_rejected(changed):
+    cursor = page(page_size=5, sort="price_asc", max_price=20000)["next_cursor"]
+    params = {"page_size": 5, "sort": "price_asc", "max_price": 20000, **changed}
+    with pytest.raises(ValueError):
+        get_products_page(CATEGORY, cursor=cursor, **params)
+
+
+def test_cursor_of_another_category_is_rejected():
+    cursor = page(page_size=5)["next_cursor"]
+    other = next(category for category in ALL_CATEGORIES if category != CATEGORY)
+    with pytest.raises(ValueError):
+        get_products_page(other, page_size=5, cursor=cursor)
+
+
+def test_ratings_are_numeric():
+    ratings = [product["ratings"] for product in page(page_size=50)["products"]]
+    assert all(isinstance(rating, float) or rating == "" for rating in ratings)
+
+
+def test_invalid_cursors_return_400(client):
+    cursor = client.get(f"/products/{CATEGORY}", params={"page_size": 5}).json()["next_cursor"]
+    assert client.get(f"/products/{CATEGORY}", params={"page_size": 5, "cursor": cursor}).status_code == 200
+    assert client.get(f"/products/{CATEGORY}", params={"page_size": 5, "cursor": cursor, "sort": "rating"}).status_code == 400
+    version = decode_cursor(cursor)[0]
+    negative = encode_cursor(version, -5, decode_cursor(cursor)[2])
+    assert client.get(f"/products/{CATEGORY}", params={"page_size": 5, "cursor": negative}).status_code == 400
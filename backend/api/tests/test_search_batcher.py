@@ -0,0 +1,95 @@
+"""
+Tests for the search batcher: batching, error fan-out and cancelled waiters
+"""
+import asyncio
+import threading
+
+import pytest
+
+from search_batcher import SearchBatcher
+
+
+def echo(requests):
+    return [[{"query": query, **params}] for query, params in requests]
+
+
+def test_concurrent_searches_share_one_batch():
+    calls = []
+
+    def search_many(requests):
+        calls.append(len(requests))
+        return echo(requests)
+
+    async def main():
+        batcher = SearchBatcher(search_many, max_batch_size=16, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.search(f"q{i}", n=i) for i in range(3)))
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert calls == [3]
+    assert results == [[{"query": f"q{i}", "n": i}] for i in range(3)]
+    assert batcher.batches == 1 and batcher.requests == 3
+    assert not batcher._tasks
+
+
+def test_full_batch_flushes_without_waiting():
+    async def main():
+        batcher = SearchBatcher(echo, max_batch_size=2, max_wait_ms=60_000)
+        return await asyncio.wait_for(asyncio.gather(batcher.search("a"), batcher.search("b")), timeout=5)
+
+    assert asyncio.run(main()) == [[{"query": "a"}], [{"query": "b"}]]
+
+
+def test_per_request_errors_only_fail_their_request():
+    def search_many(requests):
+        return [ValueError(query) if query == "bad" else [{"query": query}] for query, _ in requests]
+
+    async def main():
+        batcher = SearchBatcher(search_many, max_wait_ms=20)
+        return await asyncio.gather(batcher.search("good"), batcher.search("bad"), return_exceptions=True)
+
+    good, bad = asyncio.run(main())
+    assert good == [{"query": "good"}]
+    assert isinstance(bad, ValueError) and str(bad) == "bad"
+
+
+def test_batch_failure_fans_out_to_every_request():
+    def search_many(requests):
+        raise RuntimeError("store unavailable")
+
+    async def main():
+        batcher = SearchBatcher(search_many, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.search(q) for q in "abc"), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) and str(result) == "store unavailable" for result in results)
+
+
+def test_cancelled_waiter_does_not_affect_the_rest_of_its_batch():
+    started = threading.Event()
+    release = threading.Event()
+
+    def search_many(requests):
+        started.set()
+        release.wait(timeout=5)
+        return echo(requests)
+
+    async def main():
+        batcher = SearchBatcher(search_many, max_wait_ms=20)
+        cancelled = asyncio.ensure_future(batcher.search("gone"))
+        kept = asyncio.ensure_future(batcher.search("kept"))
+        await asyncio.to_thread(started.wait, 5)
+        cancelled.cancel()
+        release.set()
+        result = await kept
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        # Lets the batch task's done callback run
+        await asyncio.sleep(0)
+        return batcher, result
+
+    batcher, result = asyncio.run(main())
+    assert result == [{"query": "kept"}]
+    assert batcher.requests == 2
+    assert not batcher._tasks
@@ -0,0 +1,95 @@
+"""
+Tests for the shared array directories and the cross-process file lock
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import shared_arrays
+from shared_arrays import FileLock, load_arrays, save_arrays
+
+needs_flock = pytest.mark.skipif(shared_arrays.fcntl is None, reason="flock is not available")
+
+
+@needs_flock
+def test_exclusive_lock_excludes_other_holders(tmp_path):
+    path = str(tmp_path / "build.lock")
+    first, second = FileLock(path), FileLock(path)
+    with first:
+        assert second.locked()
+        assert not second.acquire(blocking=False)
+    assert not second.locked()
+    assert second.acquire(blocking=False)
+    second.release()
+
+
+@needs_flock
+def test_shared_locks_exclude_only_exclusive_holders(tmp_path):
+    path = str(tmp_path / "gen.readers")
+    readers = [FileLock(path, shared=True), FileLock(path, shared=True)]
+    writer = FileLock(path)
+    for reader in readers:
+        assert reader.acquire(blocking=False)
+    assert not writer.acquire(blocking=False)
+    readers[0].release()
+    assert not writer.acquire(blocking=False)
+    readers[1].release()
+    assert writer.acquire(blocking=False)
+    assert not FileLock(path, shared=True).acquire(blocking=False)
+    writer.release()
+
+
+def test_lock_instance_is_not_reentrant_and_creates_its_directory(tmp_path):
+    lock = FileLock(str(tmp_path / "nested" / "build.lock"))
+    assert lock.acquire(blocking=False)
+    assert not lock.acquire(blocking=False)
+    lock.release()
+    assert os.path.exists(tmp_path / "nested")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    directory = str(tmp_path / "index")
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    save_arrays(directory, {"vectors": vectors, "empty": np.zeros(0, dtype=np.int32)}, tag="v1", meta={"count": 3})
+
+    arrays, meta = load_arrays(directory, tag="v1")
+    assert isinstance(arrays["vectors"], np.memmap)
+    np.testing.assert_array_equal(arrays["vectors"], vectors)
+    assert len(arrays["empty"]) == 0
+    assert meta["count"] == 3
+
+
+def test_load_rejects_missing_directories_and_other_tags(tmp_path):
+    directory = str(tmp_path / "index")
+    assert load_arrays(directory) is None
+    save_arrays(directory, {"a": np.ones(2)}, tag="v1")
+    assert load_arrays(directory, tag="v2") is None
+
+
+def test_save_swaps_in_the_new_directory(tmp_path):
+    directory = str(tmp_path / "index")
+    save_arrays(directory, {"a": np.ones(2), "b": np.ones(2)}, tag="v1")
+    old, _ = load_arrays(directory, tag="v1")
+
+    save_arrays(directory, {"a": np.full(3, 2.0)}, tag="v2")
+    new, meta = load_arrays(directory, tag="v2")
+    np.testing.assert_array_equal(new["a"], [2.0, 2.0, 2.0])
+    assert meta["arrays"] == ["a"]
+    # Files of the previous directory are gone, not merged into the new one
+    assert sorted(os.listdir(directory)) == ["a.npy", "meta.json"]
+    # Arrays mapped before the swap stay readable
+    np.testing.assert_array_equal(old["b"], [1.0, 1.0])
+    # No temporary or old directories are left behind
+    assert os.listdir(tmp_path) == ["index"]
+
+
+def test_load_rejects_incomplete_directories(tmp_path):
+    directory = tmp_path / "index"
+    save_arrays(str(directory), {"a": np.ones(2)})
+    os.remove(directory / "a.npy")
+    assert load_arrays(str(directory)) is None
+
+    (directory / "meta.json").write_text(json.dumps({"tag": ""}))
+    assert load_arrays(str(directory)) is None
@@ -0,0 +1,122 @@
+"""
+Tests for the vector store build: embedding backoff, checkpoint resume and manifest writes
+"""
+import hashlib
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+import vector_store
+from embedding_scheduler import BuildCheckpoint, EmbeddingScheduler
+from fakes import FakeEmbeddings, RateLimitExceeded
+from vector_store import CHECKPOINT_FILE, MANIFEST_FILE, VectorStoreManager
+
+
+def documents(count, prefix="doc"):
+    for i in range(count):
+        text = f"{prefix} product {i} - Category: Test"
+        metadata = {"name": f"{prefix} product {i}", "category": "Test"}
+        metadata["content_hash"] = hashlib.sha1(json.dumps([text, metadata], sort_keys=True).encode("utf-8")).hexdigest()
+        yield f"Test:{i}", Document(page_content=text, metadata=metadata)
+
+
+def make_manager(tmp_path, monkeypatch, embeddings, max_retries=6):
+    monkeypatch.setenv("EMBEDDING_REQUESTS_PER_MINUTE", "")
+    monkeypatch.setattr(vector_store, "EMBED_BATCH_SIZE", 4)
+    manager = VectorStoreManager(
+        str(tmp_path / "store"), skip_init=True, embeddings=embeddings, embedding_cache_path="", backend="chroma"
+    )
+    manager.scheduler = EmbeddingScheduler(manager.embeddings, max_workers=1, max_retries=max_retries, sleep=lambda _: None)
+    return manager
+
+
+def test_scheduler_backs_off_after_rate_limit():
+    embeddings = FakeEmbeddings(dimensions=16, latency=0, fail_every=2)
+    delays = []
+    scheduler = EmbeddingScheduler(embeddings, max_workers=1, base_delay=1.0, sleep=delays.append)
+
+    results = list(scheduler.map([["a"], ["b"], ["c"]], lambda texts: texts))
+
+    assert [texts for texts, _ in results] == [["a"], ["b"], ["c"]]
+    assert embeddings.failures == len(delays) > 0
+    # The first retry after a 429 waits up to base_delay (full jitter)
+    assert all(0 <= delay <= 1.0 for delay in delays)
+
+
+def test_scheduler_raises_when_retries_are_exhausted():
+    embeddings = FakeEmbeddings(dimensions=16, latency=0, fail_every=1)
+    delays = []
+    scheduler = EmbeddingScheduler(embeddings, max_workers=1, max_retries=3, sleep=delays.append)
+
+    with pytest.raises(RateLimitExceeded):
+        list(scheduler.map([["a"]], lambda texts: texts))
+    assert len(delays) == 3
+
+
+def test_interrupted_ingest_resumes_from_checkpoint(tmp_path, monkeypatch):
+    failing = FakeEmbeddings(dimensions=16, latency=0, fail_every=3)
+    manager = make_manager(tmp_path, monkeypatch, failing, max_retries=0)
+    directory = manager._new_generation_directory()
+    store = manager._open_store(directory)
+    checkpoint = BuildCheckpoint(str(tmp_path / CHECKPOINT_FILE), directory.name, fingerprint="catalog")
+
+    with pytest.raises(RateLimitExceeded):
+        manager._ingest(store, documents(12), checkpoint)
+    assert len(checkpoint.completed) == 2
+
+    resumed = BuildCheckpoint.load(str(tmp_path / CHECKPOINT_FILE))
+    assert resumed.completed == checkpoint.completed and resumed.fingerprint == "catalog"
+    healthy = FakeEmbeddings(dimensions=16, latency=0)
+    manager = make_manager(tmp_path, monkeypatch, healthy)
+    store = manager._open_store(directory)
+    assert manager._ingest(store, documents(12), resumed) == 4
+    assert healthy.embedded_texts == 4
+    assert manager._count(store) == 12
+
+
+def test_checkpoint_batches_are_keyed_by_content(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings(dimensions=16, latency=0)
+    manager = make_manager(tmp_path, monkeypatch, embeddings)
+    directory = manager._new_generation_directory()
+    store = manager._open_store(directory)
+    checkpoint = BuildCheckpoint(str(tmp_path / CHECKPOINT_FILE), directory.name)
+    manager._ingest(store, documents(8), checkpoint)
+
+    # Same product IDs, changed content: nothing may be skipped
+    assert manager._ingest(store, documents(8, prefix="changed"), checkpoint) == 8
+
+
+def test_rebuild_discards_checkpoint_of_another_catalog(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path, monkeypatch, FakeEmbeddings(dimensions=16, latency=0))
+    stale_directory = manager._new_generation_directory()
+    stale = BuildCheckpoint(str(manager.persist_directory / CHECKPOINT_FILE), stale_directory.name, fingerprint="old")
+    stale.mark_completed("batch")
+
+    started = {}
+    def create_new_store(directory, checkpoint):
+        started.update(directory=directory, checkpoint=checkpoint)
+        raise RuntimeError("stop")
+    monkeypatch.setattr(manager, "_build_fingerprint", lambda: "new")
+    monkeypatch.setattr(manager, "_create_new_store", create_new_store)
+
+    with pytest.raises(RuntimeError):
+        manager._rebuild()
+    assert started["directory"] != stale_directory
+    assert not stale_directory.exists()
+    assert started["checkpoint"].fingerprint == "new"
+    assert started["checkpoint"].completed == set()
+
+
+def test_failed_batch_leaves_no_manifest(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path, monkeypatch, FakeEmbeddings(dimensions=16, latency=0, fail_every=2), max_retries=0)
+
+    def catalog_documents(categories, manifest):
+        manifest["Test"] = {"sha256": "x"}
+        yield from documents(12)
+    monkeypatch.setattr(manager, "_catalog_documents", catalog_documents)
+
+    directory = manager._new_generation_directory()
+    with pytest.raises(RateLimitExceeded):
+        manager._create_new_store(directory)
+    assert not (directory / MANIFEST_FILE).exists()
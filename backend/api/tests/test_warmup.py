@@ -0,0 +1,74 @@
+"""
+Tests for the startup warm-up and the /ready probe
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    monkeypatch.setattr(main, "warmup_status", {"state": "pending", "stages": {}})
+    monkeypatch.setattr(main, "warmup_stop", threading.Event())
+    monkeypatch.setattr(main, "WARMUP_VECTOR_STORE", False)
+    monkeypatch.setattr(main, "WARMUP_RETRY_SECONDS", 0)
+    return main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def flaky(failures):
+    calls = []
+
+    def stage():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("not yet")
+    return stage
+
+
+def test_ready_after_every_stage_succeeded(warmup, client, monkeypatch):
+    monkeypatch.setattr(main, "READINESS_STAGES", [("a", lambda: None), ("b", lambda: None)])
+    warmup.warm_up()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert response.json()["warmup"]["stages"]["b"]["state"] == "done"
+
+
+def test_failed_stage_keeps_ready_at_503(warmup, client, monkeypatch):
+    monkeypatch.setattr(main, "READINESS_STAGES", [("a", lambda: None), ("b", flaky(1))])
+    warmup.warm_up()
+    response = client.get("/ready")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "failed"
+    assert body["warmup"]["stages"]["a"]["state"] == "done"
+    assert body["warmup"]["stages"]["b"]["state"] == "failed"
+    assert body["warmup"]["stages"]["b"]["error"] == "not yet"
+
+
+def test_failed_stages_are_retried_until_they_succeed(warmup, client, monkeypatch):
+    monkeypatch.setattr(main, "READINESS_STAGES", [("a", flaky(0)), ("b", flaky(2))])
+    monkeypatch.setattr(main, "WARMUP_RETRY_SECONDS", 0.01)
+    warmup.warm_up()
+    assert client.get("/ready").status_code == 200
+    assert warmup.warmup_status["stages"]["a"]["attempts"] == 1
+    assert warmup.warmup_status["stages"]["b"]["attempts"] == 3
+
+
+def test_stop_event_ends_the_retries(warmup, monkeypatch):
+    monkeypatch.setattr(main, "READINESS_STAGES", [("a", flaky(100))])
+    monkeypatch.setattr(main, "WARMUP_RETRY_SECONDS", 60)
+    worker = threading.Thread(target=warmup.warm_up)
+    worker.start()
+    warmup.warmup_stop.set()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert warmup.warmup_status["state"] == "failed"
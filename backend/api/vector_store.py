@@ -3,221 +3,1126 @@ Vector Store Manager for Smart Search AI
 Manages embeddings and semantic search of products using Chroma DB
 """
 import os
-import pandas as pd
+import re
+import json
+import time
+import queue
+import shutil
+import sqlite3
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import List, Dict, Iterator, Optional, Tuple, TYPE_CHECKING
 from pathlib import Path
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
-from products import get_df_by_category, ALL_CATEGORIES
+import metrics
+from embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_model_name
+from embedding_scheduler import BuildCheckpoint, EmbeddingScheduler, RateLimitedEmbeddings, RateLimiter
+from embeddings import GOOGLE_EMBEDDING_MODEL, embed_queries, get_embeddings, get_embedding_provider
+from products import ALL_CATEGORIES, catalog_store
+from product_index import ProductIndex, catalog_fingerprint, get_product_index
+from numpy_vector_index import META_FILE, NumpyVectorIndex
+from shared_arrays import FileLock
+
+# langchain_chroma (and chromadb) take seconds to import, so the NumPy backend never imports them
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
 
 logger = logging.getLogger(__name__)
 
+_ASIN_RE = re.compile(r"/dp/([A-Z0-9]{10})")
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "sync_manifest.json"
+GENERATION_PREFIX = "gen-"
+CHECKPOINT_FILE = "build_checkpoint.json"
+# Held by whichever worker process is building, so concurrent builds are refused across workers
+BUILD_LOCK_FILE = "build.lock"
+# "<generation>.readers" is locked shared by every worker serving that generation
+READERS_SUFFIX = ".readers"
+
+INGEST_CHUNK_ROWS = 1000
+EMBED_BATCH_SIZE = 500
+INGEST_QUEUE_BATCHES = 2
+
+# Bumped when document metadata changes, so the next sync rewrites every category
+METADATA_VERSION = 2
+
+# Distance function of new Chroma collections, so vector scores are cosine similarities whatever the embedding norms
+CHROMA_SPACE = "cosine"
+
+SEARCH_MODES = ("vector", "hybrid")
+VECTOR_STORE_BACKENDS = ("chroma", "numpy")
+# Reciprocal-rank fusion constant (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+
+_END_OF_STREAM = object()
+
+
+def product_ids(category: str, links: List[str], seen: Optional[Counter] = None) -> List[str]:
+    """
+    Stable document IDs for the rows of a category, derived from the Amazon ASIN in each link.
+    
+    Repeated listings of the same ASIN get an occurrence suffix ("#1", "#2", ...).
+    Pass the same `seen` counter when a category is processed in several chunks.
+    """
+    if seen is None:
+        seen = Counter()
+    ids = []
+    for link in links:
+        match = _ASIN_RE.search(str(link))
+        if match:
+            base = f"{category}::{match.group(1)}"
+        else:
+            base = f"{category}::{hashlib.sha1(str(link).encode('utf-8')).hexdigest()[:16]}"
+        occurrence = seen[base]
+        seen[base] += 1
+        ids.append(base if occurrence == 0 else f"{base}#{occurrence}")
+    return ids
+
+
+def collection_name(model_name: str) -> str:
+    """
+    Chroma collection of an embedding model, so vectors of different models never share one.
+    
+    The original Google model keeps the "products" collection of existing stores.
+    """
+    if model_name == GOOGLE_EMBEDDING_MODEL:
+        return "products"
+    slug = re.sub(r"[^a-z0-9]+", "_", model_name.lower()).strip("_") or "model"
+    name = f"products_{slug}"
+    if len(name) > 63:
+        # Chroma limits names to 63 characters; the hash keeps truncated names distinct
+        name = f"products_{slug[:40].strip('_')}_{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def _text(value) -> str:
+    return str(value) if pd.notna(value) else ""
+
 
 class VectorStoreManager:
     """Manages the vector store of products for semantic search"""
     
-    def __init__(self, persist_directory: str = None, skip_init: bool = False):
+    def __init__(
+        self,
+        persist_directory: str = None,
+        skip_init: bool = False,
+        embeddings: Optional[Embeddings] = None,
+        embedding_provider: Optional[str] = None,
+        embedding_cache_path: Optional[str] = None,
+        backend: Optional[str] = None
+    ):
+        self.backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")).strip().lower()
+        if self.backend not in VECTOR_STORE_BACKENDS:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{self.backend}'. Available: {', '.join(VECTOR_STORE_BACKENDS)}")
+        
         if persist_directory is None:
-            persist_directory = os.path.join(os.path.dirname(__file__), "chroma_db")
+            default_directory = "chroma_db" if self.backend == "chroma" else "numpy_index"
+            persist_directory = os.path.join(os.path.dirname(__file__), default_directory)
         
+        # Each build lives in its own generation directory; CURRENT names the live one
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(exist_ok=True)
         
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GEMINI_API_KEY")
-        )
+        if embeddings is None:
+            embedding_provider = embedding_provider or get_embedding_provider()
+            embeddings = get_embeddings(embedding_provider)
+        # Vectors from different models are not comparable, so each model gets its own collection
+        self.collection_name = collection_name(embedding_model_name(embeddings))
+        
+        # Rate limiting sits below the cache so cached texts never consume quota
+        self.rate_limited = getattr(embeddings, "rate_limited", True)
+        if self.rate_limited:
+            embeddings = RateLimitedEmbeddings(embeddings, RateLimiter.from_env())
+        
+        # Kept outside persist_directory so rebuilds reuse cached vectors
+        if embedding_cache_path is None:
+            embedding_cache_path = os.getenv(
+                "EMBEDDING_CACHE_PATH",
+                os.path.join(os.path.dirname(__file__), "embedding_cache.db")
+            )
+        if embedding_cache_path:
+            embeddings = CachedEmbeddings(embeddings, EmbeddingCache(embedding_cache_path))
+        self.embeddings = embeddings
+        self.scheduler = EmbeddingScheduler.from_env(embeddings)
+        
+        # Optional cap for small deployments; the full catalog is indexed by default
+        max_per_category = os.getenv("VECTOR_STORE_MAX_PRODUCTS_PER_CATEGORY")
+        self.max_products_per_category = int(max_per_category) if max_per_category else None
+        
+        # NumPy backend settings: storage precision and IVF lists (0 = exact search)
+        self.numpy_dtype = os.getenv("NUMPY_INDEX_DTYPE", "int8")
+        self.numpy_nlist = int(os.getenv("NUMPY_INDEX_NLIST", "0"))
+        self.numpy_nprobe = int(os.getenv("NUMPY_INDEX_NPROBE", "8"))
+        
+        # How often searches check whether another worker activated a newer generation (0 = never)
+        self.reload_interval = float(os.getenv("VECTOR_STORE_RELOAD_SECONDS", "1"))
+        self._checked_current_at = time.monotonic()
         
         self.vector_store = None
+        # Catalog and index fingerprints of the last stale-index warning, so it is logged once per change
+        self._stale_warning: Optional[Tuple[str, str]] = None
+        self.active_directory = self._read_active_directory()
+        # Shared locks on the generations this process may still read, so no worker removes them
+        self._generation_locks: Dict[Path, FileLock] = {}
+        self._generation_locks_guard = threading.Lock()
+        self._build_lock = FileLock(str(self.persist_directory / BUILD_LOCK_FILE))
+        self.last_build: Dict = {"state": "idle"}
         if not skip_init:
             self._load_or_create_store()
     
+    def _read_active_directory(self) -> Path:
+        """Returns the live generation directory (the root itself for stores built before generations)"""
+        current_file = self.persist_directory / CURRENT_FILE
+        if current_file.exists():
+            generation = current_file.read_text(encoding="utf-8").strip()
+            if generation and (self.persist_directory / generation).is_dir():
+                return self.persist_directory / generation
+        return self.persist_directory
+    
+    def _follow_current(self, force: bool = False):
+        """
+        Switches to the generation named by CURRENT when it is not the one this
+        process serves, i.e. another worker process built and activated it.
+        
+        Checked at most every reload_interval seconds. The NumPy backend maps
+        the new files, so every worker shares them through the page cache.
+        """
+        now = time.monotonic()
+        if not force and (self.reload_interval <= 0 or now - self._checked_current_at < self.reload_interval):
+            return
+        self._checked_current_at = now
+        
+        directory = self._read_active_directory()
+        if directory == self.active_directory:
+            return
+        store = None
+        try:
+            if self._lock_generation(directory):
+                store = self._open_store(directory)
+        except Exception as e:
+            logger.warning(f"Could not open vector store generation {directory.name}: {e}")
+        if store is None:
+            self._unlock_generation(directory)
+            return
+        self._serve(directory, store)
+        logger.info(f"Switched to vector store generation {directory.name}")
+    
+    def _readers_path(self, directory: Path) -> Path:
+        return self.persist_directory / f"{directory.name}{READERS_SUFFIX}"
+    
+    def _lock_generation(self, directory: Path) -> bool:
+        """
+        Takes a shared lock on a generation for as long as this process may read it.
+        
+        Returns False (holding nothing) when the generation was removed before
+        the lock was taken.
+        """
+        with self._generation_locks_guard:
+            if directory not in self._generation_locks:
+                lock = FileLock(str(self._readers_path(directory)), shared=True)
+                lock.acquire()
+                self._generation_locks[directory] = lock
+            if directory.is_dir():
+                return True
+            self._generation_locks.pop(directory).release()
+            return False
+    
+    def _unlock_generation(self, directory: Path):
+        with self._generation_locks_guard:
+            lock = self._generation_locks.pop(directory, None)
+            if lock is not None:
+                lock.release()
+    
+    def _release_generations(self, keep: Tuple[Path, ...]):
+        """Releases the shared locks of all generations except keep"""
+        with self._generation_locks_guard:
+            for directory in [held for held in self._generation_locks if held not in keep]:
+                self._generation_locks.pop(directory).release()
+    
+    def _serve(self, directory: Path, store):
+        """
+        Swaps the live store of this process.
+        
+        The previous generation stays locked until the next swap, so searches
+        still running on it are not cut off by another worker's cleanup.
+        """
+        previous_directory = self.active_directory
+        self.vector_store = store
+        self.active_directory = directory
+        self._release_generations(keep=(directory, previous_directory))
+        return previous_directory
+    
+    def _new_generation_directory(self) -> Path:
+        generation = self.persist_directory / f"{GENERATION_PREFIX}{time.time_ns()}"
+        generation.mkdir()
+        return generation
+    
+    def _open_store(self, directory: Path):
+        """Opens the store of a generation: a Chroma collection, or a NumpyVectorIndex (None if not built)"""
+        if self.backend == "numpy":
+            if not (directory / META_FILE).exists():
+                return None
+            index = NumpyVectorIndex(directory, nprobe=self.numpy_nprobe)
+            if index.model_name != embedding_model_name(self.embeddings):
+                logger.warning(f"NumPy index in {directory.name} was built with {index.model_name}, ignoring it")
+                return None
+            return index
+        from langchain_chroma import Chroma
+        # Only applies when the collection is created; existing collections keep their space
+        store = Chroma(
+            persist_directory=str(directory),
+            embedding_function=self.embeddings,
+            collection_name=self.collection_name,
+            collection_metadata={"hnsw:space": CHROMA_SPACE}
+        )
+        if self._chroma_space(store) != CHROMA_SPACE:
+            logger.warning(
+                f"Chroma collection in {directory.name} uses {self._chroma_space(store)} distances; "
+                f"vector scores assume unit-length embeddings until /vector-store/rebuild"
+            )
+        return store
+    
+    @staticmethod
+    def _chroma_space(store: "Chroma") -> str:
+        return (store._collection.metadata or {}).get("hnsw:space", "l2")
+    
+    def _count(self, store) -> int:
+        if store is None:
+            return 0
+        return store.count() if self.backend == "numpy" else store._collection.count()
+    
+    def _activate(self, directory: Path, store):
+        """Atomically points CURRENT at a finished generation and swaps the live store"""
+        self._lock_generation(directory)
+        tmp_file = self.persist_directory / f"{CURRENT_FILE}.tmp"
+        tmp_file.write_text(directory.name, encoding="utf-8")
+        os.replace(tmp_file, self.persist_directory / CURRENT_FILE)
+        
+        previous_directory = self._serve(directory, store)
+        logger.info(f"Vector store generation {directory.name} is now live")
+        
+        self._remove_stale_generations(previous_directory)
+    
+    def _remove_stale_generations(self, previous_directory: Path):
+        """
+        Best-effort cleanup; anything still in use is retried after the next swap.
+        
+        The previous generation is kept until the next swap, so other workers
+        can still open it until they switch to the new one. An older generation
+        is only removed once no worker holds its readers lock, i.e. no process
+        still serves it (a worker that has not yet followed CURRENT, or one
+        finishing searches on its own previous generation).
+        """
+        def remove(directory: Path, remove_files):
+            lock = FileLock(str(self._readers_path(directory)))
+            if not lock.acquire(blocking=False):
+                logger.info(f"Vector store generation {directory.name} is still in use, keeping it")
+                return
+            try:
+                remove_files()
+                try:
+                    os.unlink(self._readers_path(directory))
+                except OSError:
+                    pass
+            finally:
+                lock.release()
+        
+        legacy_files = []
+        for child in self.persist_directory.iterdir():
+            if child in (self.active_directory, previous_directory):
+                continue
+            if child.name.startswith((CURRENT_FILE, CHECKPOINT_FILE, BUILD_LOCK_FILE)) or child.name.endswith(READERS_SUFFIX):
+                continue
+            if child.name.startswith(GENERATION_PREFIX):
+                if child.is_dir():
+                    remove(child, lambda: shutil.rmtree(child, ignore_errors=True))
+            elif previous_directory != self.persist_directory and self.active_directory != self.persist_directory:
+                # Files of a pre-generation store live directly in the root
+                legacy_files.append(child)
+        
+        def remove_legacy():
+            for child in legacy_files:
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    try:
+                        child.unlink()
+                    except OSError:
+                        pass
+        
+        if legacy_files:
+            remove(self.persist_directory, remove_legacy)
+    
+    def _copy_generation(self, source: Path, target: Path):
+        """
+        Copies a Chroma generation as a consistent snapshot.
+        
+        SQLite files are copied through the backup API (a plain copy can catch
+        the database between a write and its journal or WAL), and before the
+        segment files: SQLite holds the write log those files are built from,
+        so segments at least as new as the database are replayed, not lost.
+        Nothing else writes a generation while this build holds the build lock.
+        """
+        for database in source.glob("*.sqlite3"):
+            src = sqlite3.connect(f"{database.as_uri()}?mode=ro", uri=True)
+            dst = sqlite3.connect(str(target / database.name))
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
+        shutil.copytree(
+            source, target, dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns(
+                "*.sqlite3*", f"{GENERATION_PREFIX}*", f"{CURRENT_FILE}*", f"{CHECKPOINT_FILE}*",
+                BUILD_LOCK_FILE, f"*{READERS_SUFFIX}"
+            )
+        )
+    
     def _load_or_create_store(self):
         """Loads existing vector store or creates a new one"""
         try:
-            self.vector_store = Chroma(
-                persist_directory=str(self.persist_directory),
-                embedding_function=self.embeddings,
-                collection_name="products"
-            )
+            if self._lock_generation(self.active_directory):
+                self.vector_store = self._open_store(self.active_directory)
             
-            if self.vector_store._collection.count() > 0:
-                logger.info(f"Vector store loaded with {self.vector_store._collection.count()} products")
+            if self._count(self.vector_store) > 0:
+                logger.info(f"Vector store loaded with {self._count(self.vector_store)} products")
                 return
         except Exception as e:
             logger.warning(f"Could not load existing vector store: {e}")
         
-        logger.info("Creating new vector store")
-        self._create_new_store()
-    
-    def _create_new_store(self):
-        """Creates a new vector store with all products"""
-        import time
+        def build():
+            # Another worker may have built it while this one waited for the build lock
+            self._follow_current(force=True)
+            if self._count(self.vector_store) > 0:
+                logger.info(f"Vector store loaded with {self._count(self.vector_store)} products")
+                return {"generation": self.active_directory.name, "products": self._count(self.vector_store)}
+            logger.info("Creating new vector store")
+            return self._rebuild()
         
-        documents = []
+        self._run_build("rebuild", build, blocking=True)
+    
+    def _category_documents(self, category: str) -> Iterator[Tuple[str, Document]]:
+        """Streams (product id, Document) for the indexed rows of a category, one chunk at a time"""
+        seen = Counter()
+        remaining = self.max_products_per_category
         
-        logger.info(f"Processing {len(ALL_CATEGORIES)} categories")
+        for chunk in catalog_store.iter_chunks(category, INGEST_CHUNK_ROWS):
+            if remaining is not None:
+                chunk = chunk.head(remaining)
+                remaining -= len(chunk)
+            ids = product_ids(category, chunk['link'].tolist(), seen)
+            
+            for product_id, row in zip(ids, chunk.to_dict('records')):
+                product_text = f"{row['name']} - Category: {category}"
+                metadata = {
+                    "name": _text(row['name']),
+                    "category": category,
+                    "category_translated": category,
+                    "sub_category": _text(row.get('sub_category')),
+                    "image": _text(row.get('image')),
+                    "link": _text(row.get('link')),
+                    "ratings": float(row['ratings_value']) if pd.notna(row.get('ratings_value')) else 0,
+                    "actual_price": _text(row.get('actual_price')) or "0"
+                }
+                # Numeric price for range filters; Chroma has no nulls, so unpriced rows omit the key
+                if pd.notna(row.get('actual_price_value')):
+                    metadata["price_value"] = float(row['actual_price_value'])
+                # Lets incremental syncs skip rows whose text and metadata did not change
+                metadata["content_hash"] = hashlib.sha1(
+                    json.dumps([product_text, metadata], sort_keys=True).encode("utf-8")
+                ).hexdigest()
+                yield product_id, Document(page_content=product_text, metadata=metadata)
+            
+            if remaining == 0:
+                break
+    
+    def _catalog_documents(self, categories: List[str], manifest: Dict[str, Dict]) -> Iterator[Tuple[str, Document]]:
+        """Streams the documents of every category, recording each file's fingerprint in manifest"""
+        logger.info(f"Processing {len(categories)} categories")
         
-        for i, category in enumerate(ALL_CATEGORIES, 1):
+        for i, category in enumerate(categories, 1):
             try:
-                df = get_df_by_category(category)
-                if df is None or len(df) == 0:
-                    continue
-                
-                df_sample = df.head(50)
-                
-                for _, row in df_sample.iterrows():
-                    product_text = f"{row['name']} - Category: {category}"
-                    
-                    doc = Document(
-                        page_content=product_text,
-                        metadata={
-                            "name": row['name'],
-                            "category": category,
-                            "category_translated": category,
-                            "sub_category": row.get('sub_category', ''),
-                            "image": row.get('image', ''),
-                            "link": row.get('link', ''),
-                            "ratings": float(row.get('ratings', 0)) if pd.notna(row.get('ratings')) else 0,
-                            "actual_price": str(row.get('actual_price', '0'))
-                        }
-                    )
-                    documents.append(doc)
+                manifest[category] = self._file_fingerprint(category, None)
+                yield from self._category_documents(category)
                 
                 if i % 20 == 0:
-                    logger.info(f"Processed {i}/{len(ALL_CATEGORIES)} categories")
-                
+                    logger.info(f"Processed {i}/{len(categories)} categories")
+            
             except Exception as e:
                 logger.error(f"Error processing category {category}: {e}")
+                manifest.pop(category, None)
                 continue
+    
+    def _file_fingerprint(self, category: str, previous: Optional[Dict]) -> Dict:
+        """Size, mtime and sha256 of a category CSV; the hash is reused when size and mtime match"""
+        csv_path = catalog_store.csv_path(category)
+        stat = os.stat(csv_path)
+        if (
+            previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns
+            and previous.get("metadata_version") == METADATA_VERSION
+        ):
+            return previous
         
-        logger.info(f"Total documents: {len(documents)}")
-        logger.info("Generating embeddings in batches (respecting rate limits)")
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest.hexdigest(),
+            "metadata_version": METADATA_VERSION
+        }
+    
+    def _read_manifest(self, directory: Path) -> Dict[str, Dict]:
+        manifest_file = directory / MANIFEST_FILE
+        if not manifest_file.exists():
+            return {}
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _write_manifest(self, directory: Path, manifest: Dict[str, Dict]):
+        with open(directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    
+    def _queued_batches(self, documents: Iterator[Tuple[str, Document]]) -> Iterator[List[Tuple[str, Document]]]:
+        """
+        Groups (id, Document) pairs into batches parsed ahead on a producer thread.
         
-        batch_size = 500
-        total_batches = (len(documents) + batch_size - 1) // batch_size
+        The bounded queue applies backpressure, so at most INGEST_QUEUE_BATCHES
+        parsed batches wait in memory whatever the catalog size.
+        """
+        batches = queue.Queue(maxsize=INGEST_QUEUE_BATCHES)
+        stop = threading.Event()
         
-        self.vector_store = Chroma(
-            persist_directory=str(self.persist_directory),
-            embedding_function=self.embeddings,
-            collection_name="products"
-        )
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
         
-        for batch_num in range(total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min((batch_num + 1) * batch_size, len(documents))
-            batch_docs = documents[start_idx:end_idx]
-            
-            logger.info(f"Processing batch {batch_num + 1}/{total_batches} ({len(batch_docs)} documents)")
-            
+        def produce():
             try:
-                self.vector_store.add_documents(batch_docs)
-                logger.info(f"Batch {batch_num + 1} completed successfully")
-                
-                if batch_num < total_batches - 1:
-                    delay = 20
-                    logger.info(f"Waiting {delay}s before next batch")
-                    time.sleep(delay)
-                    
+                batch = []
+                for item in documents:
+                    batch.append(item)
+                    if len(batch) == EMBED_BATCH_SIZE:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch and not put(batch):
+                    return
+                put(_END_OF_STREAM)
             except Exception as e:
-                logger.error(f"Error in batch {batch_num + 1}: {e}")
-                if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
-                    logger.warning("Rate limit reached, waiting 60s before retry")
-                    time.sleep(60)
-                    try:
-                        self.vector_store.add_documents(batch_docs)
-                        logger.info(f"Batch {batch_num + 1} completed after retry")
-                    except Exception as retry_error:
-                        logger.error(f"Retry failed: {retry_error}")
-                        continue
+                put(e)
+        
+        producer = threading.Thread(target=produce, name="vector-store-ingest", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+    
+    def _ingest(
+        self,
+        store: "Chroma",
+        documents: Iterator[Tuple[str, Document]],
+        checkpoint: Optional[BuildCheckpoint] = None
+    ) -> int:
+        """
+        Streams (id, Document) pairs into the store.
+        
+        Batches are embedded concurrently by the EmbeddingScheduler (rate limited,
+        with backoff) and written by this thread as they complete. With a
+        checkpoint, batches it already records are skipped and each written
+        batch is recorded, so an interrupted build resumes where it stopped.
+        """
+        def pending_batches():
+            for batch in self._queued_batches(documents):
+                # Keyed by content too, so a batch whose products changed is not skipped
+                batch_id = hashlib.sha1("\n".join(
+                    f"{product_id}\0{doc.metadata['content_hash']}" for product_id, doc in batch
+                ).encode("utf-8")).hexdigest()
+                if checkpoint is not None and batch_id in checkpoint.completed:
+                    continue
+                yield batch_id, batch
+        
+        if self.rate_limited:
+            logger.info("Generating embeddings in batches (respecting rate limits)")
+        else:
+            logger.info("Generating embeddings in batches (local provider, no throttling)")
+        
+        total = 0
+        batches = self.scheduler.map(
+            pending_batches(),
+            lambda item: [doc.page_content for _, doc in item[1]]
+        )
+        for batch_num, ((batch_id, batch), vectors) in enumerate(batches, 1):
+            ids = [product_id for product_id, _ in batch]
+            docs = [doc for _, doc in batch]
+            store._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                metadatas=[doc.metadata for doc in docs],
+                documents=[doc.page_content for doc in docs]
+            )
+            if checkpoint is not None:
+                checkpoint.mark_completed(batch_id)
+            total += len(docs)
+            logger.info(f"Batch {batch_num} completed successfully ({len(docs)} documents)")
+        
+        logger.info(f"Total documents: {total}")
+        return total
+    
+    def _create_new_store(self, directory: Path, checkpoint: Optional[BuildCheckpoint] = None) -> "Chroma":
+        """Creates a new vector store with all products in the given directory"""
+        manifest = {}
+        
+        store = self._open_store(directory)
+        self._ingest(store, self._catalog_documents(ALL_CATEGORIES, manifest), checkpoint)
+        self._write_manifest(directory, manifest)
         
         logger.info("Vector store created successfully")
+        return store
+    
+    def _create_numpy_index(self, directory: Path) -> NumpyVectorIndex:
+        """Embeds the catalog into a NumpyVectorIndex whose rows follow the global product table"""
+        index = get_product_index(refresh=True)
+        names = index.table.column("name").to_pylist()
+        
+        row_ids, category_ranges = [], {}
+        num_rows = 0
+        for code, category in enumerate(index.categories):
+            start, end = np.searchsorted(index.category_codes, [code, code + 1])
+            ids = np.arange(start, end)
+            if self.max_products_per_category is not None:
+                ids = ids[:self.max_products_per_category]
+            row_ids.append(ids)
+            category_ranges[category] = (num_rows, num_rows + len(ids))
+            num_rows += len(ids)
+        row_ids = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.int64)
+        
+        def batches():
+            for start in range(0, num_rows, EMBED_BATCH_SIZE):
+                ids = row_ids[start:start + EMBED_BATCH_SIZE]
+                # Same text as the Chroma documents, so both backends share the embedding cache
+                yield start, [f"{names[i]} - Category: {index.categories[index.category_codes[i]]}" for i in ids]
+        
+        logger.info(f"Embedding {num_rows} products into a NumPy index ({self.numpy_dtype})")
+        embedded = (
+            (start, vectors)
+            for (start, _), vectors in self.scheduler.map(batches(), lambda item: item[1])
+        )
+        return NumpyVectorIndex.build(
+            directory, embedded, row_ids, category_ranges,
+            catalog_fingerprint=index.fingerprint,
+            product_ranges=index.category_ranges,
+            model_name=embedding_model_name(self.embeddings),
+            dtype=self.numpy_dtype,
+            nlist=self.numpy_nlist,
+            nprobe=self.numpy_nprobe
+        )
+    
+    def _sync_category(self, store: "Chroma", category: str) -> Tuple[int, int]:
+        """Upserts new or changed rows of a category and deletes rows that disappeared"""
+        # Only hashes are kept in memory; documents are streamed again for the upsert
+        desired_hashes = {
+            product_id: doc.metadata["content_hash"]
+            for product_id, doc in self._category_documents(category)
+        }
+        
+        existing = store.get(where={"category": category}, include=["metadatas"])
+        existing_hashes = {
+            product_id: (metadata or {}).get("content_hash")
+            for product_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+        
+        to_delete = [product_id for product_id in existing_hashes if product_id not in desired_hashes]
+        to_upsert = {
+            product_id for product_id, content_hash in desired_hashes.items()
+            if existing_hashes.get(product_id) != content_hash
+        }
+        
+        if to_delete:
+            store.delete(ids=to_delete)
+        if to_upsert:
+            self._ingest(store, (
+                (product_id, doc) for product_id, doc in self._category_documents(category)
+                if product_id in to_upsert
+            ))
+        
+        return len(to_upsert), len(to_delete)
+    
+    @staticmethod
+    def _where(
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        min_rating: Optional[float]
+    ) -> Optional[Dict]:
+        """Chroma metadata filter for the given category and numeric ranges"""
+        conditions = []
+        if category:
+            conditions.append({"category": category})
+        if min_price is not None:
+            conditions.append({"price_value": {"$gte": min_price}})
+        if max_price is not None:
+            conditions.append({"price_value": {"$lte": max_price}})
+        if min_rating is not None:
+            conditions.append({"ratings": {"$gte": min_rating}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    @staticmethod
+    def _product(metadata: Dict) -> Dict:
+        return {
+            "name": metadata.get("name", ""),
+            "category": metadata.get("category", ""),
+            "category_translated": metadata.get("category_translated", ""),
+            "sub_category": metadata.get("sub_category", ""),
+            "image": metadata.get("image", ""),
+            "link": metadata.get("link", ""),
+            "ratings": metadata.get("ratings", 0),
+            "actual_price": metadata.get("actual_price", "0"),
+        }
+    
+    @staticmethod
+    def _index_products(index: ProductIndex, product_ids: np.ndarray) -> List[Dict]:
+        """Search results for rows of the global product table"""
+        rows = index.rows(np.asarray(product_ids, dtype=np.int64))
+        return [
+            {
+                "name": _text(row["name"]),
+                "category": row["category"],
+                "category_translated": row["category"],
+                "sub_category": _text(row["sub_category"]),
+                "image": _text(row["image"]),
+                "link": _text(row["link"]),
+                "ratings": float(row["ratings_value"]) if pd.notna(row["ratings_value"]) else 0,
+                "actual_price": _text(row["actual_price"]) or "0",
+            }
+            for row in rows.to_dict("records")
+        ]
+    
+    def _numpy_search(
+        self,
+        vector_index: NumpyVectorIndex,
+        query_vectors: List[List[float]],
+        k: int,
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        min_rating: Optional[float]
+    ) -> List[List[Dict]]:
+        index = get_product_index()
+        if vector_index.catalog_fingerprint != index.fingerprint:
+            # Like a Chroma store, a stale index keeps serving until the next sync, as long as its rows still address the same products
+            if not vector_index.maps_onto(index.category_ranges, index.num_products):
+                raise RuntimeError("Products were added or removed since the NumPy index was built; run /vector-store/sync")
+            if self._stale_warning != (vector_index.catalog_fingerprint, index.fingerprint):
+                self._stale_warning = (vector_index.catalog_fingerprint, index.fingerprint)
+                logger.warning("The catalog changed since the NumPy index was built; serving it until /vector-store/sync")
+        
+        product_mask = None
+        if min_price is not None or max_price is not None or min_rating is not None:
+            product_mask = index.mask(min_price=min_price, max_price=max_price, min_rating=min_rating)
+        
+        results = []
+        for hits in vector_index.search_batch(query_vectors, k=k, category=category, product_mask=product_mask):
+            products = self._index_products(index, [product_id for product_id, _ in hits])
+            for product, (_, score) in zip(products, hits):
+                product["vector_score"] = score
+            results.append(products)
+        return results
+    
+    def _vector_search(self, vector_store: "Chroma", query_vectors: List[List[float]], k: int, where: Optional[Dict]) -> List[List[Dict]]:
+        """
+        Nearest neighbours of several query vectors in one Chroma query.
+        
+        Uses the collection directly because LangChain's similarity_search_*
+        methods take one query at a time, which would undo search batching.
+        """
+        response = vector_store._collection.query(
+            query_embeddings=query_vectors, n_results=k, where=where, include=["metadatas", "distances"]
+        )
+        # Cosine distance is 1 - similarity. Collections created before CHROMA_SPACE was pinned use
+        # squared L2 distance, which is 2 - 2 * similarity only for unit-length embeddings
+        scale = 1.0 if self._chroma_space(vector_store) == "cosine" else 0.5
+        results = []
+        for metadatas, distances in zip(response["metadatas"], response["distances"]):
+            products = []
+            for metadata, distance in zip(metadatas, distances):
+                product = self._product(metadata)
+                product["vector_score"] = 1.0 - float(distance) * scale
+                products.append(product)
+            results.append(products)
+        return results
+    
+    def _lexical_search(
+        self,
+        query: str,
+        k: int,
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        min_rating: Optional[float]
+    ) -> List[Dict]:
+        """BM25 over every product name, with the same filters applied as a mask before ranking"""
+        index = get_product_index()
+        mask = index.mask(
+            categories=[category] if category else None,
+            min_price=min_price, max_price=max_price, min_rating=min_rating
+        )
+        scores = index.lexical_index().score(query)
+        candidates = np.flatnonzero(mask & (scores > 0))
+        top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+        
+        products = self._index_products(index, top)
+        for product, score in zip(products, scores[top]):
+            product["lexical_score"] = float(score)
+        return products
     
     def search_products(
-        self, 
-        query: str, 
+        self,
+        query: str,
         category: Optional[str] = None,
-        k: int = 20
+        k: int = 20,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        mode: str = "vector"
     ) -> List[Dict]:
         """
-        Search products using semantic similarity
+        Search products using semantic similarity, optionally fused with BM25
         
         Args:
             query: User search text
             category: Category to filter (optional)
             k: Number of results
-            
+            min_price, max_price: Price range, applied inside the store (optional)
+            min_rating: Minimum rating, applied inside the store (optional)
+            mode: 'vector' (embeddings only) or 'hybrid' (embeddings + BM25 with reciprocal-rank fusion)
+        
         Returns:
-            List of relevant products
+            List of relevant products. relevance_score is the cosine similarity
+            in vector mode and the fused RRF score in hybrid mode.
+        """
+        return self.search_products_batch(
+            [query], category=category, k=k,
+            min_price=min_price, max_price=max_price, min_rating=min_rating, mode=mode
+        )[0]
+    
+    def search_products_batch(
+        self,
+        queries: List[str],
+        category: Optional[str] = None,
+        k: int = 20,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        mode: str = "vector",
+        query_vectors: Optional[List[List[float]]] = None
+    ) -> List[List[Dict]]:
         """
-        if self.vector_store is None:
-            return []
+        search_products for several queries sharing the same filters, with one
+        vector store lookup for all of them.
         
-        filter_dict = None
-        if category:
-            filter_dict = {"category": category}
+        Args:
+            query_vectors: embeddings of queries, if already computed
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Available: {', '.join(SEARCH_MODES)}")
         
-        results = self.vector_store.similarity_search(
-            query,
-            k=k,
-            filter=filter_dict
-        )
+        self._follow_current()
+        vector_store = self.vector_store
+        if vector_store is None:
+            return [[] for _ in queries]
+        if query_vectors is None:
+            with metrics.span("query_embedding"):
+                metrics.EMBEDDING_BATCH_SIZE.observe(len(queries), kind="query")
+                query_vectors = embed_queries(self.embeddings, queries)
         
-        products = []
-        for doc in results:
-            products.append({
-                "name": doc.metadata.get("name", ""),
-                "category": doc.metadata.get("category", ""),
-                "category_translated": doc.metadata.get("category_translated", ""),
-                "sub_category": doc.metadata.get("sub_category", ""),
-                "image": doc.metadata.get("image", ""),
-                "link": doc.metadata.get("link", ""),
-                "ratings": doc.metadata.get("ratings", 0),
-                "actual_price": doc.metadata.get("actual_price", "0"),
-                "relevance_score": getattr(doc, 'score', 1.0)
-            })
+        @metrics.timed("vector_search")
+        def vector_search(depth: int) -> List[List[Dict]]:
+            if self.backend == "numpy":
+                return self._numpy_search(vector_store, query_vectors, depth, category, min_price, max_price, min_rating)
+            # Filters are pushed into the store so all k results satisfy them
+            where = self._where(category, min_price, max_price, min_rating)
+            return self._vector_search(vector_store, query_vectors, depth, where)
         
-        return products
+        if mode == "vector":
+            results = vector_search(k)
+            for products in results:
+                for product in products:
+                    product["relevance_score"] = product["vector_score"]
+            return results
+        
+        # Each retriever contributes a deeper candidate list than k so fusion can reorder them
+        depth = max(k * 3, 50)
+        results = []
+        for query, vector_ranking in zip(queries, vector_search(depth)):
+            with metrics.span("lexical_search"):
+                lexical_ranking = self._lexical_search(query, depth, category, min_price, max_price, min_rating)
+            results.append(self._fuse((vector_ranking, lexical_ranking), k))
+        return results
     
-    def rebuild_store(self):
-        """Rebuilds the vector store from scratch"""
-        logger.info("Rebuilding vector store")
+    def search_many(self, requests: List[Tuple[str, Dict]]) -> List:
+        """
+        Serves a batch of independent searches: (query, search_products keyword arguments) pairs.
         
-        # Explicitly release the vector store and trigger GC for Windows
-        self.vector_store = None
-        import gc
-        import shutil
-        import time
-        gc.collect()
-        
-        if self.persist_directory.exists():
-            # Try multiple times on Windows as file handles might take a moment to release
-            max_retries = 5
-            for i in range(max_retries):
-                try:
-                    shutil.rmtree(self.persist_directory)
-                    logger.info(f"Existing vector store at {self.persist_directory} deleted")
-                    break
-                except PermissionError as e:
-                    if i == max_retries - 1:
-                        logger.error(f"Failed to delete {self.persist_directory} after {max_retries} attempts: {e}")
-                        raise
-                    logger.warning(f"File in use, retrying deletion ({i+1}/{max_retries})...")
-                    time.sleep(2)
+        Distinct query texts are embedded in a single call, and requests with the
+        same filters share one vector store lookup. Each entry of the result is the
+        product list of that request, or the exception it raised.
+        """
+        texts = list(dict.fromkeys(query for query, _ in requests))
+        try:
+            with metrics.span("query_embedding"):
+                metrics.EMBEDDING_BATCH_SIZE.observe(len(texts), kind="query")
+                vectors = dict(zip(texts, embed_queries(self.embeddings, texts)))
+        except Exception as e:
+            return [e] * len(requests)
+        
+        groups: Dict[Tuple, List[int]] = {}
+        for position, (_, params) in enumerate(requests):
+            groups.setdefault(tuple(sorted(params.items())), []).append(position)
+        
+        results: List = [None] * len(requests)
+        for key, positions in groups.items():
+            queries = [requests[position][0] for position in positions]
+            try:
+                group_results = self.search_products_batch(
+                    queries, query_vectors=[vectors[query] for query in queries], **dict(key)
+                )
+            except Exception as e:
+                group_results = [e] * len(positions)
+            for position, products in zip(positions, group_results):
+                results[position] = products
+        return results
+    
+    @staticmethod
+    def _fuse(rankings: Tuple[List[Dict], ...], k: int) -> List[Dict]:
+        """Reciprocal-rank fusion of several rankings of the same products"""
+        fused: Dict[Tuple[str, str], Dict] = {}
+        for ranking in rankings:
+            for rank, product in enumerate(ranking, 1):
+                key = (product["category"], product["link"] or product["name"])
+                entry = fused.setdefault(key, {**product, "relevance_score": 0.0})
+                entry.update({name: value for name, value in product.items() if name.endswith("_score")})
+                entry["relevance_score"] += 1.0 / (RRF_K + rank)
+        
+        return sorted(fused.values(), key=lambda product: product["relevance_score"], reverse=True)[:k]
+    
+    def is_building(self) -> bool:
+        return self._build_lock.locked()
+    
+    def try_acquire_build(self) -> bool:
+        """
+        Takes the build lock without waiting.
+        
+        On success the caller owns the lock and must hand it to
+        rebuild_store(lock_held=True) or sync_store(lock_held=True), which release it.
+        """
+        return self._build_lock.acquire(blocking=False)
+    
+    def _run_build(self, operation: str, build, blocking: bool = False, lock_held: bool = False) -> Dict:
+        """Runs a build under the build lock (already taken if lock_held) and records its outcome in last_build"""
+        if not lock_held and not self._build_lock.acquire(blocking=blocking):
+            raise RuntimeError("A vector store build is already running")
+        
+        self.last_build = {"operation": operation, "state": "running", "started_at": time.time()}
+        try:
+            result = build()
+            self.last_build.update(state="succeeded", finished_at=time.time(), result=result)
+            return result
+        except Exception as e:
+            self.last_build.update(state="failed", finished_at=time.time(), error=str(e))
+            raise
+        finally:
+            self._build_lock.release()
+    
+    def _build_fingerprint(self) -> str:
+        """Identifies what a full build would write: catalog files, document format, model and row cap"""
+        return hashlib.sha256("\0".join([
+            catalog_fingerprint(catalog_store, ALL_CATEGORIES),
+            str(METADATA_VERSION),
+            embedding_model_name(self.embeddings),
+            str(self.max_products_per_category)
+        ]).encode("utf-8")).hexdigest()
+    
+    def _rebuild(self) -> Dict:
+        if self.backend == "numpy":
+            logger.info("Rebuilding vector store")
+            directory = self._new_generation_directory()
+            try:
+                store = self._create_numpy_index(directory)
+            except Exception:
+                # The NumPy build cannot resume, so a partial generation is of no use
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+            self._activate(directory, store)
+            return {"generation": directory.name, "products": self._count(store)}
+        
+        checkpoint_path = str(self.persist_directory / CHECKPOINT_FILE)
+        fingerprint = self._build_fingerprint()
+        checkpoint = BuildCheckpoint.load(checkpoint_path)
+        if checkpoint is not None:
+            directory = self.persist_directory / checkpoint.generation
+            if checkpoint.fingerprint != fingerprint or directory == self.active_directory:
+                # The catalog (or model) changed since the interrupted build, so its batches are stale
+                logger.info(f"Discarding the checkpoint of interrupted rebuild {checkpoint.generation}")
+                if directory != self.active_directory:
+                    shutil.rmtree(directory, ignore_errors=True)
+                checkpoint.remove()
+                checkpoint = None
+        if checkpoint and (self.persist_directory / checkpoint.generation).is_dir():
+            directory = self.persist_directory / checkpoint.generation
+            logger.info(f"Resuming interrupted rebuild of {directory.name} ({len(checkpoint.completed)} batches done)")
+        else:
+            logger.info("Rebuilding vector store")
+            directory = self._new_generation_directory()
+            checkpoint = BuildCheckpoint(checkpoint_path, directory.name, fingerprint=fingerprint)
+        
+        # On failure the partial generation and checkpoint are kept for the next rebuild to resume
+        store = self._create_new_store(directory, checkpoint)
+        self._activate(directory, store)
+        checkpoint.remove()
+        return {"generation": directory.name, "products": self._count(store)}
+    
+    def rebuild_store(self, lock_held: bool = False) -> Dict:
+        """
+        Rebuilds the vector store from scratch into a new generation.
+        
+        Searches keep using the current generation until the new one is complete.
+        An interrupted Chroma rebuild is resumed from its checkpoint.
+        """
+        return self._run_build("rebuild", self._rebuild, lock_held=lock_held)
+    
+    def sync_store(self, lock_held: bool = False) -> Dict:
+        """
+        Incrementally syncs the vector store with the category CSVs.
+        
+        Only categories whose file hash (or METADATA_VERSION) changed since the
+        last build are diffed, and only their new, changed or removed rows are written.
+        The NumPy backend is rebuilt instead whenever the catalog changed (embeddings
+        of unchanged products come from the embedding cache). The update is
+        applied to a copy of the live generation and swapped in when done.
+        """
+        def build():
+            # Start from the newest generation, which another worker may have activated
+            self._follow_current(force=True)
+            if self.backend == "numpy":
+                # Rows are addressed by global product ID, so any catalog change means a rebuild
+                if self.vector_store is not None and self.vector_store.catalog_fingerprint == get_product_index(refresh=True).fingerprint:
+                    logger.info("Vector store is up to date")
+                    return {"generation": self.active_directory.name, "changed_categories": [], "upserted": 0, "deleted": 0}
+                return self._rebuild()
+            
+            manifest = self._read_manifest(self.active_directory)
+            new_manifest = {}
+            changed = []
+            for category in ALL_CATEGORIES:
+                fingerprint = self._file_fingerprint(category, manifest.get(category))
+                new_manifest[category] = fingerprint
+                previous = manifest.get(category, {})
+                if previous.get("sha256") != fingerprint["sha256"] or previous.get("metadata_version") != METADATA_VERSION:
+                    changed.append(category)
+            removed = [category for category in manifest if category not in new_manifest]
+            
+            if not changed and not removed:
+                logger.info("Vector store is up to date")
+                return {"generation": self.active_directory.name, "changed_categories": [], "upserted": 0, "deleted": 0}
+            
+            logger.info(f"Syncing {len(changed)} changed and {len(removed)} removed categories")
+            directory = self._new_generation_directory()
+            try:
+                self._copy_generation(self.active_directory, directory)
+                store = self._open_store(directory)
+                
+                upserted = deleted = 0
+                for category in changed:
+                    category_upserted, category_deleted = self._sync_category(store, category)
+                    upserted += category_upserted
+                    deleted += category_deleted
+                for category in removed:
+                    stale = store.get(where={"category": category}, include=[])["ids"]
+                    if stale:
+                        store.delete(ids=stale)
+                        deleted += len(stale)
+                
+                self._write_manifest(directory, new_manifest)
+            except Exception:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
             
-            self.persist_directory.mkdir(exist_ok=True)
+            self._activate(directory, store)
+            logger.info(f"Sync completed: {upserted} upserted, {deleted} deleted")
+            return {
+                "generation": directory.name,
+                "changed_categories": changed + removed,
+                "upserted": upserted,
+                "deleted": deleted
+            }
         
-        self._create_new_store()
+        return self._run_build("sync", build, lock_held=lock_held)
+    
+    def status(self) -> Dict:
+        """Live generation, indexed product count and the outcome of the last build"""
+        self._follow_current()
+        vector_store = self.vector_store
+        return {
+            "generation": self.active_directory.name,
+            "backend": self.backend,
+            "products": self._count(vector_store),
+            "building": self.is_building(),
+            "last_build": self.last_build
+        }
 
 vector_store_manager = None
 
+_vector_store_lock = threading.Lock()
+
 def get_vector_store() -> VectorStoreManager:
     """Returns the global vector store instance (lazy loading)"""
     global vector_store_manager
-    if vector_store_manager is None:
-        vector_store_manager = VectorStoreManager()
+    with _vector_store_lock:
+        if vector_store_manager is None:
+            vector_store_manager = VectorStoreManager()
     return vector_store_manager
+
+def _collect_metrics():
+    manager = vector_store_manager
+    if manager is None:
+        return []
+    families = []
+    if isinstance(manager.embeddings, CachedEmbeddings):
+        families.extend(metrics.cache_families({
+            "embeddings": {"hits": manager.embeddings.hits, "misses": manager.embeddings.misses}
+        }))
+    vector_index = manager.vector_store
+    if isinstance(vector_index, NumpyVectorIndex):
+        families.append(("vector_index_bytes", "gauge", "Size of the memory-mapped NumPy vector index", [
+            ({"backend": "numpy"}, vector_index.nbytes())
+        ]))
+    return families
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,107 @@
+"""
+Offline evaluation of the local intent classifier
+Compares classifier output with LLM-labelled queries across confidence thresholds
+
+Labelled queries come from a JSONL file ({"query": ..., "categories": [...], "budget": ...} per line)
+or from the intent cache database, which stores the LLM analysis of every query it has seen.
+
+Usage:
+    python bench/eval_intent_classifier.py --queries logged_queries.jsonl
+    python bench/eval_intent_classifier.py --intent-cache api/intent_cache.db
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "api"))
+from intent_classifier import get_intent_classifier, parse_budget
+
+THRESHOLDS = [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5]
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_intent_cache(path: str) -> List[Dict]:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT query, result FROM intents").fetchall()
+    finally:
+        conn.close()
+    # Cached queries are stored normalized (filler words removed), which the bag-of-words classifier does not mind
+    return [{"query": query, **json.loads(result)} for query, result in rows]
+
+
+def evaluate(examples: List[Dict]) -> Dict:
+    classifier = get_intent_classifier()
+
+    predictions, latencies = [], []
+    for example in examples:
+        started_at = time.perf_counter()
+        category, confidence = classifier.classify(example["query"])
+        budget = parse_budget(example["query"])
+        latencies.append(time.perf_counter() - started_at)
+        predictions.append((category, confidence, budget))
+
+    results = {"examples": len(examples), "thresholds": []}
+    for threshold in THRESHOLDS:
+        confident = [
+            (example, category, budget)
+            for example, (category, confidence, budget) in zip(examples, predictions)
+            if category is not None and confidence >= threshold
+        ]
+        correct = sum(1 for example, category, _ in confident if category in example.get("categories", []))
+        budget_correct = sum(
+            1 for example, _, budget in confident
+            if (budget or None) == (example.get("budget") or None)
+        )
+        results["thresholds"].append({
+            "threshold": threshold,
+            "coverage": len(confident) / len(examples) if examples else 0.0,
+            "category_accuracy": correct / len(confident) if confident else None,
+            "budget_accuracy": budget_correct / len(confident) if confident else None,
+        })
+
+    latencies_ms = np.asarray(latencies) * 1000
+    results["latency_ms"] = {
+        "mean": float(latencies_ms.mean()) if len(latencies_ms) else 0.0,
+        "p95": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else 0.0,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier against labelled queries")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queries", help="JSONL file with query, categories and optional budget")
+    source.add_argument("--intent-cache", help="Intent cache SQLite database (INTENT_CACHE_PATH)")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args()
+
+    examples = load_jsonl(args.queries) if args.queries else load_intent_cache(args.intent_cache)
+    examples = [example for example in examples if example.get("categories")]
+    results = evaluate(examples)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{results['examples']} labelled queries, "
+          f"classifier latency {results['latency_ms']['mean']:.2f} ms mean / {results['latency_ms']['p95']:.2f} ms p95\n")
+    print(f"{'threshold':>10} {'coverage':>10} {'category':>10} {'budget':>10}")
+    for row in results["thresholds"]:
+        category = f"{row['category_accuracy']:.1%}" if row["category_accuracy"] is not None else "-"
+        budget = f"{row['budget_accuracy']:.1%}" if row["budget_accuracy"] is not None else "-"
+        print(f"{row['threshold']:>10.2f} {row['coverage']:>10.1%} {category:>10} {budget:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Local stand-ins for the Gemini services used by Smart Search AI
+Deterministic, offline fakes with configurable latency and injected failures
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "api"))
+from embeddings import HashingEmbeddings
+
+
+class RateLimitExceeded(Exception):
+    """Mimics the error raised by the Gemini client when the quota is exhausted"""
+
+    def __init__(self):
+        super().__init__("429 RESOURCE_EXHAUSTED: Resource has been exhausted (e.g. check quota).")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Behaves like a remote embedding API.
+
+    Vectors come from HashingEmbeddings, so results are deterministic. Every
+    call sleeps `latency` seconds, and every `fail_every`-th document call
+    raises a 429 so retry and backoff paths can be exercised.
+    """
+
+    rate_limited = True
+
+    def __init__(self, dimensions: int = 768, latency: float = 0.05, fail_every: int = 0):
+        self.encoder = HashingEmbeddings(dimensions)
+        self.model_name = f"fake-embedding-{dimensions}"
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+        self.failures = 0
+        self.embedded_texts = 0
+        self.query_calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            fail = self.fail_every and self.calls % self.fail_every == 0
+            if fail:
+                self.failures += 1
+        time.sleep(self.latency)
+        if fail:
+            raise RateLimitExceeded()
+        with self._lock:
+            self.embedded_texts += len(texts)
+        return self.encoder.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            self.query_calls += 1
+        time.sleep(self.latency)
+        return self.encoder.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched query embedding: one round trip for all texts"""
+        with self._lock:
+            self.query_calls += 1
+        time.sleep(self.latency)
+        return self.encoder.embed_queries(texts)
+
+
+# Markers of api/prompts/category_analysis.txt
+_ANALYSIS_MARKER = "Available Categories"
+_REQUEST_RE = re.compile(r'Request: "([^"\n]*)"')
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Behaves like ChatGoogleGenerativeAI for the two prompts of /generate.
+
+    Category analysis prompts (they list the available categories) are answered
+    with the JSON returned by `analyze(query)`; response prompts get a fixed
+    product answer. Each call waits `latency` seconds before the first token and
+    `token_latency` seconds per streamed token, without holding a thread.
+    """
+
+    latency: float = 0.3
+    token_latency: float = 0.01
+    analyze: Optional[Callable[[str], Dict]] = None
+    # Items name product IDs from the context, as the response prompt asks
+    response_text: str = (
+        "Here are some great options for you:\n\n"
+        "[ITEM]\nID: P1\n[/ITEM]\n[ITEM]\nID: P2\n[/ITEM]\n"
+    )
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> Tuple[str, str]:
+        """Returns (prompt, reply text)"""
+        prompt = "\n".join(str(message.content) for message in messages)
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if _ANALYSIS_MARKER in prompt:
+            match = _REQUEST_RE.search(prompt)
+            query = match.group(1) if match else prompt
+            analysis = self.analyze(query) if self.analyze else {"budget": None, "categories": []}
+            return prompt, json.dumps(analysis)
+        return prompt, self.response_text
+
+    def _tokens(self, text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _usage(self, prompt: str, text: str) -> Dict[str, int]:
+        """Word-count stand-in for the usage_metadata Gemini reports"""
+        input_tokens, output_tokens = len(self._tokens(prompt)), len(self._tokens(text))
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        prompt, text = self._reply(messages)
+        time.sleep(self.token_latency * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=self._usage(prompt, text)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        prompt, text = self._reply(messages)
+        await asyncio.sleep(self.token_latency * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=self._usage(prompt, text)))])
+
+    # Usage is reported once, on a final empty chunk
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        prompt, text = self._reply(messages)
+        for token in self._tokens(text):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        prompt, text = self._reply(messages)
+        for token in self._tokens(text):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
@@ -0,0 +1,451 @@
+"""
+Benchmark harness for the Smart Search AI hot paths
+Drives the catalog, vector search and API endpoints in-process with fake Gemini services
+
+Every benchmark runs at each requested concurrency and reports p50/p95/p99
+latency, throughput, peak RSS and, where the code path has stages, a per-stage
+breakdown. Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python bench/run_benchmarks.py --output bench/results/$(git rev-parse --short HEAD).json
+    python bench/run_benchmarks.py --only generate,products_endpoint --concurrency 1,8,32
+    python bench/run_benchmarks.py --compare bench/results/before.json --output bench/results/after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, "..", "api"))
+
+# (query, categories the fake LLM returns, budget)
+BENCH_QUERIES = [
+    ("wireless bluetooth headphones under 2000", ["Headphones"], 2000.0),
+    ("running shoes for men", ["Running", "Shoes"], None),
+    ("split air conditioner 1.5 ton", ["Air Conditioners"], None),
+    ("double door refrigerator below 30000", ["Refrigerators"], 30000.0),
+    ("gaming console with controller", ["Gaming Consoles", "Gaming Accessories"], None),
+    ("dslr camera for beginners", ["Cameras", "Camera Accessories"], None),
+    ("kids school bag", ["School Bags", "Backpacks"], 1500.0),
+    ("cricket bat english willow", ["Cricket"], None),
+    ("portable bluetooth speaker", ["Speakers", "Home Audio and Theater"], 3000.0),
+    ("yoga mat and fitness bands", ["Fitness Accessories", "All Exercise and Fitness"], None),
+    ("baby diapers pack", ["Diapers", "Baby Products"], None),
+    ("coffee maker for home", ["Kitchen and Home Appliances", "Coffee Tea and Beverages"], 5000.0),
+]
+
+BENCHMARKS = (
+    "get_df_by_category",
+    "get_products_summary",
+    "search_products",
+    "vector_search_endpoint",
+    "products_endpoint",
+    "generate",
+    "generate_stream",
+)
+
+PRODUCT_PAGE_SORTS = ("relevance", "price_asc", "rating", "popularity")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(values: List[float]) -> Dict:
+    ms = np.asarray(values) * 1000
+    if not len(ms):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "mean": float(ms.mean()),
+        "max": float(ms.max()),
+    }
+
+
+class StageTimer:
+    """Durations of named stages, recorded by wrappers installed around the code under test"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    def reset(self):
+        self.durations = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        self.durations[stage].append(seconds)
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started_at)
+        return wrapper
+
+    def wrap_async(self, stage: str, fn: Callable) -> Callable:
+        async def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started_at)
+        return wrapper
+
+    def summary(self) -> Dict:
+        return {stage: {"count": len(values), **percentiles(values)} for stage, values in self.durations.items()}
+
+
+def run_threads(call: Callable[[int], None], requests: int, concurrency: int) -> Dict:
+    """Runs call(i) for i in range(requests) from `concurrency` threads"""
+    latencies, errors = [], []
+
+    def timed(i: int):
+        started_at = time.perf_counter()
+        try:
+            call(i)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(requests)))
+    return {"latencies": latencies, "errors": errors, "wall": time.perf_counter() - started_at}
+
+
+def run_clients(call: Callable, requests: int, concurrency: int) -> Dict:
+    """Runs `await call(client, i)` for i in range(requests) from `concurrency` async HTTP clients"""
+    import httpx
+    from main import app
+
+    async def run():
+        latencies, errors = [], []
+        next_request = iter(range(requests))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            async def worker():
+                for i in next_request:
+                    started_at = time.perf_counter()
+                    try:
+                        await call(client, i)
+                    except Exception as e:
+                        errors.append(repr(e))
+                    latencies.append(time.perf_counter() - started_at)
+
+            started_at = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return {"latencies": latencies, "errors": errors, "wall": time.perf_counter() - started_at}
+
+    return asyncio.run(run())
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.stages = StageTimer()
+        self.fake_embeddings = None
+        self.fake_llm = None
+
+    def setup(self):
+        """Configures the app for the fakes; env must be set before the api modules are imported"""
+        args = self.args
+        os.environ.setdefault("GEMINI_API_KEY", "bench")
+        os.environ["WARMUP_ON_STARTUP"] = "false"
+        os.environ["VECTOR_STORE_BACKEND"] = args.backend
+        os.environ["VECTOR_STORE_MAX_PRODUCTS_PER_CATEGORY"] = str(args.products_per_category)
+        if not args.local_intents:
+            # Every /generate goes through both LLM calls
+            os.environ["INTENT_CACHE_MAX_ENTRIES"] = "0"
+            os.environ["INTENT_CLASSIFIER_THRESHOLD"] = "2"
+
+        from fakes import FakeChatModel, FakeEmbeddings
+        import main
+        import vector_store
+
+        analyses = {query: {"budget": budget, "categories": categories} for query, categories, budget in BENCH_QUERIES}
+        self.fake_llm = FakeChatModel(
+            latency=args.llm_latency,
+            token_latency=args.token_latency,
+            analyze=lambda query: analyses.get(query, {"budget": None, "categories": []})
+        )
+        main.llm = self.fake_llm
+
+        # Built without latency or rate limiting; searches then pay --embed-latency per call
+        self.fake_embeddings = FakeEmbeddings(dimensions=args.dimensions, latency=0)
+        self.fake_embeddings.rate_limited = False
+        os.makedirs(args.vector_dir, exist_ok=True)
+        started_at = time.time()
+        manager = vector_store.VectorStoreManager(
+            persist_directory=os.path.join(args.vector_dir, args.backend),
+            embeddings=self.fake_embeddings,
+            embedding_cache_path=os.path.join(args.vector_dir, "embedding_cache.db"),
+            embedding_provider="bench"
+        )
+        self.fake_embeddings.latency = args.embed_latency
+        vector_store.vector_store_manager = manager
+        self.setup_seconds = time.time() - started_at
+
+        self.install_stage_timers()
+
+    def install_stage_timers(self):
+        import main
+        import products
+
+        stages = self.stages
+        original_run_stage = main.run_stage
+
+        async def run_stage(stage, awaitable, timeout):
+            started_at = time.perf_counter()
+            try:
+                return await original_run_stage(stage, awaitable, timeout)
+            finally:
+                stages.record(stage, time.perf_counter() - started_at)
+
+        main.run_stage = run_stage
+        main.analyze_query = stages.wrap_async("query analysis", main.analyze_query)
+        main.build_context = stages.wrap("context build", main.build_context)
+        products.get_products_page = stages.wrap("page build", products.get_products_page)
+        products.select_products = stages.wrap("product selection", products.select_products)
+        products.format_products_summary = stages.wrap("summary formatting", products.format_products_summary)
+
+    # Benchmarks: each returns the raw run (latencies, errors, wall)
+
+    def bench_get_df_by_category(self, requests: int, concurrency: int) -> Dict:
+        from products import get_df_by_category
+        categories = [category for _, cats, _ in BENCH_QUERIES for category in cats]
+        return run_threads(lambda i: get_df_by_category(categories[i % len(categories)]), requests, concurrency)
+
+    def bench_get_products_summary(self, requests: int, concurrency: int) -> Dict:
+        from products import get_products_summary
+
+        def call(i: int):
+            query, categories, budget = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            get_products_summary(categories[0], limit=18, max_price=budget, search_query=query)
+        return run_threads(call, requests, concurrency)
+
+    def bench_search_products(self, requests: int, concurrency: int) -> Dict:
+        from vector_store import get_vector_store
+        manager = get_vector_store()
+
+        def call(i: int):
+            query, _, budget = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            manager.search_products(f"{query} {i}", k=20, max_price=budget, mode=self.args.search_mode)
+        return run_threads(call, requests, concurrency)
+
+    def bench_vector_search_endpoint(self, requests: int, concurrency: int) -> Dict:
+        async def call(client, i: int):
+            query, _, _ = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            check(await client.get("/vector-store/search", params={"query": f"{query} {i}", "limit": 20, "mode": self.args.search_mode}))
+        return run_clients(call, requests, concurrency)
+
+    def bench_products_endpoint(self, requests: int, concurrency: int) -> Dict:
+        async def call(client, i: int):
+            _, categories, _ = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            sort = PRODUCT_PAGE_SORTS[(i // len(BENCH_QUERIES)) % len(PRODUCT_PAGE_SORTS)]
+            check(await client.get(f"/products/{categories[0]}", params={"page": 1 + i % 5, "page_size": 20, "sort": sort}))
+        return run_clients(call, requests, concurrency)
+
+    def bench_generate(self, requests: int, concurrency: int) -> Dict:
+        async def call(client, i: int):
+            query, _, _ = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            check(await client.post("/generate", json={"prompt": query}))
+        return run_clients(call, requests, concurrency)
+
+    def bench_generate_stream(self, requests: int, concurrency: int) -> Dict:
+        from main import app
+        stages = self.stages
+
+        async def call(_, i: int):
+            # Driven through the ASGI interface directly: httpx's ASGITransport buffers the whole body
+            query, _, _ = BENCH_QUERIES[i % len(BENCH_QUERIES)]
+            body = json.dumps({"prompt": query}).encode("utf-8")
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "POST", "scheme": "http", "path": "/generate/stream", "raw_path": b"/generate/stream",
+                "query_string": b"", "root_path": "", "client": ("bench", 0), "server": ("bench", 80),
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+            started_at = time.perf_counter()
+            state = {"sent": False, "first_token": False, "status": None, "error": False}
+
+            async def receive():
+                if not state["sent"]:
+                    state["sent"] = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                # Never disconnects; the response cancels this wait when it finishes
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    state["status"] = message["status"]
+                elif message["type"] == "http.response.body":
+                    chunk = message.get("body", b"")
+                    if b"event: token" in chunk and not state["first_token"]:
+                        state["first_token"] = True
+                        stages.record("time to first token", time.perf_counter() - started_at)
+                    if b"event: error" in chunk:
+                        state["error"] = True
+
+            await app(scope, receive, send)
+            if state["status"] != 200 or state["error"]:
+                raise RuntimeError(f"stream failed (HTTP {state['status']}, error event: {state['error']})")
+        return run_clients(call, requests, concurrency)
+
+    def run(self, name: str, concurrency: int) -> Dict:
+        requests = self.args.requests
+        if name.startswith("generate"):
+            requests = self.args.generate_requests
+
+        # One untimed call so imports and lazy indexes are not charged to the first clients
+        first_started_at = time.perf_counter()
+        getattr(self, f"bench_{name}")(1, 1)
+        first_ms = (time.perf_counter() - first_started_at) * 1000
+
+        self.stages.reset()
+        embed_calls = self.fake_embeddings.query_calls
+        llm_calls = self.fake_llm.calls
+        prompt_chars = self.fake_llm.prompt_chars
+        run = getattr(self, f"bench_{name}")(requests, concurrency)
+
+        stages = self.stages.summary()
+        if name == "generate_stream" and "response generation" in stages:
+            # The stream awaits each chunk through run_stage separately
+            stages["response generation (per chunk)"] = stages.pop("response generation")
+
+        return {
+            "requests": requests,
+            "concurrency": concurrency,
+            "errors": len(run["errors"]),
+            "error_samples": run["errors"][:3],
+            "first_call_ms": first_ms,
+            "latency_ms": percentiles(run["latencies"]),
+            "throughput_rps": requests / run["wall"] if run["wall"] else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "embedding_calls": self.fake_embeddings.query_calls - embed_calls,
+            "llm_calls": self.fake_llm.calls - llm_calls,
+            "llm_prompt_chars": self.fake_llm.prompt_chars - prompt_chars,
+            "stages": stages,
+        }
+
+
+def git_revision() -> Dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def print_results(results: Dict):
+    print(f"\n{'benchmark':<32} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'rss MB':>8} {'err':>5}")
+    for key, result in results["benchmarks"].items():
+        latency = result["latency_ms"]
+        print(f"{key:<32} {latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f} "
+              f"{result['throughput_rps']:>9.1f} {result['peak_rss_mb']:>8.0f} {result['errors']:>5}")
+        for stage, timing in result["stages"].items():
+            print(f"  {stage:<30} {timing['p50']:>9.2f} {timing['p95']:>9.2f} {timing['p99']:>9.2f}")
+
+
+def print_comparison(before: Dict, after: Dict):
+    print(f"\nCompared with {before['meta'].get('commit')} (negative latency change is better)")
+    print(f"{'benchmark':<32} {'p50':>18} {'p95':>18} {'req/s':>18}")
+
+    def change(old: float, new: float) -> str:
+        pct = (new - old) / old * 100 if old else 0.0
+        return f"{new:>8.1f} ({pct:+5.0f}%)"
+
+    for key, result in after["benchmarks"].items():
+        old = before["benchmarks"].get(key)
+        if old is None:
+            continue
+        print(f"{key:<32} {change(old['latency_ms']['p50'], result['latency_ms']['p50']):>18} "
+              f"{change(old['latency_ms']['p95'], result['latency_ms']['p95']):>18} "
+              f"{change(old['throughput_rps'], result['throughput_rps']):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search and generation hot paths with fake Gemini services")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per benchmark and concurrency")
+    parser.add_argument("--generate-requests", type=int, default=48, help="Requests for the /generate benchmarks")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM latency before the first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Fake LLM latency per token (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding latency per call (s)")
+    parser.add_argument("--dimensions", type=int, default=768, help="Fake embedding dimensions")
+    parser.add_argument("--backend", choices=("chroma", "numpy"), default="chroma", help="Vector store backend")
+    parser.add_argument("--search-mode", choices=("vector", "hybrid"), default="vector")
+    parser.add_argument("--products-per-category", type=int, default=100, help="Products indexed per category")
+    parser.add_argument("--vector-dir", default=os.path.join(tempfile.gettempdir(), "smart-search-bench"),
+                        help="Where the benchmark vector stores are built (reused across runs)")
+    parser.add_argument("--local-intents", action="store_true",
+                        help="Keep the intent cache and local classifier on (default: always call the fake LLM)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+    concurrencies = [int(value) for value in args.concurrency.split(",")]
+
+    harness = Harness(args)
+    harness.setup()
+    results = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "setup_seconds": harness.setup_seconds,
+            "args": vars(args),
+        },
+        "benchmarks": {},
+    }
+
+    for name in names:
+        for concurrency in concurrencies:
+            key = f"{name}@c{concurrency}"
+            print(f"Running {key}...", file=sys.stderr)
+            results["benchmarks"][key] = harness.run(name, concurrency)
+    results["meta"]["peak_rss_mb"] = peak_rss_mb()
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
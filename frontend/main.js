@@ -199,15 +199,34 @@ async function handleAISearch() {
   renderSkeletons(4); // Fewer skeletons for AI suggestions
   loader.classList.remove('hidden');
 
+  const requestId = currentRequestId;
+
   try {
-    const response = await fetch(`${API_URL}/generate`, {
+    const response = await fetch(`${API_URL}/generate/stream`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ prompt: query }),
     });
 
-    const data = await response.json();
-    const rawResponse = data.response;
+    let rawResponse = '';
+    let streamedText = '';
+
+    for await (const { event, data } of readEventStream(response)) {
+      if (requestId !== currentRequestId) return; // A newer search started
+
+      if (event === 'products' && data.products.length > 0) {
+        // Show the candidate products while the answer is still being written
+        renderProducts(data.products.slice(0, 8));
+      } else if (event === 'token') {
+        streamedText += data.text;
+        aiSection.classList.remove('hidden');
+        aiResponseText.innerHTML = formatStreamingText(streamedText);
+      } else if (event === 'done') {
+        rawResponse = data.response;
+      } else if (event === 'error') {
+        throw new Error(data.detail);
+      }
+    }
 
     const itemRegex = /\[ITEM\]([\s\S]*?)\[\/ITEM\]/g;
     const filterRegex = /\[FILTRO\](.*?)\[\/FILTRO\]/g;
@@ -296,6 +315,7 @@ async function handleAISearch() {
   } catch (error) {
     console.error(error);
   } finally {
+    if (requestId !== currentRequestId) return;
     loader.classList.add('hidden');
     // If no products were rendered by AI search, clear the skeletons
     if (productGrid.querySelectorAll('.is-loading').length > 0) {
@@ -305,6 +325,45 @@ async function handleAISearch() {
   }
 }
 
+// Parses a Server-Sent Events response body into { event, data } objects
+async function* readEventStream(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      });
+      if (data) yield { event, data: JSON.parse(data) };
+    }
+  }
+}
+
+// Shows the partial answer without the [ITEM]/[FILTRO] blocks, which are rendered once complete
+function formatStreamingText(text) {
+  return text
+    .replace(/\[ITEM\][\s\S]*?(\[\/ITEM\]|$)/g, '')
+    .replace(/\[FILTRO\][\s\S]*?(\[\/FILTRO\]|$)/g, '')
+    .replace(/NOT_FOUND/g, '')
+    .trim()
+    .replace(/\n{3,}/g, '\n\n')
+    .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
+    .replace(/\n/g, '<br>');
+}
+
 function renderSkeletons(count = 8) {
   productGrid.innerHTML = '';
   for (let i = 0; i < count; i++) {